@@ -0,0 +1,171 @@
+"""
+Fleet cost analytics for the dashboard, computed with NumPy from the monthly
+rollup (rollups.py) instead of scanning maintenance_logs.
+
+A user's rollup rows are loaded once into flat arrays (vehicle index, month
+number, type index, count, cost) and everything below is vectorized:
+
+- spend per month for the last ANALYTICS_MONTHS months, plus a linear trend
+- cost by maintenance type
+- per-vehicle totals and cost per vehicle-year (months since the vehicle's
+  first log, so a car tracked for 3 months isn't compared on a yearly total)
+- percentiles of monthly per-vehicle spend, and outlier months by robust
+  z-score (median / MAD), which a single huge repair can't skew
+
+Results are cached per user and data version (cache.py), so they are only
+recomputed after the user's data changed.
+"""
+import logging
+import os
+from datetime import date
+
+import numpy as np
+
+import cache
+import rollups
+import stats
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_MONTHS = int(os.getenv('ANALYTICS_MONTHS', 12))
+OUTLIER_Z = float(os.getenv('ANALYTICS_OUTLIER_Z', 3.5))
+TOP_N = 5
+
+
+class FleetRollups:
+    """A user's rollup rows as parallel NumPy arrays"""
+
+    def __init__(self, rows):
+        vehicle_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.vehicle_ids, self.vehicle_index = np.unique(vehicle_ids, return_inverse=True)
+        labels = {row[0]: f"{row[1]} {row[2]} ({row[3]})" for row in rows}
+        self.vehicle_labels = [labels[vehicle_id] for vehicle_id in self.vehicle_ids.tolist()]
+        # Months as a running number (year * 12 + month - 1) so ranges are plain integer math
+        self.month = np.array([row[4].year * 12 + row[4].month - 1 for row in rows], dtype=np.int64)
+        types = np.array([row[5] for row in rows], dtype=object)
+        self.types, self.type_index = np.unique(types, return_inverse=True)
+        self.count = np.array([row[6] for row in rows], dtype=np.int64)
+        self.cost = np.array([float(row[7]) for row in rows], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.cost)
+
+
+def _month_label(month_number):
+    return f"{month_number // 12:04d}-{month_number % 12 + 1:02d}"
+
+
+def _empty_result(months):
+    return {
+        'months': months, 'monthly': [], 'total': 0.0, 'log_count': 0,
+        'trend_per_month': 0.0, 'trend_pct': 0.0,
+        'by_type': [], 'vehicles': [], 'cost_per_vehicle_year': 0.0,
+        'percentiles': {}, 'outliers': [],
+    }
+
+
+def compute(data, today=None, months=ANALYTICS_MONTHS):
+    """Analytics dict for one user's FleetRollups (plain Python types, cacheable)"""
+    today = today or date.today()
+    if not len(data):
+        current = today.year * 12 + today.month - 1
+        result = _empty_result(months)
+        result['monthly'] = [{'month': _month_label(m), 'cost': 0.0, 'pct': 0}
+                             for m in range(current - months + 1, current + 1)]
+        return result
+
+    # Logs dated in the future still count as "now"
+    current = max(today.year * 12 + today.month - 1, int(data.month.max()))
+    first = int(data.month.min())
+    n_vehicles = len(data.vehicle_ids)
+
+    # Everything below works on the sparse rows: a dense vehicle x month matrix
+    # would span the whole history, and one log dated 0001-01-01 makes that
+    # thousands of years wide
+
+    # Last N months, fleet-wide (months without logs are zero)
+    window_start = current - months + 1
+    in_window = data.month >= window_start
+    window = np.bincount(data.month[in_window] - window_start, weights=data.cost[in_window], minlength=months)
+    peak = window.max()
+    monthly = [{'month': _month_label(window_start + i), 'cost': float(cost),
+                'pct': int(round(cost / peak * 100)) if peak > 0 else 0}
+               for i, cost in enumerate(window)]
+
+    # Linear trend over the window (least squares slope, cost per month)
+    slope = float(np.polyfit(np.arange(months), window, 1)[0]) if months > 1 else 0.0
+    mean = window.mean()
+    trend_pct = slope / mean * 100 if mean > 0 else 0.0
+
+    # Cost by maintenance type
+    type_cost = np.bincount(data.type_index, weights=data.cost, minlength=len(data.types))
+    type_count = np.bincount(data.type_index, weights=data.count, minlength=len(data.types))
+    order = np.argsort(-type_cost)
+    by_type = [{'type': str(data.types[i]), 'cost': float(type_cost[i]), 'count': int(type_count[i])}
+               for i in order]
+
+    # Per vehicle: total, and cost per year since the vehicle's first log
+    totals = np.bincount(data.vehicle_index, weights=data.cost, minlength=n_vehicles)
+    first_month = np.full(n_vehicles, current, dtype=np.int64)
+    np.minimum.at(first_month, data.vehicle_index, data.month)
+    vehicle_years = (current - first_month + 1) / 12.0
+    per_year = totals / vehicle_years
+    order = np.argsort(-totals)[:TOP_N]
+    vehicles = [{'id': int(data.vehicle_ids[i]), 'label': data.vehicle_labels[i], 'total': float(totals[i]),
+                 'per_year': float(per_year[i])}
+                for i in order]
+
+    # Distribution of non-empty vehicle-months, and robust outliers
+    span = current - first + 1
+    cells, cell_index = np.unique(data.vehicle_index * span + (data.month - first), return_inverse=True)
+    values = np.bincount(cell_index, weights=data.cost, minlength=len(cells))
+    vehicle_idx, month_idx = cells // span, cells % span
+    spent = values != 0
+    values, vehicle_idx, month_idx = values[spent], vehicle_idx[spent], month_idx[spent]
+    percentiles = {}
+    outliers = []
+    if values.size:
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        percentiles = {'p50': float(p50), 'p90': float(p90), 'p99': float(p99)}
+        median = np.median(values)
+        # MAD scaled to match a standard deviation for normal data; fall back to mean absolute deviation
+        scale = np.median(np.abs(values - median)) * 1.4826
+        if scale == 0:
+            scale = np.mean(np.abs(values - median)) * 1.2533
+        if scale > 0:
+            z = (values - median) / scale
+            flagged = np.nonzero(z > OUTLIER_Z)[0]
+            flagged = flagged[np.argsort(-values[flagged])][:TOP_N]
+            outliers = [{'vehicle_id': int(data.vehicle_ids[vehicle_idx[i]]),
+                         'label': data.vehicle_labels[vehicle_idx[i]],
+                         'month': _month_label(first + int(month_idx[i])),
+                         'cost': float(values[i]), 'z': float(round(z[i], 1))}
+                        for i in flagged]
+
+    return {
+        'months': months,
+        'monthly': monthly,
+        'total': float(totals.sum()),
+        'log_count': int(data.count.sum()),
+        'trend_per_month': slope,
+        'trend_pct': float(trend_pct),
+        'by_type': by_type,
+        'vehicles': vehicles,
+        'cost_per_vehicle_year': float(totals.sum() / vehicle_years.sum()),
+        'percentiles': percentiles,
+        'outliers': outliers,
+    }
+
+
+def get_user_analytics(conn, user_id):
+    """
+    Dashboard analytics for one user, cached until their data changes (the key
+    includes the data version) or the month rolls over.
+    """
+    version = stats.get_data_version(conn, user_id)
+    today = date.today()
+    key = f"analytics:{user_id}:{version}:{today.year}-{today.month}"
+
+    def load():
+        return compute(FleetRollups(rollups.fetch_user_rollups(conn, user_id)), today)
+    return cache.get_or_load(key, load, ttl=24 * 3600)
@@ -0,0 +1,583 @@
+"""
+Versioned JSON API (/api/v1) for vehicles and maintenance logs.
+
+- Uses the same login session as the HTML pages
+- List endpoints use keyset pagination (pagination.py): ?cursor=&per_page=
+- ?fields=a,b,c returns only the listed fields
+- GET responses carry a weak ETag built from the user's data version
+  (see http_cache.py); If-None-Match answers 304 without running the query
+- Queries run on the request's lazily opened connection (db.get_db()); the
+  vehicle list may be served by a read replica (db.get_read_db())
+- Batch endpoints apply every create/update/delete in one transaction, or
+  nothing at all if any item is invalid
+- POST /telemetry ingests vehicle readings in bulk (telemetry.py);
+  GET /vehicles/<id>/telemetry returns them downsampled (timeseries.py)
+"""
+import os
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from functools import wraps
+
+from flask import Blueprint, current_app, jsonify, request, session
+
+import db
+from validation import validate_vehicle_data, validate_maintenance_data
+import pagination
+import stats
+import rollups
+import cache
+import http_cache
+import shards
+import telemetry
+import timeseries
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+API_BATCH_LIMIT = int(os.getenv('API_BATCH_LIMIT', 1000))
+VEHICLE_FIELDS = ('id', 'brand', 'model', 'year', 'plate_number', 'created_at')
+LOG_FIELDS = ('id', 'vehicle_id', 'maintenance_type', 'description', 'cost', 'maintenance_date', 'created_at')
+
+
+class ApiError(Exception):
+    """Error returned to the client as {"error": message, ...} with a status code"""
+
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.extra = extra
+
+
+@api.errorhandler(ApiError)
+def handle_api_error(error):
+    return jsonify({'error': error.message, **error.extra}), error.status
+
+
+@api.errorhandler(shards.UserMoving)
+def handle_user_moving(error):
+    response = jsonify({'error': str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = '30'
+    return response
+
+
+def api_login_required(f):
+    """Like login_required, but answers 401 JSON instead of redirecting"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'error': 'Authentication required.'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def etag_by_data_version(f):
+    """
+    Conditional GET: the ETag changes whenever any of the user's vehicles or
+    logs change, so a matching If-None-Match is answered with 304 without
+    running the view (and, unless cache.is_coherent() is False, without a
+    database query).
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        etag = http_cache.data_version_etag(session['user_id'])
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.make_response(f(*args, **kwargs))
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
+
+
+def _selected_fields(allowed):
+    """Parse ?fields=a,b into a tuple, defaulting to every allowed field"""
+    requested = request.args.get('fields', '').strip()
+    if not requested:
+        return allowed
+    fields = tuple(field.strip() for field in requested.split(',') if field.strip())
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}", allowed=list(allowed))
+    return fields
+
+
+def _serialize(row, fields):
+    data = {}
+    for field in fields:
+        value = row.get(field)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = float(value)
+        data[field] = value
+    return data
+
+
+def _page_args(default_size):
+    return (request.args.get('cursor', '').strip() or None,
+            pagination.get_page_size(request.args.get('per_page'), default_size))
+
+
+def _batch_lists(payload, keys):
+    if not isinstance(payload, dict):
+        raise ApiError('Request body must be a JSON object.')
+    lists = []
+    for key in keys:
+        items = payload.get(key) or []
+        if not isinstance(items, list):
+            raise ApiError(f'"{key}" must be a list.')
+        lists.append(items)
+    if sum(len(items) for items in lists) > API_BATCH_LIMIT:
+        raise ApiError(f'A batch may contain at most {API_BATCH_LIMIT} operations.', status=413)
+    return lists
+
+
+def _int_ids(values, label, unique=True):
+    """Parse a list of IDs (order kept; duplicates dropped unless unique=False)"""
+    try:
+        ids = [int(value) for value in values]
+    except (ValueError, TypeError):
+        raise ApiError(f'"{label}" must contain numeric IDs.')
+    return list(dict.fromkeys(ids)) if unique else ids
+
+
+def _text(item, field, default=''):
+    """A batch item's field as stripped text; missing and null both mean default"""
+    value = item.get(field)
+    return str(default if value is None else value).strip()
+
+
+def _in_clause(values):
+    return ', '.join(['%s'] * len(values))
+
+
+# Vehicles
+@api.route('/vehicles')
+@api_login_required
+@etag_by_data_version
+def list_vehicles():
+    fields = _selected_fields(VEHICLE_FIELDS)
+    page_cursor, per_page = _page_args(pagination.VEHICLES_PAGE_SIZE)
+    try:
+        vehicles, next_cursor = pagination.fetch_vehicle_page(db.get_read_db(session['user_id']), session['user_id'],
+                                                              page_cursor, per_page)
+    except ValueError:
+        raise ApiError('Invalid cursor.')
+    return jsonify({'data': [_serialize(v, fields) for v in vehicles], 'next_cursor': next_cursor})
+
+
+@api.route('/vehicles/<int:vehicle_id>')
+@api_login_required
+@etag_by_data_version
+def get_vehicle(vehicle_id):
+    fields = _selected_fields(VEHICLE_FIELDS)
+    cursor = db.get_db().cursor(dictionary=True)
+    cursor.execute("SELECT * FROM vehicles WHERE id = %s AND user_id = %s", (vehicle_id, session['user_id']))
+    vehicle = cursor.fetchone()
+    if not vehicle:
+        raise ApiError('Vehicle not found.', status=404)
+    return jsonify({'data': _serialize(vehicle, fields)})
+
+
+@api.route('/vehicles/<int:vehicle_id>/maintenance')
+@api_login_required
+@etag_by_data_version
+def list_maintenance(vehicle_id):
+    fields = _selected_fields(LOG_FIELDS)
+    page_cursor, per_page = _page_args(pagination.LOGS_PAGE_SIZE)
+    user_id = session['user_id']
+    conn = db.get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM vehicles WHERE id = %s AND user_id = %s", (vehicle_id, user_id))
+        if not cursor.fetchone():
+            raise ApiError('Vehicle not found.', status=404)
+        logs, next_cursor = pagination.fetch_log_page(conn, vehicle_id, user_id, page_cursor, per_page)
+    except ValueError:
+        raise ApiError('Invalid cursor.')
+    return jsonify({'data': [_serialize(log, fields) for log in logs], 'next_cursor': next_cursor})
+
+
+@api.route('/stats')
+@api_login_required
+@etag_by_data_version
+def user_stats():
+    data = stats.get_user_stats(db.get_db(), session['user_id'])
+    return jsonify({'data': _serialize(data, tuple(data.keys()))})
+
+
+@api.route('/vehicles/batch', methods=['POST'])
+@api_login_required
+def vehicles_batch():
+    """
+    Body: {"create": [{brand, model, year, plate_number}],
+           "update": [{id, ...fields to change}],
+           "delete": [id, ...]}
+    Applied in the order delete, update, create - all in one transaction.
+    """
+    user_id = session['user_id']
+    creates, updates, deletes = _batch_lists(request.get_json(silent=True), ('create', 'update', 'delete'))
+    if not all(isinstance(item, dict) for item in creates + updates):
+        raise ApiError('"create" and "update" items must be objects.')
+    delete_ids = _int_ids(deletes, 'delete')
+    # One id per update item, in the same order (duplicates are reported below)
+    update_ids = _int_ids([item.get('id') for item in updates], 'update[].id', unique=False)
+
+    def apply(conn):
+        cursor = conn.cursor(dictionary=True)
+
+        # Current state of every vehicle and plate the batch touches
+        existing = {}
+        if update_ids or delete_ids:
+            ids = list(dict.fromkeys(update_ids + delete_ids))
+            cursor.execute(
+                f"SELECT id, brand, model, year, plate_number FROM vehicles WHERE user_id = %s AND id IN ({_in_clause(ids)})",
+                [user_id] + ids
+            )
+            existing = {row['id']: row for row in cursor.fetchall()}
+        plates = [_text(item, 'plate_number') for item in creates + updates if item.get('plate_number')]
+        plate_owner = {}
+        if plates:
+            cursor.execute(
+                f"SELECT id, plate_number FROM vehicles WHERE user_id = %s AND plate_number IN ({_in_clause(plates)})",
+                [user_id] + plates
+            )
+            plate_owner = {row['plate_number'].lower(): row['id'] for row in cursor.fetchall()}
+
+        # Validate everything before writing anything
+        errors = []
+        for index, vehicle_id in enumerate(delete_ids):
+            if vehicle_id not in existing:
+                errors.append({'op': 'delete', 'index': index, 'errors': ['Vehicle not found.']})
+            else:
+                plate_owner.pop(existing[vehicle_id]['plate_number'].lower(), None)
+
+        planned_updates = []
+        seen_updates = set()
+        for index, (vehicle_id, item) in enumerate(zip(update_ids, updates)):
+            current = existing.get(vehicle_id)
+            if not current or vehicle_id in delete_ids:
+                errors.append({'op': 'update', 'index': index, 'errors': ['Vehicle not found.']})
+                continue
+            if vehicle_id in seen_updates:
+                errors.append({'op': 'update', 'index': index, 'errors': ['Vehicle is updated more than once in this batch.']})
+                continue
+            seen_updates.add(vehicle_id)
+            merged = {field: _text(item, field, current[field]) for field in ('brand', 'model', 'year', 'plate_number')}
+            item_errors = validate_vehicle_data(merged['brand'], merged['model'], merged['year'], merged['plate_number'])
+            plate_key = merged['plate_number'].lower()
+            if not item_errors and plate_owner.get(plate_key, vehicle_id) != vehicle_id:
+                item_errors.append('A vehicle with this plate number already exists.')
+            if item_errors:
+                errors.append({'op': 'update', 'index': index, 'errors': item_errors})
+                continue
+            plate_owner.pop(current['plate_number'].lower(), None)
+            plate_owner[plate_key] = vehicle_id
+            planned_updates.append((vehicle_id, merged, int(merged['year']) != current['year']))
+
+        planned_creates = []
+        for index, item in enumerate(creates):
+            values = {field: _text(item, field) for field in ('brand', 'model', 'year', 'plate_number')}
+            item_errors = validate_vehicle_data(values['brand'], values['model'], values['year'], values['plate_number'])
+            plate_key = values['plate_number'].lower()
+            if not item_errors and plate_key in plate_owner:
+                item_errors.append('A vehicle with this plate number already exists.')
+            if item_errors:
+                errors.append({'op': 'create', 'index': index, 'errors': item_errors})
+                continue
+            plate_owner[plate_key] = None
+            planned_creates.append(values)
+
+        if errors:
+            raise ApiError('Validation failed; nothing was changed.', status=422, details=errors)
+
+        # Apply
+        if delete_ids:
+            cursor.execute(
+                f"SELECT COUNT(*) AS log_count, COALESCE(SUM(cost), 0) AS log_cost FROM maintenance_logs "
+                f"WHERE user_id = %s AND vehicle_id IN ({_in_clause(delete_ids)})",
+                [user_id] + delete_ids
+            )
+            cascaded = cursor.fetchone()
+            cursor.execute(
+                f"DELETE FROM vehicles WHERE user_id = %s AND id IN ({_in_clause(delete_ids)})",
+                [user_id] + delete_ids
+            )
+            stats.record_vehicles_removed(conn, user_id, len(delete_ids), cascaded['log_count'], cascaded['log_cost'])
+
+        for vehicle_id, values, year_changed in planned_updates:
+            cursor.execute(
+                "UPDATE vehicles SET brand = %s, model = %s, year = %s, plate_number = %s WHERE id = %s AND user_id = %s",
+                (values['brand'], values['model'], int(values['year']), values['plate_number'], vehicle_id, user_id)
+            )
+        if planned_updates:
+            stats.record_vehicle_updated(conn, user_id, year_changed=any(changed for _, _, changed in planned_updates))
+
+        created_ids = []
+        for values in planned_creates:
+            cursor.execute(
+                "INSERT INTO vehicles (user_id, brand, model, year, plate_number) VALUES (%s, %s, %s, %s, %s)",
+                (user_id, values['brand'], values['model'], int(values['year']), values['plate_number'])
+            )
+            created_ids.append(cursor.lastrowid)
+        stats.record_vehicles_added(conn, user_id, [int(values['year']) for values in planned_creates])
+        return created_ids, [vehicle_id for vehicle_id, _, _ in planned_updates]
+
+    try:
+        created_ids, updated_ids = db.run_in_transaction(apply)
+    except (ApiError, shards.UserMoving):
+        raise
+    except Exception as e:
+        current_app.logger.error(f'Error in vehicles batch: {str(e)}')
+        raise ApiError('The batch could not be applied; nothing was changed.', status=500)
+
+    for vehicle_id in delete_ids + updated_ids:
+        cache.invalidate_vehicle(user_id, vehicle_id)
+    cache.invalidate_user(user_id)
+    return jsonify({'created': created_ids, 'updated': updated_ids, 'deleted': delete_ids})
+
+
+# Maintenance logs
+@api.route('/maintenance/batch', methods=['POST'])
+@api_login_required
+def maintenance_batch():
+    """
+    Body: {"create": [{vehicle_id, maintenance_type, maintenance_date, cost, description}],
+           "update": [{id, ...fields to change}],
+           "delete": [id, ...]}
+    Applied in the order delete, update, create - all in one transaction.
+    In updates a missing or null field keeps its value; "" clears cost / description.
+    """
+    user_id = session['user_id']
+    creates, updates, deletes = _batch_lists(request.get_json(silent=True), ('create', 'update', 'delete'))
+    if not all(isinstance(item, dict) for item in creates + updates):
+        raise ApiError('"create" and "update" items must be objects.')
+    delete_ids = _int_ids(deletes, 'delete')
+    # One id per update item, in the same order (duplicates are reported below)
+    update_ids = _int_ids([item.get('id') for item in updates], 'update[].id', unique=False)
+
+    def apply(conn):
+        cursor = conn.cursor(dictionary=True)
+
+        vehicle_ids = sorted({item.get('vehicle_id') for item in creates + updates
+                              if isinstance(item.get('vehicle_id'), int)})
+        owned_vehicles = set()
+        if vehicle_ids:
+            cursor.execute(
+                f"SELECT id FROM vehicles WHERE user_id = %s AND id IN ({_in_clause(vehicle_ids)})",
+                [user_id] + vehicle_ids
+            )
+            owned_vehicles = {row['id'] for row in cursor.fetchall()}
+        # Current state of every log the batch touches
+        existing = {}
+        if update_ids or delete_ids:
+            ids = list(dict.fromkeys(update_ids + delete_ids))
+            cursor.execute(
+                f"""SELECT id, vehicle_id, maintenance_type, description, cost, maintenance_date
+                    FROM maintenance_logs WHERE user_id = %s AND id IN ({_in_clause(ids)})""",
+                [user_id] + ids
+            )
+            existing = {row['id']: row for row in cursor.fetchall()}
+
+        errors = []
+        for index, log_id in enumerate(delete_ids):
+            if log_id not in existing:
+                errors.append({'op': 'delete', 'index': index, 'errors': ['Maintenance log not found.']})
+
+        planned_updates = []
+        seen_updates = set()
+        for index, (log_id, item) in enumerate(zip(update_ids, updates)):
+            current = existing.get(log_id)
+            if not current or log_id in delete_ids:
+                errors.append({'op': 'update', 'index': index, 'errors': ['Maintenance log not found.']})
+                continue
+            if log_id in seen_updates:
+                errors.append({'op': 'update', 'index': index, 'errors': ['Maintenance log is updated more than once in this batch.']})
+                continue
+            seen_updates.add(log_id)
+            vehicle_id = current['vehicle_id'] if item.get('vehicle_id') is None else item['vehicle_id']
+            maintenance_type = _text(item, 'maintenance_type', current['maintenance_type'])
+            maintenance_date = _text(item, 'maintenance_date', current['maintenance_date'])
+            cost = _text(item, 'cost', '' if current['cost'] is None else current['cost'])
+            description = _text(item, 'description', current['description'] or '')
+            item_errors = validate_maintenance_data(maintenance_type, maintenance_date, cost)
+            if vehicle_id != current['vehicle_id'] and vehicle_id not in owned_vehicles:
+                item_errors.append('Vehicle not found.')
+            if len(description) > 65535:
+                item_errors.append('Description is too long.')
+            if item_errors:
+                errors.append({'op': 'update', 'index': index, 'errors': item_errors})
+                continue
+            planned_updates.append((log_id, (vehicle_id, maintenance_type, description or None,
+                                             Decimal(cost) if cost else None, maintenance_date)))
+
+        planned_creates = []
+        for index, item in enumerate(creates):
+            maintenance_type = _text(item, 'maintenance_type')
+            maintenance_date = _text(item, 'maintenance_date')
+            cost = _text(item, 'cost')
+            description = _text(item, 'description')
+            item_errors = validate_maintenance_data(maintenance_type, maintenance_date, cost)
+            if item.get('vehicle_id') not in owned_vehicles:
+                item_errors.append('Vehicle not found.')
+            if len(description) > 65535:
+                item_errors.append('Description is too long.')
+            if item_errors:
+                errors.append({'op': 'create', 'index': index, 'errors': item_errors})
+                continue
+            planned_creates.append((item['vehicle_id'], user_id, maintenance_type, description or None,
+                                    Decimal(cost) if cost else None, maintenance_date))
+
+        if errors:
+            raise ApiError('Validation failed; nothing was changed.', status=422, details=errors)
+
+        affected_vehicles = set()
+        if delete_ids:
+            removed = [existing[log_id] for log_id in delete_ids]
+            cursor.execute(
+                f"DELETE FROM maintenance_logs WHERE user_id = %s AND id IN ({_in_clause(delete_ids)})",
+                [user_id] + delete_ids
+            )
+            removed_cost = sum((row['cost'] for row in removed if row['cost'] is not None), Decimal('0'))
+            stats.record_logs_removed(conn, user_id, len(delete_ids), removed_cost)
+            rollups.record_logs_removed(conn, user_id, [(row['vehicle_id'], row['maintenance_type'],
+                                                         row['maintenance_date'], row['cost']) for row in removed])
+            affected_vehicles.update(row['vehicle_id'] for row in removed)
+
+        if planned_updates:
+            old_logs, new_logs = [], []
+            cost_change = Decimal('0')
+            for log_id, values in planned_updates:
+                cursor.execute(
+                    """UPDATE maintenance_logs
+                       SET vehicle_id = %s, maintenance_type = %s, description = %s, cost = %s, maintenance_date = %s
+                       WHERE id = %s AND user_id = %s""",
+                    values + (log_id, user_id)
+                )
+                current = existing[log_id]
+                old_logs.append((current['vehicle_id'], current['maintenance_type'], current['maintenance_date'], current['cost']))
+                new_logs.append((values[0], values[1], values[4], values[3]))
+                cost_change += (values[3] or 0) - (current['cost'] or 0)
+                affected_vehicles.update((current['vehicle_id'], values[0]))
+            stats.record_logs_updated(conn, user_id, cost_change)
+            # Move each log's count and cost from its old rollup bucket to the new one
+            rollups.record_logs_removed(conn, user_id, old_logs)
+            rollups.record_logs_added(conn, user_id, new_logs)
+
+        created_ids = []
+        for values in planned_creates:
+            cursor.execute(
+                """INSERT INTO maintenance_logs
+                   (vehicle_id, user_id, maintenance_type, description, cost, maintenance_date)
+                   VALUES (%s, %s, %s, %s, %s, %s)""",
+                values
+            )
+            created_ids.append(cursor.lastrowid)
+        added_cost = sum((values[4] for values in planned_creates if values[4] is not None), Decimal('0'))
+        stats.record_logs_added(conn, user_id, len(planned_creates), added_cost)
+        rollups.record_logs_added(conn, user_id, [(values[0], values[2], values[5], values[4]) for values in planned_creates])
+        affected_vehicles.update(values[0] for values in planned_creates)
+
+        return created_ids, [log_id for log_id, _ in planned_updates], affected_vehicles
+
+    try:
+        created_ids, updated_ids, affected_vehicles = db.run_in_transaction(apply)
+    except (ApiError, shards.UserMoving):
+        raise
+    except Exception as e:
+        current_app.logger.error(f'Error in maintenance batch: {str(e)}')
+        raise ApiError('The batch could not be applied; nothing was changed.', status=500)
+
+    for vehicle_id in affected_vehicles:
+        cache.invalidate_maintenance(user_id, vehicle_id)
+    cache.invalidate_user(user_id)
+    return jsonify({'created': created_ids, 'updated': updated_ids, 'deleted': delete_ids})
+
+
+# Telemetry
+@api.route('/telemetry', methods=['POST'])
+@api_login_required
+def ingest_telemetry():
+    """
+    Body: {"readings": [{vehicle_id, ts, odometer_km, lat, lon, speed_kmh}, ...]}
+    Up to TELEMETRY_BATCH_LIMIT readings, accepted all together or not at all.
+    202 when buffered for a write-behind flush, 201 when written in the request.
+    """
+    user_id = session['user_id']
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('readings'), list):
+        raise ApiError('Request body must be {"readings": [...]}.')
+    items = payload['readings']
+    if len(items) > telemetry.TELEMETRY_BATCH_LIMIT:
+        raise ApiError(f'A batch may contain at most {telemetry.TELEMETRY_BATCH_LIMIT} readings.', status=413)
+
+    rows, errors = telemetry.parse_readings(items, telemetry.owned_vehicle_ids(db.get_db(), user_id))
+    if errors:
+        raise ApiError('Validation failed; no readings were stored.', status=422,
+                       details=errors[:100], error_count=len(errors))
+
+    db.check_writable()
+    if telemetry.TELEMETRY_WRITE_BEHIND:
+        shard = db.current_placement().shard
+        db.release_db()
+        try:
+            telemetry.get_buffer(shard).add(rows)
+        except telemetry.TelemetryBusy as e:
+            current_app.logger.warning(f'Telemetry buffer full: {str(e)}')
+            response = jsonify({'error': 'Too many readings waiting to be written; retry shortly.'})
+            response.status_code = 503
+            response.headers['Retry-After'] = '1'
+            return response
+        return jsonify({'accepted': len(rows)}), 202
+
+    try:
+        db.run_in_transaction(lambda conn: telemetry.write_readings(conn, rows))
+    except shards.UserMoving:
+        raise
+    except Exception as e:
+        current_app.logger.error(f'Error writing telemetry: {str(e)}')
+        raise ApiError('The readings could not be stored.', status=500)
+    return jsonify({'written': len(rows)}), 201
+
+
+def _timestamp_arg(name, default):
+    value = request.args.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        value = float(value)
+    except ValueError:
+        pass
+    ts = telemetry.parse_timestamp(value)
+    if ts is None:
+        raise ApiError(f'"{name}" must be an ISO 8601 timestamp or Unix seconds.')
+    return ts
+
+
+@api.route('/vehicles/<int:vehicle_id>/telemetry')
+@api_login_required
+def vehicle_telemetry(vehicle_id):
+    """
+    ?start=&end= (ISO 8601 or Unix seconds, UTC; default the last 30 days) and
+    ?points= (default TIMESERIES_DEFAULT_POINTS). Not ETag'd by data version:
+    readings don't change it, so responses are cached briefly instead.
+    """
+    conn = db.get_db()
+    if vehicle_id not in telemetry.owned_vehicle_ids(conn, session['user_id']):
+        raise ApiError('Vehicle not found.', status=404)
+    end = _timestamp_arg('end', datetime.now(timezone.utc).replace(tzinfo=None))
+    start = _timestamp_arg('start', end - timedelta(days=30))
+    if start >= end:
+        raise ApiError('"start" must be before "end".')
+    try:
+        points = int(request.args.get('points', timeseries.TIMESERIES_DEFAULT_POINTS))
+    except ValueError:
+        points = 0
+    if not 1 <= points <= timeseries.TIMESERIES_MAX_POINTS:
+        raise ApiError(f'"points" must be between 1 and {timeseries.TIMESERIES_MAX_POINTS}.')
+
+    response = jsonify({'data': timeseries.query(conn, vehicle_id, start, end, points)})
+    response.headers['Cache-Control'] = f'private, max-age={int(timeseries.TIMESERIES_CACHE_TTL)}'
+    return response
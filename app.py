@@ -1,9 +1,31 @@
-from flask import Flask, render_template, request, redirect, flash, url_for, Response, session
-from db_config import get_db_connection
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, render_template, request, redirect, flash, url_for, Response, session, jsonify, stream_with_context
+from db_config import get_db_connection, get_pool_stats
+import db
+import instrumentation
+from validation import validate_vehicle_data, validate_maintenance_data
+import stats
+import rollups
+import analytics
+import exports
+import imports
+import pagination
+import search
+import cache
+from api import api
+import passwords
+import sessions
+import assets
+import http_cache
+import fragments
+import telemetry
+import replicas
+import shards
 import os
+import io
+import json
 import csv
 import logging
+import hmac
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from functools import wraps
@@ -34,73 +56,29 @@ app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'  # CSRF protection (always safe)
 if os.getenv('PORT'):  # Railway sets this
     app.config['SESSION_COOKIE_SECURE'] = True  # Only send cookies over HTTPS
 
-# Validation functions
-def validate_vehicle_data(brand, model, year, plate):
-    """Validate vehicle form data"""
-    errors = []
-    
-    # Brand validation
-    if not brand or not brand.strip():
-        errors.append("Brand is required.")
-    elif len(brand.strip()) > 100:
-        errors.append("Brand must be 100 characters or less.")
-    
-    # Model validation
-    if not model or not model.strip():
-        errors.append("Model is required.")
-    elif len(model.strip()) > 100:
-        errors.append("Model must be 100 characters or less.")
-    
-    # Year validation
-    try:
-        year_int = int(year)
-        current_year = datetime.now().year
-        if year_int < 1900 or year_int > current_year + 1:
-            errors.append(f"Year must be between 1900 and {current_year + 1}.")
-    except (ValueError, TypeError):
-        errors.append("Year must be a valid number.")
-    
-    # Plate validation
-    if not plate or not plate.strip():
-        errors.append("Plate number is required.")
-    elif len(plate.strip()) > 50:
-        errors.append("Plate number must be 50 characters or less.")
-    
-    return errors
+# Compression, static file caching, conditional GET for pages (see http_cache.py)
+http_cache.init_app(app)
 
-def validate_maintenance_data(maintenance_type, maintenance_date, cost=None):
-    """Validate maintenance form data"""
-    errors = []
-    
-    # Maintenance type validation
-    if not maintenance_type or not maintenance_type.strip():
-        errors.append("Maintenance type is required.")
-    elif len(maintenance_type.strip()) > 100:
-        errors.append("Maintenance type must be 100 characters or less.")
-    
-    # Date validation
-    if not maintenance_date:
-        errors.append("Maintenance date is required.")
-    else:
-        try:
-            date_obj = datetime.strptime(maintenance_date, '%Y-%m-%d')
-            if date_obj.date() > datetime.now().date():
-                errors.append("Maintenance date cannot be in the future.")
-        except ValueError:
-            errors.append("Invalid date format.")
-    
-    # Cost validation
-    if cost and cost.strip():
-        try:
-            cost_float = float(cost)
-            if cost_float < 0:
-                errors.append("Cost cannot be negative.")
-            elif cost_float > 999999.99:
-                errors.append("Cost is too large.")
-        except ValueError:
-            errors.append("Cost must be a valid number.")
-    
-    return errors
+# Content-hashed static files / CSS bundle (python assets.py build)
+assets.init_app(app)
+
+# Cached per-row HTML for vehicle cards / log rows (render_rows in templates)
+fragments.init_app(app)
+
+# Server-side sessions: only an opaque id in the cookie (SESSION_BACKEND, see sessions.py)
+sessions.init_app(app)
+
+# Request-scoped DB connection (opened lazily, released before rendering / on teardown)
+db.init_app(app)
+
+# Per-request timings: Server-Timing header, /metrics, slow-query log
+instrumentation.init_app(app)
+
+# JSON API (/api/v1)
+app.register_blueprint(api)
+
+# Cap upload size (bulk CSV imports)
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('IMPORT_MAX_MB', 20)) * 1024 * 1024
 
 # Authentication helper functions
 def login_required(f):
@@ -113,31 +91,69 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Monitoring endpoints: scrapers send "Authorization: Bearer <METRICS_TOKEN>";
+# without a token they only answer requests made on this host and not forwarded by a proxy
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+def metrics_access_required(f):
+    """Decorator for the monitoring endpoints (METRICS_TOKEN, or local requests only)"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if METRICS_TOKEN:
+            scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+            allowed = scheme.lower() == 'bearer' and hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode())
+        else:
+            allowed = request.remote_addr in LOCAL_ADDRESSES and 'X-Forwarded-For' not in request.headers
+        if not allowed:
+            return Response('Forbidden\n', status=403, mimetype='text/plain')
+        return f(*args, **kwargs)
+    return decorated_function
+
 def get_current_user_id():
     """Get the current logged-in user's ID"""
     return session.get('user_id')
 
+def get_user_vehicle(vehicle_id, user_id, use_cache=True):
+    """Fetch one of the user's vehicles, or None (read-through cached unless cache.is_coherent() is False)"""
+    def load():
+        cursor = db.get_db().cursor(dictionary=True)
+        cursor.execute("SELECT * FROM vehicles WHERE id = %s AND user_id = %s", (vehicle_id, user_id))
+        return cursor.fetchone()
+    # A per-worker copy would miss edits made through other workers; the
+    # primary key lookup is as cheap as checking whether it is still current
+    if not use_cache or not cache.is_coherent():
+        return load()
+    return cache.get_or_load(cache.vehicle_key(user_id, vehicle_id), load)
+
+def get_log_page(vehicle_id, user_id, page_cursor, per_page):
+    """One page of a vehicle's maintenance logs as (logs, next_cursor), cached per page"""
+    version = None if cache.is_coherent() else stats.get_data_version(db.get_db(), user_id)
+    return cache.get_or_load(
+        cache.maintenance_page_key(user_id, vehicle_id, page_cursor, per_page, version),
+        lambda: pagination.fetch_log_page(db.get_db(), vehicle_id, user_id, page_cursor, per_page)
+    )
+
+def load_global_stats():
+    """
+    Fetch landing page totals on dedicated connections (used by the stats
+    cache, which may call this from a background thread outside any request).
+    Whole-table aggregates: summed over every shard, queried in parallel, and
+    served by a read replica when there is one.
+    """
+    return stats.merge_global_stats(shards.scatter_gather(stats.get_global_stats).values())
+
 @app.route('/')
 def home():
     """Landing page - accessible to everyone"""
-    conn = None
+    # Check if user is logged in
+    is_logged_in = 'user_id' in session
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get quick stats for landing page (all users' data for public view)
-        cursor.execute("SELECT COUNT(*) as total FROM vehicles")
-        total_vehicles = cursor.fetchone()['total']
-        
-        cursor.execute("SELECT COUNT(*) as total FROM maintenance_logs")
-        total_maintenance = cursor.fetchone()['total']
-        
-        cursor.execute("SELECT SUM(cost) as total_cost FROM maintenance_logs WHERE cost IS NOT NULL")
-        result = cursor.fetchone()
-        total_cost = result['total_cost'] if result['total_cost'] else 0
-        
-        # Check if user is logged in
-        is_logged_in = 'user_id' in session
+        # Get quick stats for landing page (all users' data for public view, cached per worker)
+        global_stats = stats.get_cached_global_stats(load_global_stats)
+        total_vehicles = global_stats['total_vehicles']
+        total_maintenance = global_stats['total_maintenance']
+        total_cost = global_stats['total_cost'] if global_stats['total_cost'] else 0
         
         return render_template('home.html', 
                              total_vehicles=total_vehicles,
@@ -146,50 +162,44 @@ def home():
                              is_logged_in=is_logged_in)
     except Exception as e:
         app.logger.error(f'Error in home: {str(e)}')
-        is_logged_in = 'user_id' in session
         return render_template('home.html', 
                              total_vehicles=0,
                              total_maintenance=0,
                              total_cost=0,
                              is_logged_in=is_logged_in)
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/dashboard')
 @login_required
+@http_cache.etag_page
 def dashboard():
     """User dashboard with personal stats"""
     user_id = get_current_user_id()
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        # Get user-specific stats (maintained summary row, no scans; usually cached)
+        user_stats = stats.get_user_stats(db.get_db(), user_id)
+        total_vehicles = user_stats['vehicle_count']
+        total_maintenance = user_stats['log_count']
+        total_cost = user_stats['total_cost'] if user_stats['total_cost'] else 0
         
-        # Get user-specific stats
-        cursor.execute("SELECT COUNT(*) as total FROM vehicles WHERE user_id = %s", (user_id,))
-        total_vehicles = cursor.fetchone()['total']
-        
-        cursor.execute("SELECT COUNT(*) as total FROM maintenance_logs WHERE user_id = %s", (user_id,))
-        total_maintenance = cursor.fetchone()['total']
-        
-        cursor.execute("SELECT SUM(cost) as total_cost FROM maintenance_logs WHERE user_id = %s AND cost IS NOT NULL", (user_id,))
-        result = cursor.fetchone()
-        total_cost = result['total_cost'] if result['total_cost'] else 0
+        # Cost analytics from the monthly rollup (cached until the user's data changes)
+        try:
+            fleet = analytics.get_user_analytics(db.get_db(), user_id) if total_maintenance else None
+        except Exception as e:
+            app.logger.warning(f'Dashboard analytics unavailable: {str(e)}')
+            fleet = None
         
         return render_template('dashboard.html', 
                              total_vehicles=total_vehicles,
                              total_maintenance=total_maintenance,
-                             total_cost=total_cost)
+                             total_cost=total_cost,
+                             fleet=fleet)
     except Exception as e:
         app.logger.error(f'Error in dashboard: {str(e)}')
         return render_template('dashboard.html', 
                              total_vehicles=0,
                              total_maintenance=0,
-                             total_cost=0)
-    finally:
-        if conn:
-            conn.close()
+                             total_cost=0,
+                             fleet=None)
 
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
@@ -214,40 +224,44 @@ def signup():
             flash('Please enter a valid email address.', 'error')
             return render_template('signup.html', email=email)
         
-        conn = None
-        try:
-            conn = get_db_connection()
+        def create_user(conn):
             cursor = conn.cursor()
-            
+
             # Check if email already exists
             cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
             if cursor.fetchone():
-                flash('An account with this email already exists.', 'error')
-                return render_template('signup.html', email=email)
-            
-            # Hash password and create user
-            password_hash = generate_password_hash(password)
+                return None
+
             cursor.execute(
                 "INSERT INTO users (email, password_hash) VALUES (%s, %s)",
                 (email, password_hash)
             )
-            conn.commit()
-            
-            # Get the new user's ID
+            # The new user's ID
             user_id = cursor.lastrowid
-            
-            # Log the user in
+            # Which shard will hold their vehicles and logs (no-op without DB_SHARDS)
+            shards.place_new_user(conn, user_id)
+            return user_id
+
+        try:
+            # Hash the password before touching the database (it's the slow part)
+            password_hash = passwords.hash_password(password)
+            user_id = db.run_in_transaction(create_user, shard=shards.MAIN)
+            if user_id is None:
+                flash('An account with this email already exists.', 'error')
+                return render_template('signup.html', email=email)
+
+            # Log the user in (with a fresh session id)
+            sessions.regenerate()
             session['user_id'] = user_id
             session['email'] = email
-            
+
             flash('Account created successfully! Welcome to AutoTrack.', 'success')
             return redirect(url_for('dashboard'))
+        except passwords.PasswordHashBusy:
+            app.logger.warning('Signup rejected: password hashing pool is saturated')
+            flash('We are very busy right now. Please try again in a few seconds.', 'error')
+            return render_template('signup.html', email=email), 503
         except Exception as e:
-            if conn:
-                try:
-                    conn.rollback()
-                except:
-                    pass
             error_msg = str(e)
             app.logger.error(f'Error in signup: {error_msg}', exc_info=True)
             
@@ -257,12 +271,27 @@ def signup():
             else:
                 flash('An error occurred while creating your account. Please try again.', 'error')
             return render_template('signup.html', email=email)
-        finally:
-            if conn:
-                conn.close()
     
     return render_template('signup.html')
 
+def upgrade_password_hash(user_id, old_hash, password):
+    """Re-hash a verified password with the configured method (best effort)"""
+    try:
+        new_hash = passwords.hash_password(password)
+        
+        def save(conn):
+            cursor = conn.cursor()
+            # Only if nobody changed it meanwhile
+            cursor.execute(
+                "UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s",
+                (new_hash, user_id, old_hash)
+            )
+        
+        db.run_in_transaction(save, shard=shards.MAIN)
+        db.release_db()
+    except Exception as e:
+        app.logger.warning(f'Could not upgrade password hash for user {user_id}: {str(e)}')
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     """User login page"""
@@ -278,23 +307,29 @@ def login():
             flash('Email and password are required.', 'error')
             return render_template('login.html', email=email)
         
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
+            cursor = db.get_db(shards.MAIN).cursor(dictionary=True)
             
             # Find user by email
             cursor.execute("SELECT id, email, password_hash FROM users WHERE email = %s", (email,))
             user = cursor.fetchone()
+            cursor.close()
+            # Done with the database - don't hold the connection while checking the hash
+            db.release_db()
             
-            if not user or not check_password_hash(user['password_hash'], password):
+            if not user or not passwords.verify_password(user['password_hash'], password):
                 flash('Invalid email or password.', 'error')
                 return render_template('login.html', email=email)
             
+            # Upgrade hashes made with an older method / work factor
+            if passwords.needs_rehash(user['password_hash']):
+                upgrade_password_hash(user['id'], user['password_hash'], password)
+            
             # Check if "Remember me" is checked
             remember_me = request.form.get('remember_me') == 'on'
             
-            # Log the user in
+            # Log the user in (with a fresh session id)
+            sessions.regenerate()
             session['user_id'] = user['id']
             session['email'] = user['email']
             
@@ -306,6 +341,10 @@ def login():
             
             flash('Logged in successfully!', 'success')
             return redirect(url_for('dashboard'))
+        except passwords.PasswordHashBusy:
+            app.logger.warning('Login rejected: password hashing pool is saturated')
+            flash('We are very busy right now. Please try again in a few seconds.', 'error')
+            return render_template('login.html', email=email), 503
         except Exception as e:
             error_msg = str(e)
             app.logger.error(f'Error in login: {error_msg}', exc_info=True)
@@ -316,9 +355,6 @@ def login():
             else:
                 flash('An error occurred while logging in. Please try again.', 'error')
             return render_template('login.html', email=email)
-        finally:
-            if conn:
-                conn.close()
     
     return render_template('login.html')
 
@@ -331,48 +367,45 @@ def logout():
 
 @app.route('/vehicles')
 @login_required
+@http_cache.etag_page
 def index():
     user_id = get_current_user_id()
-    conn = None
     try:
-        # Get search query if provided
+        # Get search query and page position if provided
         search_query = request.args.get('search', '').strip()
+        page_cursor = request.args.get('cursor', '').strip() or None
+        per_page = pagination.get_page_size(request.args.get('per_page'), pagination.VEHICLES_PAGE_SIZE)
         
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        # List / search are the heavy reads: a replica once it has this user's latest write
+        conn = db.get_read_db(user_id)
         
-        # Build search query - search in brand, model, or plate_number (filtered by user)
         if search_query:
-            # Sanitize search query to prevent SQL injection (though parameterized queries already protect us)
-            search_pattern = f'%{search_query}%'
-            cursor.execute(
-                "SELECT * FROM vehicles WHERE user_id = %s AND (brand LIKE %s OR model LIKE %s OR plate_number LIKE %s) ORDER BY year DESC",
-                (user_id, search_pattern, search_pattern, search_pattern)
-            )
+            # Indexed search (plate prefix + full-text), best matches first - a single ranked page
+            vehicles = search.search_vehicles(conn, user_id, search_query, limit=per_page)
+            page_cursor = next_cursor = None
         else:
-            cursor.execute("SELECT * FROM vehicles WHERE user_id = %s ORDER BY year DESC", (user_id,))
-        
-        vehicles = cursor.fetchall()
-        
-        # Calculate statistics (user-specific)
-        cursor.execute("SELECT COUNT(*) as total FROM vehicles WHERE user_id = %s", (user_id,))
-        total = cursor.fetchone()['total']
+            try:
+                vehicles, next_cursor = pagination.fetch_vehicle_page(conn, user_id, page_cursor, per_page)
+            except ValueError:
+                # Malformed cursor - start from the first page
+                page_cursor = None
+                vehicles, next_cursor = pagination.fetch_vehicle_page(conn, user_id, None, per_page)
         
-        cursor.execute("SELECT MIN(year) as oldest, MAX(year) as newest FROM vehicles WHERE user_id = %s", (user_id,))
-        stats = cursor.fetchone()
-        oldest = stats['oldest'] if stats['oldest'] else 'N/A'
-        newest = stats['newest'] if stats['newest'] else 'N/A'
+        # Calculate statistics (user-specific; cached summary row, read from the primary)
+        user_stats = stats.get_user_stats(db.get_db(), user_id)
+        total = user_stats['vehicle_count']
+        oldest = user_stats['min_year'] if user_stats['min_year'] else 'N/A'
+        newest = user_stats['max_year'] if user_stats['max_year'] else 'N/A'
         
         return render_template('index.html', vehicles=vehicles, search_query=search_query, 
-                             total=total, oldest=oldest, newest=newest)
+                             total=total, oldest=oldest, newest=newest,
+                             next_cursor=next_cursor, page_cursor=page_cursor, per_page=per_page)
     except Exception as e:
         app.logger.error(f'Error in index: {str(e)}')
         flash('An error occurred while loading vehicles. Please try again.', 'error')
         return render_template('index.html', vehicles=[], search_query='', 
-                             total=0, oldest='N/A', newest='N/A')
-    finally:
-        if conn:
-            conn.close()
+                             total=0, oldest='N/A', newest='N/A',
+                             next_cursor=None, page_cursor=None, per_page=pagination.VEHICLES_PAGE_SIZE)
 
 @app.route('/add_vehicle', methods=['GET', 'POST'])
 @login_required
@@ -392,81 +425,72 @@ def add_vehicle():
             return render_template('add_vehicles.html', 
                                  brand=brand, model=model, year=year, plate=plate)
 
-        conn = None
-        try:
-            conn = get_db_connection()
+        def insert_vehicle(conn):
             cursor = conn.cursor()
             
             # Check if plate number already exists for this user
             cursor.execute("SELECT id FROM vehicles WHERE user_id = %s AND plate_number = %s", (user_id, plate))
             if cursor.fetchone():
-                flash('A vehicle with this plate number already exists.', 'error')
-                return render_template('add_vehicles.html', 
-                                     brand=brand, model=model, year=year, plate=plate)
+                return False
             
             cursor.execute(
                 "INSERT INTO vehicles (user_id, brand, model, year, plate_number) VALUES (%s, %s, %s, %s, %s)",
                 (user_id, brand, model, int(year), plate)
             )
-            conn.commit()
+            stats.record_vehicle_added(conn, user_id, int(year))
+            return True
+
+        try:
+            if not db.run_in_transaction(insert_vehicle):
+                flash('A vehicle with this plate number already exists.', 'error')
+                return render_template('add_vehicles.html', 
+                                     brand=brand, model=model, year=year, plate=plate)
+            cache.invalidate_user(user_id)
             flash('Vehicle added successfully.', 'success')
             return redirect(url_for('index'))  # Redirects to /vehicles
         except Exception as e:
-            if conn:
-                conn.rollback()
             app.logger.error(f'Error adding vehicle: {str(e)}')
             flash('An error occurred while adding the vehicle. Please try again.', 'error')
             return render_template('add_vehicles.html', 
                                  brand=brand, model=model, year=year, plate=plate)
-        finally:
-            if conn:
-                conn.close()
     
     return render_template('add_vehicles.html')
 
 @app.route('/vehicle/<int:vehicle_id>')
 @login_required
+@http_cache.etag_page
 def view_vehicle(vehicle_id):
     user_id = get_current_user_id()
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM vehicles WHERE id = %s AND user_id = %s", (vehicle_id, user_id))
-        vehicle = cursor.fetchone()
+        vehicle = get_user_vehicle(vehicle_id, user_id)
         
         if not vehicle:
             flash('Vehicle not found.', 'error')
             return redirect(url_for('index'))
         
-        # Get maintenance logs for this vehicle (user-specific)
-        cursor.execute(
-            "SELECT * FROM maintenance_logs WHERE vehicle_id = %s AND user_id = %s ORDER BY maintenance_date DESC",
-            (vehicle_id, user_id)
-        )
-        maintenance_logs = cursor.fetchall()
+        # Get one page of maintenance logs for this vehicle (user-specific)
+        page_cursor = request.args.get('cursor', '').strip() or None
+        per_page = pagination.get_page_size(request.args.get('per_page'), pagination.LOGS_PAGE_SIZE)
+        try:
+            maintenance_logs, next_cursor = get_log_page(vehicle_id, user_id, page_cursor, per_page)
+        except ValueError:
+            page_cursor = None
+            maintenance_logs, next_cursor = get_log_page(vehicle_id, user_id, None, per_page)
         
-        return render_template('view_log.html', vehicle=vehicle, maintenance_logs=maintenance_logs)
+        return render_template('view_log.html', vehicle=vehicle, maintenance_logs=maintenance_logs,
+                             next_cursor=next_cursor, page_cursor=page_cursor, per_page=per_page)
     except Exception as e:
         app.logger.error(f'Error viewing vehicle: {str(e)}')
         flash('An error occurred while loading the vehicle. Please try again.', 'error')
         return redirect(url_for('index'))
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/edit_vehicle/<int:vehicle_id>', methods=['GET', 'POST'])
 @login_required
 def edit_vehicle(vehicle_id):
     user_id = get_current_user_id()
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Check if vehicle exists and belongs to user
-        cursor.execute("SELECT * FROM vehicles WHERE id = %s AND user_id = %s", (vehicle_id, user_id))
-        vehicle = cursor.fetchone()
+        # Check if vehicle exists and belongs to user (the save below re-reads it)
+        vehicle = get_user_vehicle(vehicle_id, user_id)
         
         if not vehicle:
             flash('Vehicle not found.', 'error')
@@ -477,81 +501,100 @@ def edit_vehicle(vehicle_id):
             model = request.form.get('model', '').strip()
             year = request.form.get('year', '').strip()
             plate = request.form.get('plate', '').strip()
+            form_vehicle = {
+                'id': vehicle_id,
+                'brand': brand,
+                'model': model,
+                'year': year,
+                'plate_number': plate
+            }
             
             # Validate input
             errors = validate_vehicle_data(brand, model, year, plate)
             if errors:
                 for error in errors:
                     flash(error, 'error')
-                return render_template('edit_vehicle.html', vehicle={
-                    'id': vehicle_id,
-                    'brand': brand,
-                    'model': model,
-                    'year': year,
-                    'plate_number': plate
-                })
-            
-            # Check if plate number already exists for this user (excluding current vehicle)
-            cursor.execute("SELECT id FROM vehicles WHERE user_id = %s AND plate_number = %s AND id != %s", (user_id, plate, vehicle_id))
-            if cursor.fetchone():
-                flash('A vehicle with this plate number already exists.', 'error')
-                return render_template('edit_vehicle.html', vehicle={
-                    'id': vehicle_id,
-                    'brand': brand,
-                    'model': model,
-                    'year': year,
-                    'plate_number': plate
-                })
+                return render_template('edit_vehicle.html', vehicle=form_vehicle)
             
-            try:
+            def update_vehicle(conn):
+                cursor = conn.cursor(dictionary=True)
+                
+                # Always fresh when saving
+                cursor.execute("SELECT year FROM vehicles WHERE id = %s AND user_id = %s", (vehicle_id, user_id))
+                current = cursor.fetchone()
+                if not current:
+                    return 'not_found'
+                
+                # Check if plate number already exists for this user (excluding current vehicle)
+                cursor.execute("SELECT id FROM vehicles WHERE user_id = %s AND plate_number = %s AND id != %s", (user_id, plate, vehicle_id))
+                if cursor.fetchone():
+                    return 'duplicate'
+                
                 cursor.execute(
                     "UPDATE vehicles SET brand = %s, model = %s, year = %s, plate_number = %s WHERE id = %s AND user_id = %s",
                     (brand, model, int(year), plate, vehicle_id, user_id)
                 )
-                conn.commit()
-                flash('Vehicle updated successfully.', 'success')
-                return redirect(url_for('index'))
+                stats.record_vehicle_updated(conn, user_id, year_changed=int(year) != current['year'])
+                return 'updated'
+            
+            try:
+                outcome = db.run_in_transaction(update_vehicle)
             except Exception as e:
-                conn.rollback()
                 app.logger.error(f'Error updating vehicle: {str(e)}')
                 flash('An error occurred while updating the vehicle. Please try again.', 'error')
                 return render_template('edit_vehicle.html', vehicle=vehicle)
+            
+            if outcome == 'not_found':
+                cache.invalidate_vehicle(user_id, vehicle_id)
+                flash('Vehicle not found.', 'error')
+                return redirect(url_for('index'))
+            if outcome == 'duplicate':
+                flash('A vehicle with this plate number already exists.', 'error')
+                return render_template('edit_vehicle.html', vehicle=form_vehicle)
+            
+            cache.invalidate_vehicle(user_id, vehicle_id)
+            flash('Vehicle updated successfully.', 'success')
+            return redirect(url_for('index'))
         
         return render_template('edit_vehicle.html', vehicle=vehicle)
     except Exception as e:
         app.logger.error(f'Error in edit_vehicle: {str(e)}')
         flash('An error occurred. Please try again.', 'error')
         return redirect(url_for('index'))
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/delete_vehicle/<int:vehicle_id>', methods=['POST'])
 @login_required
 def delete_vehicle(vehicle_id):
     user_id = get_current_user_id()
-    conn = None
-    try:
-        conn = get_db_connection()
+    
+    def remove_vehicle(conn):
         cursor = conn.cursor()
         
         # Check if vehicle exists and belongs to user
         cursor.execute("SELECT id FROM vehicles WHERE id = %s AND user_id = %s", (vehicle_id, user_id))
         if not cursor.fetchone():
-            flash('Vehicle not found.', 'error')
-            return redirect(url_for('index'))
+            return False
+        
+        # Its maintenance logs are removed by ON DELETE CASCADE - note them for the stats
+        cursor.execute(
+            "SELECT COUNT(*), COALESCE(SUM(cost), 0) FROM maintenance_logs WHERE vehicle_id = %s AND user_id = %s",
+            (vehicle_id, user_id)
+        )
+        log_count, log_cost = cursor.fetchone()
         
         cursor.execute("DELETE FROM vehicles WHERE id = %s AND user_id = %s", (vehicle_id, user_id))
-        conn.commit()
-        flash('Vehicle deleted successfully.', 'success')
+        stats.record_vehicle_removed(conn, user_id, log_count, log_cost)
+        return True
+    
+    try:
+        if db.run_in_transaction(remove_vehicle):
+            cache.invalidate_vehicle(user_id, vehicle_id)
+            flash('Vehicle deleted successfully.', 'success')
+        else:
+            flash('Vehicle not found.', 'error')
     except Exception as e:
-        if conn:
-            conn.rollback()
         app.logger.error(f'Error deleting vehicle: {str(e)}')
         flash('An error occurred while deleting the vehicle. Please try again.', 'error')
-    finally:
-        if conn:
-            conn.close()
     
     return redirect(url_for('index'))
 
@@ -559,14 +602,9 @@ def delete_vehicle(vehicle_id):
 @login_required
 def add_maintenance(vehicle_id):
     user_id = get_current_user_id()
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         # Verify vehicle exists and belongs to user
-        cursor.execute("SELECT * FROM vehicles WHERE id = %s AND user_id = %s", (vehicle_id, user_id))
-        vehicle = cursor.fetchone()
+        vehicle = get_user_vehicle(vehicle_id, user_id)
         
         if not vehicle:
             flash('Vehicle not found.', 'error')
@@ -593,18 +631,23 @@ def add_maintenance(vehicle_id):
                 flash('Description is too long.', 'error')
                 return render_template('add_maintenance.html', vehicle=vehicle)
             
-            try:
+            def insert_log(conn):
+                cursor = conn.cursor()
                 cursor.execute(
                     """INSERT INTO maintenance_logs 
                        (vehicle_id, user_id, maintenance_type, description, cost, maintenance_date) 
                        VALUES (%s, %s, %s, %s, %s, %s)""",
                     (vehicle_id, user_id, maintenance_type, description or None, cost_value, maintenance_date)
                 )
-                conn.commit()
+                stats.record_log_added(conn, user_id, cost_value)
+                rollups.record_logs_added(conn, user_id, [(vehicle_id, maintenance_type, maintenance_date, cost_value)])
+            
+            try:
+                db.run_in_transaction(insert_log)
+                cache.invalidate_maintenance(user_id, vehicle_id)
                 flash('Maintenance log added successfully.', 'success')
                 return redirect(url_for('view_vehicle', vehicle_id=vehicle_id))
             except Exception as e:
-                conn.rollback()
                 app.logger.error(f'Error adding maintenance: {str(e)}')
                 flash('An error occurred while adding the maintenance log. Please try again.', 'error')
                 return render_template('add_maintenance.html', vehicle=vehicle)
@@ -614,47 +657,52 @@ def add_maintenance(vehicle_id):
         app.logger.error(f'Error in add_maintenance: {str(e)}')
         flash('An error occurred. Please try again.', 'error')
         return redirect(url_for('index'))
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/delete_maintenance/<int:maintenance_id>', methods=['POST'])
 @login_required
 def delete_maintenance(maintenance_id):
     user_id = get_current_user_id()
-    conn = None
-    try:
-        conn = get_db_connection()
+    
+    def remove_log(conn):
         cursor = conn.cursor(dictionary=True)
         
         # Get vehicle_id before deleting (to redirect back) - verify it belongs to user
-        cursor.execute("SELECT vehicle_id FROM maintenance_logs WHERE id = %s AND user_id = %s", (maintenance_id, user_id))
+        cursor.execute(
+            "SELECT vehicle_id, cost, maintenance_type, maintenance_date FROM maintenance_logs WHERE id = %s AND user_id = %s",
+            (maintenance_id, user_id)
+        )
         result = cursor.fetchone()
-        
         if not result:
+            return None
+        
+        cursor.execute("DELETE FROM maintenance_logs WHERE id = %s AND user_id = %s", (maintenance_id, user_id))
+        stats.record_log_removed(conn, user_id, result['cost'])
+        rollups.record_logs_removed(conn, user_id, [
+            (result['vehicle_id'], result['maintenance_type'], result['maintenance_date'], result['cost'])
+        ])
+        return result['vehicle_id']
+    
+    try:
+        vehicle_id = db.run_in_transaction(remove_log)
+        if vehicle_id is None:
             flash('Maintenance log not found.', 'error')
             return redirect(url_for('index'))
         
-        vehicle_id = result['vehicle_id']
-        
-        cursor.execute("DELETE FROM maintenance_logs WHERE id = %s AND user_id = %s", (maintenance_id, user_id))
-        conn.commit()
+        cache.invalidate_maintenance(user_id, vehicle_id)
         flash('Maintenance log deleted successfully.', 'success')
         return redirect(url_for('view_vehicle', vehicle_id=vehicle_id))
     except Exception as e:
-        if conn:
-            conn.rollback()
         app.logger.error(f'Error deleting maintenance: {str(e)}')
         flash('An error occurred while deleting the maintenance log. Please try again.', 'error')
         return redirect(url_for('index'))
-    finally:
-        if conn:
-            conn.close()
 
 # Serve web manifest
 @app.route('/site.webmanifest')
 def webmanifest():
-    from flask import jsonify
+    """Web app manifest, built once per worker (icon URLs only change on deploy)"""
+    return http_cache.cached_document('webmanifest', build_webmanifest, 'application/manifest+json')
+
+def build_webmanifest():
     manifest = {
         "name": "AutoTrack - Vehicle Maintenance Tracker",
         "short_name": "AutoTrack",
@@ -676,7 +724,7 @@ def webmanifest():
         "background_color": "#ffffff",
         "display": "standalone"
     }
-    return jsonify(manifest), 200, {'Content-Type': 'application/manifest+json'}
+    return json.dumps(manifest)
 
 # Error handlers
 @app.errorhandler(404)
@@ -686,63 +734,163 @@ def not_found_error(error):
 
 @app.errorhandler(500)
 def internal_error(error):
-    conn = None
-    try:
-        if conn:
-            conn.rollback()
-    except:
-        pass
+    # Roll back and release whatever the failed request had open
+    db.release_db()
     flash('An internal error occurred. Please try again later.', 'error')
     return redirect(url_for('index')), 500
 
 # CSV Export route
+VEHICLE_CSV_HEADER = ['ID', 'Brand', 'Model', 'Year', 'Plate Number', 'Created At']
+
+def vehicle_csv_row(vehicle):
+    return [
+        vehicle['id'],
+        vehicle['brand'],
+        vehicle['model'],
+        vehicle['year'],
+        vehicle['plate_number'],
+        exports.format_datetime(vehicle.get('created_at'))
+    ]
+
 @app.route('/export/csv')
 @login_required
 def export_csv():
     user_id = get_current_user_id()
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM vehicles WHERE user_id = %s ORDER BY year DESC", (user_id,))
-        vehicles = cursor.fetchall()
-        
-        # Create CSV in memory
-        output = []
-        output.append(['ID', 'Brand', 'Model', 'Year', 'Plate Number', 'Created At'])
-        
-        for vehicle in vehicles:
-            output.append([
-                vehicle['id'],
-                vehicle['brand'],
-                vehicle['model'],
-                vehicle['year'],
-                vehicle['plate_number'],
-                vehicle.get('created_at', '').strftime('%Y-%m-%d %H:%M:%S') if vehicle.get('created_at') else ''
-            ])
-        
-        # Generate CSV with proper escaping
-        def generate():
-            import io
-            output_buffer = io.StringIO()
-            writer = csv.writer(output_buffer)
-            for row in output:
-                writer.writerow(row)
-            return output_buffer.getvalue()
-        
-        response = Response(
-            generate(),
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename=vehicles_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'}
-        )
-        return response
+        conn = db.get_read_db(user_id).open()
     except Exception as e:
+        db.release_db()
         app.logger.error(f'Error exporting CSV: {str(e)}')
         flash('An error occurred while exporting data. Please try again.', 'error')
         return redirect(url_for('index'))
-    finally:
-        if conn:
-            conn.close()
+    
+    # Generate CSV chunk by chunk; the connection is released once streaming ends.
+    # The query only starts with the body: the session is saved before that,
+    # possibly on this same connection, which can't run anything while a result is unread
+    def generate():
+        try:
+            # Unbuffered cursor: rows are streamed from MySQL as we fetchmany() them
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT id, brand, model, year, plate_number, created_at FROM vehicles WHERE user_id = %s ORDER BY year DESC",
+                (user_id,)
+            )
+            yield from exports.stream_csv(VEHICLE_CSV_HEADER, exports.iter_chunks(cursor), vehicle_csv_row)
+        except Exception as e:
+            app.logger.error(f'Error streaming CSV export: {str(e)}')
+            raise
+        finally:
+            db.release_db()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=vehicles_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'}
+    )
+
+@app.route('/export/maintenance')
+@login_required
+def export_maintenance():
+    """
+    Full maintenance history (logs joined to vehicles) as CSV, NDJSON or Parquet.
+    
+    Query parameters: format (csv|ndjson|parquet), start / end (YYYY-MM-DD),
+    vehicle_id (repeatable)
+    """
+    user_id = get_current_user_id()
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in exports.MAINTENANCE_EXPORT_FORMATS:
+        flash('Unsupported export format.', 'error')
+        return redirect(url_for('index'))
+    if export_format == 'parquet' and not exports.parquet_available():
+        flash('Parquet export is not available on this server (pyarrow is not installed).', 'error')
+        return redirect(url_for('index'))
+    
+    # Validate filters
+    try:
+        start_date = request.args.get('start', '').strip() or None
+        end_date = request.args.get('end', '').strip() or None
+        if start_date:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        if end_date:
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        vehicle_ids = [int(v) for v in request.args.getlist('vehicle_id') if v.strip()]
+    except ValueError:
+        flash('Invalid export filters. Use YYYY-MM-DD dates and numeric vehicle IDs.', 'error')
+        return redirect(url_for('index'))
+    
+    try:
+        conn = db.get_read_db(user_id).open()
+    except Exception as e:
+        app.logger.error(f'Error exporting maintenance history: {str(e)}')
+        flash('An error occurred while exporting data. Please try again.', 'error')
+        return redirect(url_for('index'))
+    
+    # Pages are fetched as the response streams, on the request's connection
+    pages = exports.iter_maintenance_pages(conn, user_id, start_date=start_date, end_date=end_date,
+                                           vehicle_ids=vehicle_ids)
+    
+    def generate():
+        try:
+            if export_format == 'csv':
+                yield from exports.stream_csv(exports.MAINTENANCE_EXPORT_COLUMNS, pages, exports.maintenance_csv_row)
+            elif export_format == 'ndjson':
+                yield from exports.stream_ndjson(pages)
+            else:
+                yield from exports.stream_parquet(pages)
+        except Exception as e:
+            app.logger.error(f'Error streaming maintenance export: {str(e)}')
+            raise
+        finally:
+            db.release_db()
+    
+    mimetype, extension = exports.MAINTENANCE_EXPORT_FORMATS[export_format]
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=maintenance_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'}
+    )
+
+@app.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_csv():
+    """Bulk import vehicles or maintenance logs from an uploaded CSV file"""
+    user_id = get_current_user_id()
+    if request.method == 'POST':
+        kind = request.form.get('kind', 'vehicles')
+        upload = request.files.get('csv_file')
+        
+        if kind not in imports.IMPORT_KINDS:
+            flash('Choose what you are importing.', 'error')
+            return render_template('import.html', kind='vehicles')
+        if not upload or not upload.filename:
+            flash('Choose a CSV file to import.', 'error')
+            return render_template('import.html', kind=kind)
+        
+        try:
+            # Read the upload as a stream - rows are validated and inserted in batches
+            rows = csv.DictReader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline=''))
+            db.check_writable()
+            report = imports.run_import(db.run_in_transaction, user_id, kind, rows)
+        except UnicodeDecodeError:
+            flash('The file must be a UTF-8 encoded CSV.', 'error')
+            return render_template('import.html', kind=kind)
+        except shards.UserMoving as e:
+            flash(str(e), 'error')
+            return render_template('import.html', kind=kind), 503
+        except Exception as e:
+            db.get_db().rollback()
+            app.logger.error(f'Error importing CSV: {str(e)}')
+            flash('An error occurred while importing. Please try again.', 'error')
+            return render_template('import.html', kind=kind)
+        
+        if report.inserted:
+            flash(f'Imported {report.inserted} row(s).', 'success')
+        if report.errors:
+            flash(f'{report.failed} row(s) were skipped - see the details below.', 'error')
+        return render_template('import.html', kind=kind, report=report)
+    
+    return render_template('import.html', kind='vehicles')
 
 @app.route('/test-db')
 def test_db():
@@ -884,6 +1032,69 @@ def test_db():
     
     return html
 
+@app.route('/cache-stats')
+@metrics_access_required
+def cache_stats():
+    """Cache hit/miss counters for this worker process (JSON, for scraping)"""
+    result = cache.get_cache_stats()
+    result['pid'] = os.getpid()
+    return jsonify(result)
+
+@app.route('/pool-stats')
+@metrics_access_required
+def pool_stats():
+    """
+    Connection pool counters for this worker process (JSON, for scraping).
+    Each gunicorn worker has its own pool, so scrape every worker or sum them.
+    """
+    pool = get_pool_stats()
+    if pool is None:
+        pool = {'pooling': False}
+    else:
+        pool['pooling'] = True
+    pool['pid'] = os.getpid()
+    if replicas.enabled():
+        pool['replicas'] = replicas.get_replica_stats()
+    if shards.enabled():
+        pool['shards'] = shards.get_shard_stats()
+    return jsonify(pool)
+
+@app.route('/metrics')
+@metrics_access_required
+def metrics():
+    """
+    Prometheus metrics for this worker process: request / SQL / render timings
+    (instrumentation.py) plus connection pool (main and other shards), read
+    replica, cache, session store and telemetry buffer counters.
+    """
+    gauges = {'autotrack_worker_pid': ('Process id of the worker that answered', os.getpid())}
+    pool = get_pool_stats()
+    if pool is not None:
+        for name in ('size', 'in_use', 'idle', 'checkouts', 'waits', 'timeouts', 'connections_opened', 'connections_discarded'):
+            gauges[f'autotrack_db_pool_{name}'] = (f'Connection pool {name.replace("_", " ")}', pool[name])
+    if shards.enabled():
+        for shard, shard_pool in shards.get_shard_stats().items():
+            for name in ('size', 'in_use', 'idle', 'waits', 'timeouts'):
+                gauges[f'autotrack_db_shard_{shard}_pool_{name}'] = (f'Shard {shard} pool {name.replace("_", " ")}', shard_pool[name])
+    if replicas.enabled():
+        routing = replicas.get_replica_stats()
+        for name in ('replica_reads', 'primary_reads', 'pinned_reads', 'behind_reads', 'healthy'):
+            gauges[f'autotrack_db_replicas_{name}'] = (f'Read replicas {name.replace("_", " ")}', routing[name])
+        for index, replica in enumerate(routing['replicas']):
+            lag = replica['lag_seconds'] if replica['lag_seconds'] is not None else -1
+            gauges[f'autotrack_db_replica{index}_healthy'] = (f'Replica {replica["name"]} in rotation', int(replica['healthy']))
+            gauges[f'autotrack_db_replica{index}_lag_seconds'] = (f'Replica {replica["name"]} replication lag (-1: unknown)', lag)
+            gauges[f'autotrack_db_replica{index}_drains'] = (f'Replica {replica["name"]} times drained', replica['drains'])
+    for name, value in cache.get_cache_stats().items():
+        if isinstance(value, (int, float)):
+            gauges[f'autotrack_cache_{name}'] = (f'Cache {name}', value)
+    for name, value in sessions.get_session_stats().items():
+        if isinstance(value, (int, float)):
+            gauges[f'autotrack_sessions_{name}'] = (f'Session store {name.replace("_", " ")}', value)
+    for name, value in telemetry.get_telemetry_stats().items():
+        gauges[f'autotrack_telemetry_{name}'] = (f'Telemetry buffer {name.replace("_", " ")}', value)
+    return Response(instrumentation.render_metrics(gauges), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     # Use environment variable for debug mode, default to False for production
     import os
@@ -0,0 +1,163 @@
+"""
+Precompiled, content-hashed static assets.
+
+Build (needs the Tailwind CLI: TAILWIND_BIN, `tailwindcss` on PATH, or npx):
+    python assets.py build
+
+- Compiles assets/app.css with tailwind.config.js into one minified bundle
+  containing only the classes used in templates/
+- Copies it and every file in static/ to static/dist/ under a name with a
+  content hash (app.3f2c9a1b7e4d.css) and writes static/dist/manifest.json
+- At runtime url_for('static', filename='app.css') becomes the hashed name,
+  which is served with `Cache-Control: immutable` for a year
+- Without a build (no manifest) filenames are left alone and the templates
+  fall back to the Tailwind CDN runtime (templates/_styles.html)
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_NAME = 'dist'
+DIST_DIR = os.path.join(STATIC_DIR, DIST_NAME)
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+CSS_INPUT = os.path.join(BASE_DIR, 'assets', 'app.css')
+TAILWIND_CONFIG = os.path.join(BASE_DIR, 'tailwind.config.js')
+
+# Hashed files never change, so browsers may keep them for a year without revalidating
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+_manifest = {}
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """{logical name: hashed path relative to static/}, or {} when assets weren't built"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable asset manifest {path}: {str(e)}")
+        return {}
+
+
+def asset_built(filename):
+    """True if the build produced a hashed copy of filename"""
+    return filename in _manifest
+
+
+def _rewrite_static_filename(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = _manifest.get(values['filename'], values['filename'])
+
+
+def _cache_hashed_assets(response):
+    if request.endpoint == 'static' and response.status_code == 200 \
+            and (request.view_args or {}).get('filename', '').startswith(DIST_NAME + '/'):
+        response.cache_control.no_cache = False
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    """Load the manifest once and rewrite url_for('static', ...) to hashed names"""
+    global _manifest
+    _manifest = load_manifest(os.getenv('ASSETS_MANIFEST', MANIFEST_PATH))
+    app.url_defaults(_rewrite_static_filename)
+    app.after_request(_cache_hashed_assets)
+    app.jinja_env.globals['asset_built'] = asset_built
+    if _manifest:
+        logger.info(f"Serving {len(_manifest)} hashed static assets")
+    else:
+        logger.info("No asset manifest found (run `python assets.py build`); using the Tailwind CDN")
+
+
+# Build
+def tailwind_command():
+    """How to run the Tailwind CLI: TAILWIND_BIN, the standalone binary on PATH, or npx"""
+    if os.getenv('TAILWIND_BIN'):
+        return [os.getenv('TAILWIND_BIN')]
+    if shutil.which('tailwindcss'):
+        return ['tailwindcss']
+    if shutil.which('npx'):
+        return ['npx', '--yes', 'tailwindcss@3.4.17']
+    raise RuntimeError("Tailwind CLI not found: install the standalone binary or Node.js, or set TAILWIND_BIN")
+
+
+def compile_css():
+    """Run Tailwind over templates/ and return the minified CSS"""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, 'app.css')
+        subprocess.run(
+            tailwind_command() + ['-c', TAILWIND_CONFIG, '-i', CSS_INPUT, '-o', output, '--minify'],
+            cwd=BASE_DIR, check=True
+        )
+        with open(output, 'rb') as f:
+            return f.read()
+
+
+def hashed_name(filename, content):
+    """favicon.ico -> favicon.<12 hex chars of sha256>.ico"""
+    root, ext = os.path.splitext(filename)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+
+def _write(relative_name, content):
+    path = os.path.join(DIST_DIR, relative_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def build(css=True):
+    """Rebuild static/dist/ and its manifest; returns the manifest"""
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    manifest = {}
+    for directory, subdirs, files in os.walk(STATIC_DIR):
+        subdirs[:] = [d for d in subdirs if os.path.join(directory, d) != DIST_DIR]
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            filename = os.path.relpath(path, STATIC_DIR).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                content = f.read()
+            target = hashed_name(filename, content)
+            _write(target, content)
+            manifest[filename] = f"{DIST_NAME}/{target}"
+
+    if css:
+        content = compile_css()
+        target = hashed_name('app.css', content)
+        _write(target, content)
+        manifest['app.css'] = f"{DIST_NAME}/{target}"
+
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ['build'] and sys.argv[1:] != ['build', '--no-css']:
+        print("Usage: python assets.py build [--no-css]")
+        sys.exit(1)
+    try:
+        manifest = build(css='--no-css' not in sys.argv)
+    except (RuntimeError, subprocess.CalledProcessError) as e:
+        print(f"❌ Asset build failed: {e}")
+        sys.exit(1)
+    if 'app.css' in manifest:
+        size = os.path.getsize(os.path.join(STATIC_DIR, manifest['app.css']))
+        print(f"[OK] {manifest['app.css']} ({size / 1024:.1f} KB)")
+    print(f"[OK] Wrote {len(manifest)} hashed assets to static/{DIST_NAME}/")
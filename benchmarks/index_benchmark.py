@@ -0,0 +1,187 @@
+"""
+Index Benchmark
+Seeds a scratch database, then shows EXPLAIN plans and timings for the hot
+per-user queries in app.py before and after the schema migrations.
+
+Usage:
+    python benchmarks/index_benchmark.py --vehicles 1000000 --users 1000
+
+Connection settings come from the usual DB_* environment variables; the data
+goes into a separate database (BENCH_DB_NAME, default vehicle_tracker_bench)
+which is dropped and re-created on every run.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector
+import migrate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BRANDS = ['Toyota', 'Honda', 'Ford', 'Nissan', 'Mazda', 'Hyundai', 'Kia', 'Subaru', 'BMW', 'Audi']
+MODELS = ['Corolla', 'Civic', 'Ranger', 'Navara', 'CX-5', 'Tucson', 'Sportage', 'Forester', 'X3', 'A4']
+TYPES = ['Oil Change', 'Tire Rotation', 'Brake Pads', 'Battery', 'Inspection', 'Coolant Flush']
+
+# (label, sql) - %(user_id)s / %(vehicle_id)s are filled in from the seeded data
+HOT_QUERIES = [
+    ('index: list by year', "SELECT * FROM vehicles WHERE user_id = %(user_id)s ORDER BY year DESC"),
+    ('index: count + year range', "SELECT COUNT(*), MIN(year), MAX(year) FROM vehicles WHERE user_id = %(user_id)s"),
+    ('add/edit: duplicate plate', "SELECT id FROM vehicles WHERE user_id = %(user_id)s AND plate_number = %(plate)s"),
+    ('view_vehicle: logs by date', "SELECT * FROM maintenance_logs WHERE vehicle_id = %(vehicle_id)s AND user_id = %(user_id)s ORDER BY maintenance_date DESC"),
+    ('dashboard: log count + cost', "SELECT COUNT(*), SUM(cost) FROM maintenance_logs WHERE user_id = %(user_id)s"),
+]
+
+
+def connect(database=None):
+    return mysql.connector.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', ''),
+        port=int(os.getenv('DB_PORT', '3306')),
+        database=database,
+        autocommit=False,
+    )
+
+
+def create_schema(database):
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+    cursor.execute(f"CREATE DATABASE `{database}`")
+    conn.close()
+
+    conn = connect(database)
+    cursor = conn.cursor()
+    with open(os.path.join(ROOT, 'setup_database.sql'), encoding='utf-8') as f:
+        for statement in migrate.split_statements(f.read()):
+            if statement.upper().startswith('CREATE TABLE'):
+                cursor.execute(statement)
+    conn.commit()
+    return conn
+
+
+def seed(conn, n_users, n_vehicles, logs_per_vehicle, batch_size=5000):
+    """Insert users, vehicles and maintenance logs with executemany in batches"""
+    cursor = conn.cursor()
+    rng = random.Random(42)
+    started = time.perf_counter()
+
+    cursor.executemany(
+        "INSERT INTO users (id, email, password_hash) VALUES (%s, %s, %s)",
+        [(u, f'user{u}@bench.local', 'x') for u in range(1, n_users + 1)]
+    )
+    conn.commit()
+
+    batch = []
+    for vehicle_id in range(1, n_vehicles + 1):
+        user_id = (vehicle_id % n_users) + 1
+        batch.append((vehicle_id, user_id, rng.choice(BRANDS), rng.choice(MODELS),
+                      rng.randint(1995, 2025), f'PLT-{vehicle_id:07d}'))
+        if len(batch) >= batch_size:
+            cursor.executemany("INSERT INTO vehicles (id, user_id, brand, model, year, plate_number) VALUES (%s, %s, %s, %s, %s, %s)", batch)
+            conn.commit()
+            batch = []
+    if batch:
+        cursor.executemany("INSERT INTO vehicles (id, user_id, brand, model, year, plate_number) VALUES (%s, %s, %s, %s, %s, %s)", batch)
+        conn.commit()
+
+    batch = []
+    start_date = date(2015, 1, 1)
+    for vehicle_id in range(1, n_vehicles + 1):
+        user_id = (vehicle_id % n_users) + 1
+        for _ in range(logs_per_vehicle):
+            batch.append((vehicle_id, user_id, rng.choice(TYPES), round(rng.uniform(20, 900), 2),
+                          start_date + timedelta(days=rng.randint(0, 3600))))
+        if len(batch) >= batch_size:
+            cursor.executemany("INSERT INTO maintenance_logs (vehicle_id, user_id, maintenance_type, cost, maintenance_date) VALUES (%s, %s, %s, %s, %s)", batch)
+            conn.commit()
+            batch = []
+    if batch:
+        cursor.executemany("INSERT INTO maintenance_logs (vehicle_id, user_id, maintenance_type, cost, maintenance_date) VALUES (%s, %s, %s, %s, %s)", batch)
+        conn.commit()
+
+    cursor.execute("ANALYZE TABLE users, vehicles, maintenance_logs")
+    cursor.fetchall()
+    print(f"[OK] Seeded {n_users} users, {n_vehicles} vehicles, {n_vehicles * logs_per_vehicle} logs in {time.perf_counter() - started:.1f}s")
+
+
+def measure(conn, params, repeats):
+    """EXPLAIN and time each hot query; returns {label: {...}}"""
+    cursor = conn.cursor(dictionary=True)
+    results = {}
+    for label, sql in HOT_QUERIES:
+        cursor.execute("EXPLAIN " + sql, params)
+        plan = [{k: row.get(k) for k in ('table', 'type', 'key', 'rows', 'Extra')} for row in cursor.fetchall()]
+
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[label] = {
+            'plan': plan,
+            'median_ms': round(statistics.median(timings), 3),
+            'max_ms': round(max(timings), 3),
+        }
+    return results
+
+
+def print_results(title, results):
+    print(f"\n=== {title} ===")
+    for label, result in results.items():
+        print(f"{label:32} median {result['median_ms']:9.3f} ms   max {result['max_ms']:9.3f} ms")
+        for step in result['plan']:
+            print(f"    {step['table']}: type={step['type']} key={step['key']} rows={step['rows']} extra={step['Extra']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--vehicles', type=int, default=1_000_000)
+    parser.add_argument('--logs-per-vehicle', type=int, default=1)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    database = os.getenv('BENCH_DB_NAME', 'vehicle_tracker_bench')
+    conn = create_schema(database)
+    seed(conn, args.users, args.vehicles, args.logs_per_vehicle)
+
+    # Pick an average user and one of their vehicles
+    params = {'user_id': 1 + args.users // 2}
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, plate_number FROM vehicles WHERE user_id = %s LIMIT 1", (params['user_id'],))
+    params['vehicle_id'], params['plate'] = cursor.fetchone()
+
+    before = measure(conn, params, args.repeats)
+    print_results('Before migrations', before)
+
+    migrate.run_migrations(conn)
+    cursor.execute("ANALYZE TABLE vehicles, maintenance_logs")
+    cursor.fetchall()
+
+    after = measure(conn, params, args.repeats)
+    print_results('After migrations', after)
+
+    print("\n=== Speedup (median) ===")
+    for label in before:
+        speedup = before[label]['median_ms'] / max(after[label]['median_ms'], 0.001)
+        print(f"{label:32} {speedup:8.1f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'before': before, 'after': after}, f, indent=2, default=str)
+        print(f"\n[OK] Results written to {args.output}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Load Generator
+Fires concurrent HTTP requests at a running AutoTrack server and reports
+throughput and latency percentiles. Each simulated client is a thread with
+its own keep-alive connection and session cookie.
+
+Usage:
+    python benchmarks/loadgen.py http://localhost:5000 --path / --path /vehicles \\
+        --concurrency 50 --duration 20 --email bench@example.com --password secret123
+
+With --email/--password every client logs in first (the account must exist),
+so login-protected pages can be measured.
+"""
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+import urllib.parse
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(latencies_ms, errors, elapsed):
+    """Throughput and latency summary for one run"""
+    return {
+        'requests': len(latencies_ms),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(len(latencies_ms) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(latencies_ms), 2) if latencies_ms else 0.0,
+        'p50_ms': round(percentile(latencies_ms, 50), 2),
+        'p95_ms': round(percentile(latencies_ms, 95), 2),
+        'p99_ms': round(percentile(latencies_ms, 99), 2),
+        'max_ms': round(max(latencies_ms), 2) if latencies_ms else 0.0,
+    }
+
+
+class Client:
+    """One keep-alive HTTP connection with a cookie jar of one session cookie"""
+
+    def __init__(self, base_url, timeout=30):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        self.https = parsed.scheme == 'https'
+        self.timeout = timeout
+        self.cookie = None
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._conn = cls(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def request(self, method, path, form=None, json_body=None):
+        """Send one request; returns (status, body bytes). Reconnects once on a dropped connection."""
+        headers = {}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_body is not None:
+            body = json.dumps(json_body, separators=(',', ':'))
+            headers['Content-Type'] = 'application/json'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError, OSError):
+                self.close()
+                if attempt:
+                    raise
+        set_cookie = response.getheader('Set-Cookie')
+        if set_cookie:
+            self.cookie = set_cookie.split(';', 1)[0]
+        return response.status, data
+
+    def login(self, email, password):
+        status, _ = self.request('POST', '/login', {'email': email, 'password': password})
+        if status != 302 or not self.cookie:
+            raise RuntimeError(f"Login failed for {email} (HTTP {status})")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def drive(steps, duration=10.0, warmup=2.0):
+    """
+    Run one thread per step function until `duration` seconds after a
+    `warmup` period. step(i) performs one request and returns (label, ok);
+    only requests started after the warmup are recorded.
+
+    Returns:
+        (latencies_ms by label, errors by label)
+    """
+    lock = threading.Lock()
+    latencies = {}
+    errors = {}
+    start_barrier = threading.Barrier(len(steps) + 1)
+    timing = {}
+
+    def worker(step):
+        start_barrier.wait()
+        i = 0
+        while time.perf_counter() < timing['end']:
+            started = time.perf_counter()
+            try:
+                label, ok = step(i)
+            except Exception as e:
+                label, ok = type(e).__name__, False
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            i += 1
+            if started < timing['measure_from']:
+                continue
+            with lock:
+                latencies.setdefault(label, [])
+                errors.setdefault(label, 0)
+                if ok:
+                    latencies[label].append(elapsed_ms)
+                else:
+                    errors[label] += 1
+
+    threads = [threading.Thread(target=worker, args=(step,), daemon=True) for step in steps]
+    for thread in threads:
+        thread.start()
+    now = time.perf_counter()
+    timing['measure_from'] = now + warmup
+    timing['end'] = now + warmup + duration
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def run_load(base_url, paths, concurrency=10, duration=10.0, warmup=2.0, email=None, password=None):
+    """
+    Hit paths round-robin from `concurrency` clients for `duration` seconds
+    (after `warmup` seconds that are not measured).
+
+    Returns:
+        dict with the overall summary plus a per-path breakdown
+    """
+    clients = [Client(base_url) for _ in range(concurrency)]
+    if email:
+        for client in clients:
+            client.login(email, password)
+
+    def make_step(index, client):
+        def step(i):
+            path = paths[(index + i) % len(paths)]
+            try:
+                status, _ = client.request('GET', path)
+            except Exception:
+                return path, False
+            return path, status < 400
+        return step
+
+    latencies, errors = drive([make_step(i, c) for i, c in enumerate(clients)], duration, warmup)
+    for client in clients:
+        client.close()
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    result = summarize(all_latencies, sum(errors.values()), duration)
+    result['concurrency'] = concurrency
+    result['paths'] = {path: summarize(latencies.get(path, []), errors.get(path, 0), duration) for path in paths}
+    return result
+
+
+def print_summary(title, result):
+    print(f"\n=== {title} ===")
+    print(f"{'path':32} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for path, row in result['paths'].items():
+        print(f"{path:32} {row['rps']:9.1f} {row['p50_ms']:9.2f} {row['p95_ms']:9.2f} {row['p99_ms']:9.2f} {row['errors']:7d}")
+    print(f"{'TOTAL':32} {result['rps']:9.1f} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} {result['p99_ms']:9.2f} {result['errors']:7d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base_url')
+    parser.add_argument('--path', action='append', dest='paths', help='Path to request (repeatable, default /)')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--email')
+    parser.add_argument('--password')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    result = run_load(args.base_url, args.paths or ['/'], args.concurrency, args.duration,
+                      args.warmup, args.email, args.password)
+    print_summary(f"{args.base_url} x{args.concurrency}", result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'result': result}, f, indent=2)
+        print(f"\n[OK] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Password Hashing Benchmark
+Measures how many logins (password verifications) per second one core can
+do for each hashing method / work factor, and how that scales with the
+PASSWORD_HASH_WORKERS pool. Use it to choose PASSWORD_HASH_METHOD.
+
+Usage:
+    python benchmarks/password_benchmark.py
+    python benchmarks/password_benchmark.py --method scrypt:16384:8:1 --method pbkdf2:sha256:260000 --threads 4
+
+No database needed.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHODS = [
+    'scrypt:32768:8:1',       # werkzeug's scrypt default
+    'scrypt:16384:8:1',
+    'pbkdf2:sha256:1000000',  # werkzeug 3.1 pbkdf2 default
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:260000',
+]
+
+
+def verifications_per_second(password_hash, password, seconds, threads):
+    """Run check_password_hash on `threads` threads for ~seconds; returns rate"""
+    deadline = time.perf_counter() + seconds
+
+    def loop():
+        count = 0
+        while time.perf_counter() < deadline:
+            check_password_hash(password_hash, password)
+            count += 1
+        return count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        total = sum(executor.map(lambda _: loop(), range(threads)))
+    return total / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--method', action='append', dest='methods', help='werkzeug hash method (repeatable)')
+    parser.add_argument('--threads', type=int, default=min(os.cpu_count() or 1, 4),
+                        help='Pool size for the scaling column (default min(CPUs, 4))')
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    password = 'correct horse battery staple'
+    results = []
+    print(f"{'method':26} {'ms/login':>9} {'logins/s/core':>14} {f'logins/s x{args.threads}':>15}")
+    for method in args.methods or DEFAULT_METHODS:
+        try:
+            password_hash = generate_password_hash(password, method=method)
+        except (ValueError, TypeError) as e:
+            print(f"{method:26} skipped: {e}", file=sys.stderr)
+            continue
+        single = verifications_per_second(password_hash, password, args.seconds, 1)
+        pooled = verifications_per_second(password_hash, password, args.seconds, args.threads)
+        results.append({'method': method, 'ms_per_login': round(1000 / single, 2),
+                        'logins_per_second_per_core': round(single, 1),
+                        'logins_per_second_pooled': round(pooled, 1), 'threads': args.threads})
+        print(f"{method:26} {1000 / single:9.1f} {single:14.1f} {pooled:15.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\n[OK] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+-- Run once when the benchmark primary is created: the account mysql-replica replicates with
+CREATE USER 'repl'@'%' IDENTIFIED BY 'repl';
+GRANT REPLICATION SLAVE ON *.* TO 'repl'@'%';
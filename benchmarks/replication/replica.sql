@@ -0,0 +1,11 @@
+-- Run once when mysql-replica is created: follow the primary from its first
+-- transaction (GTID auto-positioning; both servers start empty)
+CHANGE REPLICATION SOURCE TO
+    SOURCE_HOST = 'mysql',
+    SOURCE_PORT = 3306,
+    SOURCE_USER = 'repl',
+    SOURCE_PASSWORD = 'repl',
+    SOURCE_AUTO_POSITION = 1,
+    SOURCE_CONNECT_RETRY = 2,
+    GET_SOURCE_PUBLIC_KEY = 1;
+START REPLICA;
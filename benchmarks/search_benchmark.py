@@ -0,0 +1,166 @@
+"""
+Search Benchmark
+Times search.search_vehicles() for one very large account (--big-vehicles,
+default 100k) among many ordinary accounts that use the same brand / model
+words, i.e. the case where a shared full-text index would score every
+account's matches first. The target is under 10 ms per search.
+
+    python benchmarks/search_benchmark.py --users 1000 --big-vehicles 100000
+    python benchmarks/search_benchmark.py --skip-seed --compare
+
+--compare also times the query search.py used before migration 0012 (one
+FULLTEXT index over every account, filtered by user_id afterwards) on a
+temporary copy of that index.
+
+Connection settings come from the usual DB_* environment variables; the data
+goes into BENCH_DB_NAME (default vehicle_tracker_bench), which is dropped and
+re-created unless --skip-seed is given.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import search
+from index_benchmark import BRANDS, MODELS, connect
+from seed import bench_database, seed_database
+
+TERMS = ['toyota', 'cor', 'honda civ', 'x3', 'B', 'B1001-00', 'ranger 2', 'zzzz']
+TARGET_MS = 10
+
+
+def add_big_account(conn, vehicles, seed_value=7, batch_size=5000):
+    """One more user with `vehicles` vehicles; returns its id"""
+    rng = random.Random(seed_value)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users")
+    user_id = cursor.fetchone()[0]
+    cursor.execute("INSERT INTO users (id, email, password_hash) VALUES (%s, %s, 'x')",
+                   (user_id, f'big{user_id}@bench.local'))
+    rows = [(user_id, rng.choice(BRANDS), rng.choice(MODELS), rng.randint(1995, 2025), f'B{user_id}-{n:06d}')
+            for n in range(vehicles)]
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany("INSERT INTO vehicles (user_id, brand, model, year, plate_number) VALUES (%s, %s, %s, %s, %s)",
+                           rows[start:start + batch_size])
+        conn.commit()
+    cursor.execute("ANALYZE TABLE vehicles")
+    cursor.fetchall()
+    return user_id
+
+
+def biggest_accounts(conn):
+    """(largest account, a typical one) by vehicle count"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT user_id FROM vehicles GROUP BY user_id ORDER BY COUNT(*) DESC, user_id LIMIT 1")
+    big = cursor.fetchone()[0]
+    cursor.execute("SELECT MIN(user_id) FROM vehicles WHERE user_id <> %s", (big,))
+    small = cursor.fetchone()[0]
+    cursor.close()
+    return big, small
+
+
+def global_index_search(conn, user_id, term, limit):
+    """The pre-0012 full-text query: one index for all accounts, user_id filtered afterwards"""
+    words = [word for word in search.WORD_RE.findall(term) if len(word) >= 3]
+    if not words:
+        return []
+    query = ' '.join(f'+{word}*' for word in words)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT *, MATCH(brand, model, plate_number) AGAINST (%s IN BOOLEAN MODE) AS relevance
+        FROM vehicles
+        WHERE MATCH(brand, model, plate_number) AGAINST (%s IN BOOLEAN MODE) AND user_id = %s
+        ORDER BY relevance DESC, year DESC, id DESC
+        LIMIT %s
+    """, (query, query, user_id, limit))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def time_search(run, conn, user_id, term, limit, repeat):
+    for _ in range(3):
+        run(conn, user_id, term, limit)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        found = run(conn, user_id, term, limit)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {'term': term, 'found': len(found), 'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2)}
+
+
+def run_searches(conn, accounts, limit, repeat, compare):
+    results = []
+    for label, user_id in accounts:
+        for term in TERMS:
+            row = {'account': label, 'user_id': user_id,
+                   **time_search(search.search_vehicles, conn, user_id, term, limit, repeat)}
+            if compare:
+                before = time_search(global_index_search, conn, user_id, term, limit, repeat)
+                row['global_index_median_ms'] = before['median_ms']
+            results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--vehicles-per-user', type=int, default=25)
+    parser.add_argument('--big-vehicles', type=int, default=100000)
+    parser.add_argument('--skip-seed', action='store_true', help='Reuse the existing benchmark database')
+    parser.add_argument('--limit', type=int, default=24, help='Results per search (the garage page size)')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--compare', action='store_true', help='Also time the pre-0012 shared-index query')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        seed_database(args.users, args.vehicles_per_user, 0)
+        conn = connect(bench_database())
+        add_big_account(conn, args.big_vehicles)
+        conn.close()
+        print(f"[OK] Added an account with {args.big_vehicles} vehicles")
+
+    conn = connect(bench_database())
+    big, small = biggest_accounts(conn)
+    cursor = conn.cursor()
+    if args.compare:
+        cursor.execute("ALTER TABLE vehicles ADD FULLTEXT INDEX ft_bench_global (brand, model, plate_number)")
+    try:
+        results = run_searches(conn, [('big', big), ('typical', small)], args.limit, args.repeat, args.compare)
+    finally:
+        if args.compare:
+            cursor.execute("ALTER TABLE vehicles DROP INDEX ft_bench_global")
+        conn.close()
+
+    print(f"{'account':>8} {'term':>10} {'found':>6} {'median ms':>10} {'p95 ms':>8}"
+          + (f" {'before ms':>10}" if args.compare else ''))
+    for row in results:
+        print(f"{row['account']:>8} {row['term']:>10} {row['found']:6d} {row['median_ms']:10.2f} {row['p95_ms']:8.2f}"
+              + (f" {row['global_index_median_ms']:10.2f}" if args.compare else ''))
+    slow = [row for row in results if row['p95_ms'] >= TARGET_MS]
+    worst = max(results, key=lambda row: row['p95_ms'])
+    print(f"\nWorst p95: {worst['p95_ms']:.2f} ms ({worst['account']} account, {worst['term']!r}), target {TARGET_MS} ms")
+    if slow:
+        print(f"[SLOW] {len(slow)} of {len(results)} searches had a p95 of {TARGET_MS} ms or more")
+    else:
+        print(f"[OK] Every search under {TARGET_MS} ms (p95)")
+
+    if args.output:
+        summary = {'target_ms': TARGET_MS, 'worst_p95_ms': worst['p95_ms'], 'target_met': not slow}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'summary': summary, 'results': results}, f, indent=2)
+        print(f"[OK] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark Seeder
+Creates a scratch database with the full schema (setup_database.sql plus
+all migrations) and fills it with N users, their vehicles and maintenance logs.
+
+Usage:
+    python benchmarks/seed.py --users 200 --vehicles-per-user 25 --logs-per-vehicle 12
+
+Every user can log in as user<N>@bench.local with the password from
+--password (default bench-password). The data is deterministic for a given
+--seed, so runs against a fresh seed are comparable.
+
+Connection settings come from the usual DB_* environment variables; the data
+goes into BENCH_DB_NAME (default vehicle_tracker_bench), which is dropped and
+re-created on every run.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrate
+import passwords
+from index_benchmark import BRANDS, MODELS, TYPES, create_schema
+
+DEFAULT_PASSWORD = 'bench-password'
+
+
+def bench_database():
+    return os.getenv('BENCH_DB_NAME', 'vehicle_tracker_bench')
+
+
+def user_email(user_id):
+    return f'user{user_id}@bench.local'
+
+
+def _insert(cursor, conn, sql, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany(sql, rows[start:start + batch_size])
+        conn.commit()
+
+
+def seed(conn, n_users, vehicles_per_user, logs_per_vehicle, password=DEFAULT_PASSWORD, seed_value=42, batch_size=5000):
+    """Insert users, vehicles and logs; returns row counts"""
+    rng = random.Random(seed_value)
+    cursor = conn.cursor()
+    started = time.perf_counter()
+
+    # One hash for everybody (PASSWORD_HASH_METHOD) - hashing is deliberately slow
+    password_hash = passwords.hash_password(password)
+    _insert(cursor, conn, "INSERT INTO users (id, email, password_hash) VALUES (%s, %s, %s)",
+            [(u, user_email(u), password_hash) for u in range(1, n_users + 1)], batch_size)
+
+    vehicles = []
+    vehicle_id = 0
+    for user_id in range(1, n_users + 1):
+        for n in range(vehicles_per_user):
+            vehicle_id += 1
+            vehicles.append((vehicle_id, user_id, rng.choice(BRANDS), rng.choice(MODELS),
+                             rng.randint(1995, 2025), f'B{user_id}-{n:04d}'))
+    _insert(cursor, conn, "INSERT INTO vehicles (id, user_id, brand, model, year, plate_number) VALUES (%s, %s, %s, %s, %s, %s)",
+            vehicles, batch_size)
+
+    start_date = date(2015, 1, 1)
+    logs = []
+    for vehicle in vehicles:
+        for _ in range(logs_per_vehicle):
+            logs.append((vehicle[0], vehicle[1], rng.choice(TYPES), round(rng.uniform(20, 900), 2),
+                         start_date + timedelta(days=rng.randint(0, 3600))))
+        if len(logs) >= batch_size:
+            _insert(cursor, conn, "INSERT INTO maintenance_logs (vehicle_id, user_id, maintenance_type, cost, maintenance_date) VALUES (%s, %s, %s, %s, %s)",
+                    logs, batch_size)
+            logs = []
+    _insert(cursor, conn, "INSERT INTO maintenance_logs (vehicle_id, user_id, maintenance_type, cost, maintenance_date) VALUES (%s, %s, %s, %s, %s)",
+            logs, batch_size)
+
+    counts = {'users': n_users, 'vehicles': len(vehicles), 'logs': len(vehicles) * logs_per_vehicle}
+    print(f"[OK] Seeded {counts['users']} users, {counts['vehicles']} vehicles, {counts['logs']} logs "
+          f"in {time.perf_counter() - started:.1f}s")
+    return counts
+
+
+def seed_database(n_users, vehicles_per_user, logs_per_vehicle, password=DEFAULT_PASSWORD, seed_value=42):
+    """Drop / create the benchmark database, seed it and apply every migration"""
+    database = bench_database()
+    conn = create_schema(database)
+    counts = seed(conn, n_users, vehicles_per_user, logs_per_vehicle, password, seed_value)
+    # Migrations after seeding, so their backfills (user_stats) see the data
+    migrate.run_migrations(conn, verbose=False)
+    cursor = conn.cursor()
+    cursor.execute("ANALYZE TABLE users, vehicles, maintenance_logs, user_stats, maintenance_monthly")
+    cursor.fetchall()
+    conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--vehicles-per-user', type=int, default=25)
+    parser.add_argument('--logs-per-vehicle', type=int, default=12)
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    seed_database(args.users, args.vehicles_per_user, args.logs_per_vehicle, args.password, args.seed)
+    print(f"[OK] Database {bench_database()} is ready")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Serving Mode Comparison
+Starts the app under gunicorn once per SERVING_MODE (sync, gevent - see
+gunicorn.conf.py) with the same number of workers, drives each with
+benchmarks/loadgen.py at increasing concurrency, and prints throughput and
+latency side by side.
+
+Usage:
+    python benchmarks/serving_modes.py --workers 2 --concurrency 10 --concurrency 100
+
+Uses the database from the usual DB_* environment variables (run
+setup_database.py / migrate.py first). A benchmark account is created on
+first use (--email / --password).
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadgen import Client, run_load, print_summary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATHS = ['/', '/dashboard', '/vehicles', '/vehicles?search=toy']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, workers, port):
+    env = dict(os.environ, SERVING_MODE=mode, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn ({mode}) exited:\n{process.stderr.read().decode(errors='replace')}")
+        try:
+            urllib.request.urlopen(base_url + '/pool-stats', timeout=1).read()
+            return process, base_url
+        except OSError:
+            time.sleep(0.3)
+    process.terminate()
+    raise RuntimeError(f"gunicorn ({mode}) did not start within 30s")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def ensure_account(base_url, email, password):
+    client = Client(base_url)
+    client.request('POST', '/signup', {'email': email, 'password': password})
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', action='append', dest='modes', choices=['sync', 'gevent'],
+                        help='Serving mode to test (repeatable, default both)')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', action='append', type=int, dest='levels',
+                        help='Concurrent clients (repeatable, default 10 and 100)')
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--path', action='append', dest='paths', help=f'Path to request (repeatable, default {DEFAULT_PATHS})')
+    parser.add_argument('--email', default='bench@autotrack.local')
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    modes = args.modes or ['sync', 'gevent']
+    levels = args.levels or [10, 100]
+    paths = args.paths or DEFAULT_PATHS
+
+    results = {}
+    for mode in modes:
+        process, base_url = start_server(mode, args.workers, free_port())
+        try:
+            ensure_account(base_url, args.email, args.password)
+            for level in levels:
+                result = run_load(base_url, paths, concurrency=level, duration=args.duration,
+                                  email=args.email, password=args.password)
+                results[f"{mode}@{level}"] = result
+                print_summary(f"{mode}, {args.workers} worker(s), {level} clients", result)
+        finally:
+            stop_server(process)
+
+    print("\n=== Comparison ===")
+    print(f"{'mode':10} {'clients':>8} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for level in levels:
+        for mode in modes:
+            row = results[f"{mode}@{level}"]
+            print(f"{mode:10} {level:8d} {row['rps']:9.1f} {row['p50_ms']:9.2f} {row['p95_ms']:9.2f} {row['p99_ms']:9.2f} {row['errors']:7d}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\n[OK] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
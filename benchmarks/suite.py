@@ -0,0 +1,299 @@
+"""
+Benchmark Suite
+Seeds a benchmark database, runs scripted scenarios against the app and
+saves throughput / latency percentiles as JSON that can be compared between
+runs to catch regressions.
+
+Usage:
+    # MySQL in a container (or point DB_* at any MySQL/MariaDB you can drop a database on)
+    docker compose -f benchmarks/docker-compose.yml up -d
+    export DB_HOST=127.0.0.1 DB_PORT=3307 DB_USER=root DB_PASSWORD=bench
+
+    python benchmarks/suite.py seed --users 200 --vehicles-per-user 25
+    python benchmarks/suite.py run                                   # app in-process (Flask test client)
+    python benchmarks/suite.py run --target http://localhost:5000    # a running server (gunicorn, Railway, ...)
+    python benchmarks/suite.py compare benchmarks/results/old.json benchmarks/results/new.json
+
+`run` writes benchmarks/results/run-<timestamp>.json unless --output is given.
+`compare` exits with status 1 when any scenario got slower than --threshold
+percent (lower rps or higher p95), so it can gate CI.
+
+In-process runs import app.py with DB_NAME pointed at the benchmark
+database, so they measure the Flask app and MySQL without HTTP overhead.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import urllib.parse
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+import loadgen
+import seed as seeder
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+SEARCH_TERMS = ['Toyota', 'Civic', 'B1-00', 'Ford Ranger', 'Mazda']
+
+
+class Scenario:
+    """
+    One benchmarked interaction. request(ctx, i) returns (method, path, form)
+    for the i-th iteration of a simulated client.
+    """
+
+    def __init__(self, request, login=True, fresh_session=False, description=''):
+        self.request = request
+        self.login = login
+        self.fresh_session = fresh_session
+        self.description = description
+
+
+def _vehicle(ctx, i):
+    return ctx['vehicle_ids'][i % len(ctx['vehicle_ids'])]
+
+
+SCENARIOS = {
+    'home': Scenario(lambda ctx, i: ('GET', '/', None), login=False,
+                     description='Landing page (cached global totals)'),
+    'login': Scenario(lambda ctx, i: ('POST', '/login', {'email': ctx['email'], 'password': ctx['password']}),
+                      login=False, fresh_session=True, description='Password check + session cookie'),
+    'dashboard': Scenario(lambda ctx, i: ('GET', '/dashboard', None),
+                          description='Per-user stats'),
+    'index': Scenario(lambda ctx, i: ('GET', '/vehicles', None),
+                      description='First page of the garage'),
+    'index_search': Scenario(lambda ctx, i: ('GET', f"/vehicles?search={urllib.parse.quote(SEARCH_TERMS[i % len(SEARCH_TERMS)])}", None),
+                             description='Garage search (plate prefix + FULLTEXT)'),
+    'view_vehicle': Scenario(lambda ctx, i: ('GET', f"/vehicle/{_vehicle(ctx, i)}", None),
+                             description='Vehicle page with first page of logs'),
+    'export_csv': Scenario(lambda ctx, i: ('GET', '/export/csv', None),
+                           description='Streaming CSV of all vehicles'),
+    'add_vehicle': Scenario(lambda ctx, i: ('POST', '/add_vehicle', {
+                                'brand': 'Bench', 'model': 'Writer', 'year': '2020',
+                                'plate': f"W{ctx['run_tag']}-{ctx['worker']}-{i}"}),
+                            description='Insert vehicle + stats row'),
+    'edit_vehicle': Scenario(lambda ctx, i: ('POST', f"/edit_vehicle/{ctx['vehicle_ids'][0]}", {
+                                 'brand': 'Toyota' if i % 2 else 'Honda', 'model': 'Corolla',
+                                 'year': str(2000 + i % 20), 'plate': ctx['plates'][0]}),
+                             description='Update vehicle (year change refreshes stats range)'),
+    'add_maintenance': Scenario(lambda ctx, i: ('POST', f"/add_maintenance/{_vehicle(ctx, i)}", {
+                                    'maintenance_type': 'Oil Change', 'description': 'bench',
+                                    'cost': '49.90', 'maintenance_date': '2024-05-01'}),
+                                description='Insert maintenance log + stats row'),
+}
+READ_SCENARIOS = ['home', 'dashboard', 'index', 'index_search', 'view_vehicle', 'export_csv', 'login']
+WRITE_SCENARIOS = ['add_vehicle', 'edit_vehicle', 'add_maintenance']
+
+
+class HttpClient(loadgen.Client):
+    def reset_session(self):
+        self.cookie = None
+
+
+class InProcessClient:
+    """Same interface as loadgen.Client, backed by Flask's test client"""
+
+    def __init__(self, app):
+        self._app = app
+        self._client = app.test_client()
+
+    def request(self, method, path, form=None):
+        response = self._client.open(path, method=method, data=form)
+        body = response.get_data()
+        response.close()
+        return response.status_code, body
+
+    def login(self, email, password):
+        status, _ = self.request('POST', '/login', {'email': email, 'password': password})
+        if status != 302:
+            raise RuntimeError(f"Login failed for {email} (HTTP {status})")
+
+    def reset_session(self):
+        self._client = self._app.test_client()
+
+    def close(self):
+        pass
+
+
+def load_fixtures(max_users):
+    """Users and their vehicles from the benchmark database"""
+    conn = seeder.connect(seeder.bench_database())
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE email LIKE %s ORDER BY id LIMIT %s", ('%@bench.local', max_users))
+    user_ids = [row[0] for row in cursor.fetchall()]
+    if not user_ids:
+        raise SystemExit("[ERROR] The benchmark database has no users - run `suite.py seed` first")
+    fixtures = {}
+    for user_id in user_ids:
+        cursor.execute("SELECT id, plate_number FROM vehicles WHERE user_id = %s ORDER BY id LIMIT 50", (user_id,))
+        rows = cursor.fetchall()
+        fixtures[user_id] = {'vehicle_ids': [row[0] for row in rows], 'plates': [row[1] for row in rows]}
+    conn.close()
+    return fixtures
+
+
+def make_client_factory(target):
+    if target == 'inprocess':
+        os.environ['DB_NAME'] = seeder.bench_database()
+        from app import app
+        app.config['TESTING'] = True
+        return lambda: InProcessClient(app)
+    return lambda: HttpClient(target)
+
+
+def run_scenario(name, new_client, fixtures, concurrency, duration, warmup, password, run_tag):
+    scenario = SCENARIOS[name]
+    user_ids = list(fixtures)
+    steps = []
+    clients = []
+    for worker in range(concurrency):
+        # Writers get a user each so they don't contend on one user_stats row
+        user_id = user_ids[worker % len(user_ids)]
+        ctx = dict(fixtures[user_id], email=seeder.user_email(user_id), password=password,
+                   worker=worker, run_tag=run_tag)
+        client = new_client()
+        if scenario.login:
+            client.login(ctx['email'], password)
+        clients.append(client)
+
+        def step(i, client=client, ctx=ctx):
+            if scenario.fresh_session:
+                client.reset_session()
+            method, path, form = scenario.request(ctx, i)
+            status, _ = client.request(method, path, form)
+            return name, status < 400
+        steps.append(step)
+
+    latencies, errors = loadgen.drive(steps, duration, warmup)
+    for client in clients:
+        client.close()
+    result = loadgen.summarize(latencies.get(name, []), sum(errors.values()), duration)
+    result['concurrency'] = concurrency
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def command_seed(args):
+    seeder.seed_database(args.users, args.vehicles_per_user, args.logs_per_vehicle, args.password, args.seed)
+
+
+def command_run(args):
+    names = args.scenarios or (READ_SCENARIOS + ([] if args.skip_writes else WRITE_SCENARIOS))
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"[ERROR] Unknown scenario(s): {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    fixtures = load_fixtures(max(args.concurrency, 1))
+    new_client = make_client_factory(args.target)
+    run_tag = datetime.now().strftime('%H%M%S')
+
+    results = {}
+    print(f"{'scenario':16} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name in names:
+        result = run_scenario(name, new_client, fixtures, args.concurrency, args.duration,
+                              args.warmup, args.password, run_tag)
+        results[name] = result
+        print(f"{name:16} {result['rps']:9.1f} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} "
+              f"{result['p99_ms']:9.2f} {result['errors']:7d}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"run-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'meta': {
+                'started_at': datetime.now().isoformat(timespec='seconds'),
+                'git_revision': git_revision(),
+                'target': args.target,
+                'concurrency': args.concurrency,
+                'duration_s': args.duration,
+                'database': seeder.bench_database(),
+                'python': platform.python_version(),
+                'host': platform.node(),
+            },
+            'scenarios': results,
+        }, f, indent=2)
+    print(f"\n[OK] Results written to {output}")
+
+
+def compare(old, new, threshold):
+    """Rows of (scenario, old, new, rps change %, p95 change %, regressed)"""
+    rows = []
+    for name, before in old['scenarios'].items():
+        after = new['scenarios'].get(name)
+        if after is None:
+            continue
+        rps_change = (after['rps'] - before['rps']) / before['rps'] * 100 if before['rps'] else 0.0
+        p95_change = (after['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+        regressed = rps_change < -threshold or p95_change > threshold
+        rows.append((name, before, after, rps_change, p95_change, regressed))
+    return rows
+
+
+def command_compare(args):
+    with open(args.old, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+
+    print(f"old: {args.old} ({old['meta'].get('git_revision')})")
+    print(f"new: {args.new} ({new['meta'].get('git_revision')})\n")
+    print(f"{'scenario':16} {'rps old':>9} {'rps new':>9} {'change':>8}   {'p95 old':>9} {'p95 new':>9} {'change':>8}")
+    rows = compare(old, new, args.threshold)
+    for name, before, after, rps_change, p95_change, regressed in rows:
+        flag = '  <-- REGRESSION' if regressed else ''
+        print(f"{name:16} {before['rps']:9.1f} {after['rps']:9.1f} {rps_change:+7.1f}%   "
+              f"{before['p95_ms']:9.2f} {after['p95_ms']:9.2f} {p95_change:+7.1f}%{flag}")
+
+    regressions = [row[0] for row in rows if row[5]]
+    if regressions:
+        print(f"\n[WARN] {len(regressions)} scenario(s) regressed by more than {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\n[OK] No scenario regressed by more than {args.threshold}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='Create and fill the benchmark database')
+    seed_parser.add_argument('--users', type=int, default=200)
+    seed_parser.add_argument('--vehicles-per-user', type=int, default=25)
+    seed_parser.add_argument('--logs-per-vehicle', type=int, default=12)
+    seed_parser.add_argument('--password', default=seeder.DEFAULT_PASSWORD)
+    seed_parser.add_argument('--seed', type=int, default=42)
+
+    run_parser = commands.add_parser('run', help='Run scenarios and save results as JSON')
+    run_parser.add_argument('--target', default='inprocess', help='"inprocess" or the base URL of a running server')
+    run_parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help=f"Scenario to run (repeatable, default all: {', '.join(SCENARIOS)})")
+    run_parser.add_argument('--skip-writes', action='store_true', help='Only run read scenarios (and login)')
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--duration', type=float, default=10)
+    run_parser.add_argument('--warmup', type=float, default=2)
+    run_parser.add_argument('--password', default=seeder.DEFAULT_PASSWORD)
+    run_parser.add_argument('--output', help='Results file (default benchmarks/results/run-<timestamp>.json)')
+
+    compare_parser = commands.add_parser('compare', help='Compare two result files')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=10.0, help='Allowed slowdown in percent (default 10)')
+
+    args = parser.parse_args()
+    {'seed': command_seed, 'run': command_run, 'compare': command_compare}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
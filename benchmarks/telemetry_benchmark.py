@@ -0,0 +1,192 @@
+"""
+Telemetry Ingestion Benchmark
+Measures sustained readings/sec into vehicle_readings (telemetry.py).
+
+    direct - feeds the write-behind buffer in-process and times until every
+             reading is in MySQL (raw table and downsampled tiers): the
+             ceiling of the multi-row INSERT path
+    query  - times timeseries.query() for 1 day .. 1 year of one vehicle's
+             history, cold (cache bypassed)
+    http   - POSTs batches to /api/v1/telemetry of a running server from
+             --concurrency clients: the end-to-end rate including JSON,
+             validation and the buffer (run it against gunicorn, not app.py)
+
+Usage:
+    python benchmarks/seed.py --users 10
+    python benchmarks/telemetry_benchmark.py direct --readings 200000 --vehicles 50 --span-days 365
+    python benchmarks/telemetry_benchmark.py query
+    python benchmarks/telemetry_benchmark.py http http://localhost:5000 \\
+        --email user1@bench.local --password bench-password --concurrency 4 --batch 1000 --duration 20
+
+direct and query use the seeded BENCH_DB_NAME database. The target is 10k+
+readings/sec on one node.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import telemetry
+import timeseries
+from index_benchmark import connect
+from loadgen import Client, drive, summarize
+from seed import bench_database
+
+
+def reading_times(count, offset, stride, start, interval_ms=1):
+    """count distinct timestamps (interval_ms apart per stride) so no reading is a duplicate"""
+    return [start + timedelta(milliseconds=(offset + i * stride) * interval_ms) for i in range(count)]
+
+
+def run_direct(readings, vehicles, batch, insert_rows, span_days):
+    conn = connect(bench_database())
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM vehicles ORDER BY id LIMIT %s", (vehicles,))
+    vehicle_ids = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    if not vehicle_ids:
+        raise RuntimeError("No vehicles in the bench database - run benchmarks/seed.py first")
+
+    buffer = telemetry.ReadingBuffer(insert_rows=insert_rows, connect=lambda: connect(bench_database()))
+    start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=span_days)
+    # Spread the readings over span_days, round-robin over the vehicles
+    interval_ms = max(1, int(span_days * 86400 * 1000 / readings))
+    busy_waits = 0
+    started = time.perf_counter()
+    for offset in range(0, readings, batch):
+        count = min(batch, readings - offset)
+        rows = [(vehicle_ids[(offset + i) % len(vehicle_ids)], ts, 1000.0 + (offset + i) / 1000, 14.5, 121.0, 50.0)
+                for i, ts in enumerate(reading_times(count, offset, 1, start, interval_ms))]
+        while True:
+            try:
+                buffer.add(rows)
+                break
+            except telemetry.TelemetryBusy:
+                busy_waits += 1
+                time.sleep(0.01)
+    while buffer.written < readings:
+        if buffer.flush_errors:
+            raise RuntimeError("Flush failed - is migration 0009 applied to the bench database?")
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    result = {'readings': readings, 'vehicles': len(vehicle_ids), 'elapsed_s': round(elapsed, 3),
+              'readings_per_second': round(readings / elapsed, 1), 'busy_waits': busy_waits}
+    result.update(buffer.stats())
+    return result
+
+
+def run_query(repeat):
+    conn = connect(bench_database())
+    cursor = conn.cursor()
+    cursor.execute("SELECT vehicle_id FROM vehicle_readings_1d GROUP BY vehicle_id ORDER BY SUM(samples) DESC LIMIT 1")
+    row = cursor.fetchone()
+    cursor.close()
+    if row is None:
+        raise RuntimeError("No telemetry in the bench database - run the direct mode first")
+    end = datetime.now(timezone.utc).replace(tzinfo=None)
+    results = []
+    for days, points in ((1, 288), (7, 169), (30, 31), (365, 53), (365, 500)):
+        tier, start, stop, step = timeseries.plan(end - timedelta(days=days), end, points)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            series = timeseries._load_series(conn, row[0], tier, start, stop, step)
+            timings.append((time.perf_counter() - started) * 1000)
+        results.append({'days': days, 'points': points, 'tier': series['tier'], 'returned': len(series['points']),
+                        'median_ms': round(sorted(timings)[len(timings) // 2], 2)})
+    conn.close()
+    return {'vehicle_id': row[0], 'ranges': results}
+
+
+def run_http(base_url, email, password, concurrency, batch, duration, warmup):
+    clients = [Client(base_url) for _ in range(concurrency)]
+    for client in clients:
+        client.login(email, password)
+    status, body = clients[0].request('GET', '/api/v1/vehicles?per_page=100&fields=id')
+    vehicle_ids = [item['id'] for item in json.loads(body).get('data', [])] if status == 200 else []
+    if not vehicle_ids:
+        raise RuntimeError(f"{email} has no vehicles (HTTP {status})")
+
+    start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=1)
+    lock = threading.Lock()
+    busy = [0]
+
+    def make_step(index, client):
+        def step(i):
+            times = reading_times(batch, i * batch * concurrency + index, concurrency, start)
+            readings = [{'vehicle_id': vehicle_ids[(i + j) % len(vehicle_ids)],
+                         'ts': ts.isoformat(timespec='milliseconds') + 'Z',
+                         'odometer_km': 1000 + j / 10, 'lat': 14.5, 'lon': 121.0, 'speed_kmh': 50}
+                        for j, ts in enumerate(times)]
+            status, _ = client.request('POST', '/api/v1/telemetry', json_body={'readings': readings})
+            if status == 503:
+                with lock:
+                    busy[0] += 1
+            return 'POST /api/v1/telemetry', status in (201, 202)
+        return step
+
+    latencies, errors = drive([make_step(i, c) for i, c in enumerate(clients)], duration, warmup)
+    for client in clients:
+        client.close()
+    result = summarize(latencies.get('POST /api/v1/telemetry', []), sum(errors.values()), duration)
+    result['readings_per_second'] = round(result['rps'] * batch, 1)
+    result['busy_responses'] = busy[0]
+    result['batch'] = batch
+    result['concurrency'] = concurrency
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='mode', required=True)
+    direct = sub.add_parser('direct')
+    direct.add_argument('--readings', type=int, default=200000)
+    direct.add_argument('--vehicles', type=int, default=50)
+    direct.add_argument('--batch', type=int, default=1000)
+    direct.add_argument('--insert-rows', type=int, default=telemetry.TELEMETRY_INSERT_ROWS)
+    direct.add_argument('--span-days', type=float, default=1, help='Spread the readings over this many days')
+    query = sub.add_parser('query')
+    query.add_argument('--repeat', type=int, default=20)
+    http = sub.add_parser('http')
+    http.add_argument('base_url')
+    http.add_argument('--email', required=True)
+    http.add_argument('--password', required=True)
+    http.add_argument('--concurrency', type=int, default=4)
+    http.add_argument('--batch', type=int, default=1000)
+    http.add_argument('--duration', type=float, default=20)
+    http.add_argument('--warmup', type=float, default=2)
+    for sub_parser in (direct, query, http):
+        sub_parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    if args.mode == 'direct':
+        result = run_direct(args.readings, args.vehicles, args.batch, args.insert_rows, args.span_days)
+        print(f"{result['readings']} readings for {result['vehicles']} vehicles in {result['elapsed_s']}s: "
+              f"{result['readings_per_second']:.0f} readings/s ({result['flushes']} flushes)")
+    elif args.mode == 'query':
+        result = run_query(args.repeat)
+        print(f"{'range':>8} {'points':>7} {'tier':>5} {'returned':>9} {'median ms':>10}")
+        for row in result['ranges']:
+            print(f"{row['days']:>7}d {row['points']:7d} {row['tier']:>5} {row['returned']:9d} {row['median_ms']:10.2f}")
+    else:
+        result = run_http(args.base_url, args.email, args.password, args.concurrency,
+                          args.batch, args.duration, args.warmup)
+        print(f"{result['readings_per_second']:.0f} readings/s accepted "
+              f"({result['rps']:.1f} batches/s of {args.batch}, p50 {result['p50_ms']:.1f} ms, "
+              f"p99 {result['p99_ms']:.1f} ms, {result['errors']} errors, {result['busy_responses']} busy)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'result': result}, f, indent=2)
+        print(f"\n[OK] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Read-through cache for per-user lookups (vehicle rows, maintenance log pages,
+user stats and data versions).
+
+Backends (CACHE_BACKEND):
+    local  - in-process LRU with TTL (default; one copy per gunicorn worker)
+    redis  - shared across workers/instances, needs the `redis` package and CACHE_URL
+    none   - caching disabled
+
+Write routes call the invalidate_* helpers *after* commit. A local cache
+only sees the invalidations of its own process, which is every one of them
+with a single gunicorn worker (WEB_CONCURRENCY=1, the default with the local
+backend). With several workers and a local cache (is_coherent() is False)
+per-user entries that a write elsewhere could make stale are either not
+cached (vehicle rows, stats, data versions) or keyed by the user's data
+version read from MySQL (log pages). Cached values are shared between
+requests, so treat them as read-only.
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = float(os.getenv('CACHE_TTL', 60))
+# Gunicorn worker processes (gunicorn.conf.py: one unless set, with the local backend)
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
+
+
+class _Counters:
+    """Hit / miss counters shared by all backends"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {'hits': 0, 'misses': 0, 'sets': 0, 'deletes': 0, 'evictions': 0, 'errors': 0}
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.values[name] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.values)
+
+
+class LocalCache:
+    """Thread-safe in-process LRU cache with per-entry expiry"""
+
+    backend = 'local'
+
+    def __init__(self, max_entries=10000, default_ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.counters = _Counters()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.counters.incr('hits')
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+        self.counters.incr('misses')
+        return None
+
+    def get_many(self, keys):
+        """{key: value} for the keys that are cached"""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[1]
+        self.counters.incr('hits', len(found))
+        self.counters.incr('misses', len(keys) - len(found))
+        return found
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, mapping, ttl=None):
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        self.counters.incr('sets', len(mapping))
+        if evicted:
+            self.counters.incr('evictions', evicted)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        self.counters.incr('deletes', len(keys))
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return {'backend': self.backend, 'entries': size, 'max_entries': self.max_entries, **self.counters.snapshot()}
+
+
+class RedisCache:
+    """Shared cache on Redis; values are pickled. Errors degrade to cache misses."""
+
+    backend = 'redis'
+
+    def __init__(self, url, default_ttl=DEFAULT_TTL, prefix='autotrack:'):
+        import redis  # optional dependency
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.counters = _Counters()
+
+    def get(self, key):
+        try:
+            data = self._client.get(self.prefix + key)
+        except Exception as e:
+            self.counters.incr('errors')
+            logger.warning(f"Cache get failed: {str(e)}")
+            data = None
+        if data is None:
+            self.counters.incr('misses')
+            return None
+        self.counters.incr('hits')
+        return pickle.loads(data)
+
+    def get_many(self, keys):
+        """{key: value} for the keys that are cached, in one round trip"""
+        if not keys:
+            return {}
+        try:
+            values = self._client.mget([self.prefix + key for key in keys])
+        except Exception as e:
+            self.counters.incr('errors')
+            logger.warning(f"Cache get failed: {str(e)}")
+            values = [None] * len(keys)
+        found = {key: pickle.loads(data) for key, data in zip(keys, values) if data is not None}
+        self.counters.incr('hits', len(found))
+        self.counters.incr('misses', len(keys) - len(found))
+        return found
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        try:
+            self._client.set(self.prefix + key, pickle.dumps(value), px=max(1, int(ttl * 1000)))
+            self.counters.incr('sets')
+        except Exception as e:
+            self.counters.incr('errors')
+            logger.warning(f"Cache set failed: {str(e)}")
+
+    def set_many(self, mapping, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        try:
+            pipeline = self._client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipeline.set(self.prefix + key, pickle.dumps(value), px=max(1, int(ttl * 1000)))
+            pipeline.execute()
+            self.counters.incr('sets', len(mapping))
+        except Exception as e:
+            self.counters.incr('errors')
+            logger.warning(f"Cache set failed: {str(e)}")
+
+    def delete(self, *keys):
+        try:
+            self._client.delete(*[self.prefix + key for key in keys])
+            self.counters.incr('deletes', len(keys))
+        except Exception as e:
+            self.counters.incr('errors')
+            logger.warning(f"Cache delete failed: {str(e)}")
+
+    def stats(self):
+        return {'backend': self.backend, **self.counters.snapshot()}
+
+
+class NullCache:
+    """Caching disabled: every get is a miss"""
+
+    backend = 'none'
+
+    def __init__(self):
+        self.counters = _Counters()
+
+    def get(self, key):
+        self.counters.incr('misses')
+        return None
+
+    def get_many(self, keys):
+        self.counters.incr('misses', len(keys))
+        return {}
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def set_many(self, mapping, ttl=None):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def stats(self):
+        return {'backend': self.backend, **self.counters.snapshot()}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """The configured cache backend for this process"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                backend = os.getenv('CACHE_BACKEND', 'local').lower()
+                if backend == 'redis':
+                    _cache = RedisCache(os.getenv('CACHE_URL', 'redis://localhost:6379/0'))
+                elif backend == 'none':
+                    _cache = NullCache()
+                else:
+                    _cache = LocalCache(max_entries=int(os.getenv('CACHE_MAX_ENTRIES', 10000)))
+    return _cache
+
+
+def is_coherent():
+    """
+    Whether invalidate_* reach every copy of a cached value: the cache is
+    shared by all workers, or it is local to the only one
+    """
+    return get_cache().backend != 'local' or WEB_CONCURRENCY <= 1
+
+
+def get_or_load(key, loader, ttl=None):
+    """
+    Return the cached value for key, or call loader(), cache and return its result.
+    None results (e.g. "not found") are not cached.
+    """
+    cache = get_cache()
+    value = cache.get(key)
+    if value is None:
+        value = loader()
+        if value is not None:
+            cache.set(key, value, ttl)
+    return value
+
+
+# Keys
+def vehicle_key(user_id, vehicle_id):
+    return f"vehicle:{user_id}:{vehicle_id}"
+
+
+def stats_key(user_id):
+    return f"stats:{user_id}"
+
+
+def version_key(user_id):
+    return f"version:{user_id}"
+
+
+def _logs_generation_key(user_id, vehicle_id):
+    return f"logs-gen:{user_id}:{vehicle_id}"
+
+
+def maintenance_page_key(user_id, vehicle_id, page_cursor, per_page, version=None):
+    """
+    Key for one page of a vehicle's maintenance logs. Pages are keyed under a
+    per-vehicle generation, so bumping the generation invalidates every page
+    at once (works the same on Redis, without key scans).
+
+    With per-process caches in several workers pass the user's data version
+    instead: other workers never see the bumped generation, but they do read
+    the new version.
+    """
+    if version is not None:
+        return f"logs:{user_id}:{vehicle_id}:v{version}:{page_cursor or ''}:{per_page}"
+    generation = get_or_load(_logs_generation_key(user_id, vehicle_id), time.time_ns, ttl=24 * 3600)
+    return f"logs:{user_id}:{vehicle_id}:{generation}:{page_cursor or ''}:{per_page}"
+
+
+# Invalidation (call after commit)
+def invalidate_user(user_id):
+    """The user's counts changed (vehicle added, import, ...)"""
+    get_cache().delete(stats_key(user_id), version_key(user_id))
+
+
+def invalidate_vehicle(user_id, vehicle_id):
+    """A vehicle was edited or deleted (its logs go with it)"""
+    cache = get_cache()
+    cache.delete(vehicle_key(user_id, vehicle_id))
+    # A fresh time-based generation never collides with an older one, even after eviction
+    cache.set(_logs_generation_key(user_id, vehicle_id), time.time_ns(), ttl=24 * 3600)
+    invalidate_user(user_id)
+
+
+def invalidate_maintenance(user_id, vehicle_id):
+    """A maintenance log was added to or removed from a vehicle"""
+    get_cache().set(_logs_generation_key(user_id, vehicle_id), time.time_ns(), ttl=24 * 3600)
+    invalidate_user(user_id)
+
+
+def get_cache_stats():
+    return get_cache().stats()
@@ -0,0 +1,293 @@
+"""
+Request-scoped database access for the Flask app.
+
+    conn = db.get_db()          # cheap: nothing is checked out yet
+    cursor = conn.cursor()      # first query takes a connection from the pool
+
+    result = db.run_in_transaction(lambda conn: ...)   # commit / rollback / retry
+
+- One connection per request, kept on flask.g and opened lazily, so requests
+  served entirely from cache never touch the pool
+- Released before a template is rendered (and, at the latest, on teardown),
+  so connection hold time doesn't include Jinja or a slow client
+- run_in_transaction() retries the unit of work on deadlocks, lock wait
+  timeouts and lost connections
+- get_read_db(user_id) is a second lazy handle for heavy read-only queries,
+  served by a read replica when DB_REPLICAS is set (replicas.py). It falls
+  back to get_db() when this request or this session committed a write in
+  the last DB_READ_AFTER_WRITE seconds (read-your-writes), and when the
+  replica hasn't caught up with the user's data_version yet
+- With DB_SHARDS (shards.py) get_db() is the logged-in user's shard;
+  get_db(shards.MAIN) reaches users and sessions. Writes of a user who is
+  being moved between shards raise shards.UserMoving
+"""
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+from flask import g, has_app_context, has_request_context, before_render_template, session
+
+from db_config import get_db_connection
+import instrumentation
+import replicas
+import shards
+import stats
+
+logger = logging.getLogger(__name__)
+
+TX_RETRIES = int(os.getenv('DB_TX_RETRIES', 3))
+TX_RETRY_DELAY = float(os.getenv('DB_TX_RETRY_DELAY', 0.05))
+
+# MySQL error codes worth retrying the whole transaction for
+DEADLOCK_ERRORS = {
+    1205,  # ER_LOCK_WAIT_TIMEOUT
+    1213,  # ER_LOCK_DEADLOCK
+}
+CONNECTION_ERRORS = {
+    2006,  # CR_SERVER_GONE_ERROR
+    2013,  # CR_SERVER_LOST
+    2055,  # CR_SERVER_LOST_EXTENDED
+}
+
+# Session key holding the time of the session's last committed write
+WRITE_MARKER = 'db_wrote_at'
+
+
+class RequestConnection:
+    """
+    Lazy handle on the request's connection.
+
+    Looks like a regular connection, but nothing is checked out of the pool
+    until the first cursor() (or other attribute access). commit() and
+    rollback() on a handle that never opened are no-ops.
+    """
+
+    def __init__(self, connect=get_db_connection):
+        self._connect = connect
+        self._conn = None
+
+    @property
+    def opened(self):
+        return self._conn is not None
+
+    def _connection(self):
+        if self._conn is None:
+            started = time.perf_counter()
+            self._conn = self._connect()
+            instrumentation.record_connect(time.perf_counter() - started)
+        return self._conn
+
+    def open(self):
+        """Check out the connection now (to fail early, e.g. before streaming a response)"""
+        self._connection()
+        return self
+
+    def cursor(self, *args, **kwargs):
+        return instrumentation.wrap_cursor(self._connection().cursor(*args, **kwargs))
+
+    def commit(self):
+        if self._conn is not None:
+            self._conn.commit()
+            if has_request_context():
+                g.db_wrote = True
+
+    def rollback(self):
+        if self._conn is not None:
+            self._conn.rollback()
+
+    def release(self):
+        """Hand the connection back (uncommitted work is rolled back by the pool)"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            try:
+                conn.close()
+            except Exception as e:
+                logger.warning(f"Error releasing database connection: {str(e)}")
+
+    # Routes and helpers written for plain connections call close()
+    close = release
+
+    def __getattr__(self, name):
+        return getattr(self._connection(), name)
+
+
+def get_db(shard=None):
+    """
+    The current request's (lazy) database connection: to the logged-in user's
+    shard, or to the named one (shards.MAIN for users and sessions). Without
+    DB_SHARDS both are the same connection.
+    """
+    if not has_app_context():
+        raise RuntimeError("get_db() needs an app or request context; use db_config.get_db_connection()")
+    if shard is None:
+        shard = current_placement().shard
+    conns = g.setdefault('db_conns', {})
+    if shard not in conns:
+        conns[shard] = RequestConnection() if shard == shards.MAIN else RequestConnection(
+            connect=lambda: shards.connection(shard))
+    return conns[shard]
+
+
+def current_placement():
+    """Shard of the logged-in user (looked up once per request; main when logged out)"""
+    if not shards.enabled() or not has_request_context():
+        return shards.MAIN_PLACEMENT
+    if 'db_placement' not in g:
+        user_id = session.get('user_id')
+        g.db_placement = shards.placement(get_db(shards.MAIN), user_id) if user_id else shards.MAIN_PLACEMENT
+    return g.db_placement
+
+
+def check_writable():
+    """Raise shards.UserMoving while the logged-in user's rows are being moved to another shard"""
+    if current_placement().moving:
+        raise shards.UserMoving("Your data is being moved; please try again in a minute.")
+
+
+def get_read_db(user_id=None):
+    """
+    The current request's (lazy) connection for read-only queries: a replica
+    when one is in rotation, otherwise the same connection as get_db().
+
+    Pass the user whose rows are read: the replica is only used once it has
+    caught up with that user's latest committed write, compared against the
+    primary's data_version (one uncached primary key lookup on each side per
+    request). That holds whichever session, worker or client made the write;
+    the WRITE_MARKER pin only spares recent writers the check.
+    """
+    # Replicas are replicas of the main shard
+    if not replicas.enabled() or current_placement().shard != shards.MAIN:
+        return get_db()
+    if g.get('db_wrote') or time.time() - session.get(WRITE_MARKER, 0) < replicas.DB_READ_AFTER_WRITE:
+        replicas.record_read('pinned_reads')
+        return get_db()
+    if 'db_read_conn' not in g:
+        g.db_read_conn = RequestConnection(connect=replicas.get_read_connection)
+    conn = g.db_read_conn
+    if user_id is not None and not _caught_up(conn, user_id):
+        replicas.record_read('behind_reads')
+        return get_db()
+    return conn
+
+
+def _caught_up(conn, user_id):
+    """Whether the read connection has seen the user's latest data_version on the primary (checked once per request)"""
+    checked = g.setdefault('db_read_checked', {})
+    if user_id not in checked:
+        try:
+            # Never the cached version: a worker's copy may predate the latest write
+            checked[user_id] = stats.read_data_version(conn, user_id) >= stats.read_data_version(get_db(), user_id)
+        except Exception as e:
+            logger.warning(f"Read connection check failed, reading from the primary: {str(e)}")
+            conn.release()
+            checked[user_id] = False
+    return checked[user_id]
+
+
+def release_db(exception=None):
+    """Release the request's connections early (they are reopened if used again)"""
+    if not has_app_context():
+        return
+    for conn in list(g.get('db_conns', {}).values()) + [g.get('db_read_conn')]:
+        if conn is not None:
+            conn.release()
+
+
+def _stamp_write(response):
+    """Remember when this session last wrote, so its next reads stay on the primary"""
+    if g.get('db_wrote') and replicas.enabled():
+        session[WRITE_MARKER] = time.time()
+    return response
+
+
+def is_retryable(error):
+    return isinstance(error, mysql.connector.Error) and error.errno in DEADLOCK_ERRORS | CONNECTION_ERRORS
+
+
+@contextmanager
+def transaction(shard=None):
+    """
+    One unit of work on the request's connection: commit when the block
+    finishes, roll back if it raises. No retries - see run_in_transaction().
+    """
+    if shard is None:
+        check_writable()
+    conn = get_db(shard)
+    try:
+        yield conn
+    except BaseException:
+        _rollback(conn)
+        raise
+    conn.commit()
+
+
+def run_in_transaction(work, retries=None, shard=None):
+    """
+    Call work(conn) inside a transaction and commit, retrying the whole unit
+    on deadlocks, lock wait timeouts and lost connections.
+
+    work must do all of its reads and writes through conn (it may run more
+    than once) and should leave side effects such as cache invalidation or
+    flash messages to the caller. A failing COMMIT is not retried: after a
+    lost connection the outcome of the commit is unknown.
+
+    Runs on the logged-in user's shard (refused with shards.UserMoving while
+    it is being moved), or on `shard` - shards.MAIN for users / sessions.
+
+    Returns:
+        Whatever work returned
+    """
+    if shard is None:
+        check_writable()
+    return _retrying(lambda: get_db(shard), work, retries)
+
+
+def run_on_connection(conn, work, retries=None):
+    """
+    run_in_transaction() for scripts without an app context (e.g. the
+    imports.py command line): the same commit / rollback / retry, on conn.
+    """
+    return _retrying(lambda: conn, work, retries)
+
+
+def _retrying(connect, work, retries):
+    retries = TX_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        conn = connect()
+        try:
+            result = work(conn)
+        except Exception as e:
+            _rollback(conn)
+            if attempt >= retries or not is_retryable(e):
+                raise
+            delay = TX_RETRY_DELAY * (2 ** attempt) * (0.5 + random.random())
+            logger.warning(f"Retrying transaction after MySQL error {e.errno} "
+                           f"(attempt {attempt + 1}/{retries}, waiting {delay * 1000:.0f}ms)")
+            time.sleep(delay)
+            continue
+        conn.commit()
+        return result
+
+
+def _rollback(conn):
+    try:
+        conn.rollback()
+    except Exception:
+        # Connection is unusable - release it so the pool discards it and the
+        # next query (or retry) gets a fresh one
+        if isinstance(conn, RequestConnection):
+            conn.release()
+
+
+def _release_before_render(sender, template, context, **extra):
+    release_db()
+
+
+def init_app(app):
+    """Release the request connections before rendering and on teardown; stamp writes on the session"""
+    before_render_template.connect(_release_before_render, app)
+    app.after_request(_stamp_write)
+    app.teardown_appcontext(release_db)
@@ -0,0 +1,222 @@
+"""
+Streaming data exports.
+
+Rows are read from an unbuffered cursor with fetchmany() and encoded chunk by
+chunk, so memory use stays flat no matter how many rows are exported. The
+connection must stay open until the generator finishes - routes close it in
+the generator's finally block rather than in their own.
+"""
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+DEFAULT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 1000))
+
+
+def iter_chunks(cursor, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of rows from an executed cursor, chunk_size at a time"""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+
+def stream_csv(header, chunks, to_row):
+    """
+    Encode row chunks as CSV text.
+    
+    Args:
+        header: List of column titles
+        chunks: Iterable of row lists (e.g. iter_chunks(cursor))
+        to_row: Function mapping a database row to a list of CSV values
+    
+    Yields:
+        str: One CSV chunk per input chunk (the header comes first)
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue()
+    
+    for chunk in chunks:
+        buffer.seek(0)
+        buffer.truncate(0)
+        for row in chunk:
+            writer.writerow(to_row(row))
+        yield buffer.getvalue()
+
+
+def format_datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+
+# Maintenance history export (maintenance_logs joined to vehicles)
+MAINTENANCE_EXPORT_COLUMNS = [
+    'log_id', 'vehicle_id', 'brand', 'model', 'year', 'plate_number',
+    'maintenance_type', 'description', 'cost', 'maintenance_date', 'created_at'
+]
+MAINTENANCE_EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def iter_maintenance_pages(conn, user_id, start_date=None, end_date=None, vehicle_ids=None,
+                           page_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield pages of a user's maintenance history joined to vehicle details.
+    
+    Uses keyset pagination over (vehicle_id, maintenance_date, id) instead of
+    OFFSET, so every page is an index range scan no matter how deep the export is.
+    
+    Args:
+        conn: Open database connection
+        user_id: Owner of the logs
+        start_date / end_date: Optional inclusive maintenance_date bounds
+        vehicle_ids: Optional list of vehicle IDs to restrict to
+        page_size: Rows per page
+    """
+    cursor = conn.cursor(dictionary=True)
+    filters = ["ml.user_id = %s"]
+    filter_params = [user_id]
+    if vehicle_ids:
+        filters.append(f"ml.vehicle_id IN ({', '.join(['%s'] * len(vehicle_ids))})")
+        filter_params.extend(vehicle_ids)
+    if start_date:
+        filters.append("ml.maintenance_date >= %s")
+        filter_params.append(start_date)
+    if end_date:
+        filters.append("ml.maintenance_date <= %s")
+        filter_params.append(end_date)
+    
+    last_key = None
+    while True:
+        conditions = list(filters)
+        params = list(filter_params)
+        if last_key:
+            # (vehicle_id, maintenance_date, id) > last_key, spelled out so MySQL uses a range scan
+            conditions.append(
+                "(ml.vehicle_id > %s OR (ml.vehicle_id = %s AND (ml.maintenance_date > %s"
+                " OR (ml.maintenance_date = %s AND ml.id > %s))))"
+            )
+            vehicle_id, maintenance_date, log_id = last_key
+            params.extend([vehicle_id, vehicle_id, maintenance_date, maintenance_date, log_id])
+        
+        cursor.execute(f"""
+            SELECT ml.id AS log_id, ml.vehicle_id, v.brand, v.model, v.year, v.plate_number,
+                   ml.maintenance_type, ml.description, ml.cost, ml.maintenance_date, ml.created_at
+            FROM maintenance_logs ml
+            JOIN vehicles v ON v.id = ml.vehicle_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY ml.vehicle_id, ml.maintenance_date, ml.id
+            LIMIT %s
+        """, params + [page_size])
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        yield rows
+        if len(rows) < page_size:
+            break
+        last = rows[-1]
+        last_key = (last['vehicle_id'], last['maintenance_date'], last['log_id'])
+    cursor.close()
+
+
+def maintenance_csv_row(row):
+    return [
+        row['log_id'], row['vehicle_id'], row['brand'], row['model'], row['year'], row['plate_number'],
+        row['maintenance_type'], row['description'] or '',
+        row['cost'] if row['cost'] is not None else '',
+        row['maintenance_date'].isoformat() if row['maintenance_date'] else '',
+        format_datetime(row['created_at'])
+    ]
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def stream_ndjson(chunks, columns=MAINTENANCE_EXPORT_COLUMNS):
+    """Encode row chunks as newline-delimited JSON, one object per row"""
+    for chunk in chunks:
+        yield ''.join(
+            json.dumps({column: row[column] for column in columns}, default=_json_default) + '\n'
+            for row in chunk
+        )
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class _ParquetSink(io.RawIOBase):
+    """Write-only file object that hands back whatever was written since the last drain()"""
+    
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def stream_parquet(chunks):
+    """
+    Encode row chunks as a Parquet file, one row group per chunk (requires pyarrow).
+    
+    Each row group is yielded as soon as it is written; the footer comes last.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = pa.schema([
+        ('log_id', pa.int64()),
+        ('vehicle_id', pa.int64()),
+        ('brand', pa.string()),
+        ('model', pa.string()),
+        ('year', pa.int32()),
+        ('plate_number', pa.string()),
+        ('maintenance_type', pa.string()),
+        ('description', pa.string()),
+        ('cost', pa.decimal128(10, 2)),
+        ('maintenance_date', pa.date32()),
+        ('created_at', pa.timestamp('s')),
+    ])
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for chunk in chunks:
+            columns = {name: [row[name] for row in chunk] for name in schema.names}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,86 @@
+"""
+Template fragment caching for list rows (vehicle cards, maintenance log rows).
+
+    {{ render_rows('_vehicle_card.html', vehicles, 'v') }}
+
+renders templates/_vehicle_card.html once per row with the row available as
+`v`, and keeps the HTML in the cache (cache.py) under
+
+    fragment:<template>:<template hash>:<row id>:<row updated_at>
+
+so a page re-renders only rows that changed since they were last shown.
+Every change to a row bumps its updated_at (migration 0007), and editing the
+partial changes its hash, so cached HTML never needs explicit invalidation.
+All missing rows are looked up in one get_many (one round trip on Redis).
+
+Partials must depend on nothing but the row: no session, flashes, or
+request arguments. Rows without updated_at are rendered uncached.
+
+Settings: FRAGMENT_CACHE (default on), FRAGMENT_CACHE_TTL (seconds, default 3600).
+"""
+import hashlib
+import os
+import threading
+
+from flask import current_app
+from markupsafe import Markup
+
+import cache
+
+FRAGMENT_CACHE = os.getenv('FRAGMENT_CACHE', '1').lower() not in ('0', 'false', 'off')
+FRAGMENT_CACHE_TTL = float(os.getenv('FRAGMENT_CACHE_TTL', 3600))
+
+_template_hashes = {}
+_template_hashes_lock = threading.Lock()
+
+
+def _template_hash(env, template_name):
+    """Short hash of the partial's source, so edits invalidate its fragments"""
+    digest = _template_hashes.get(template_name)
+    # With template auto-reload (debug) re-hash every time, so edits show up
+    if digest is None or env.auto_reload:
+        source, _, _ = env.loader.get_source(env, template_name)
+        digest = hashlib.sha1(source.encode('utf-8')).hexdigest()[:10]
+        with _template_hashes_lock:
+            _template_hashes[template_name] = digest
+    return digest
+
+
+def fragment_key(template_name, template_hash, row):
+    """Cache key for one rendered row, or None if the row can't be versioned"""
+    updated_at = row.get('updated_at')
+    if updated_at is None or row.get('id') is None:
+        return None
+    version = updated_at.isoformat() if hasattr(updated_at, 'isoformat') else str(updated_at)
+    return f"fragment:{template_name}:{template_hash}:{row['id']}:{version}"
+
+
+def render_rows(template_name, rows, name):
+    """Concatenated HTML of template_name rendered for each row (as `name`), cached per row"""
+    env = current_app.jinja_env
+    template = env.get_template(template_name)
+    if not FRAGMENT_CACHE:
+        return Markup(''.join(template.render({name: row}) for row in rows))
+
+    template_hash = _template_hash(env, template_name)
+    keys = [fragment_key(template_name, template_hash, row) for row in rows]
+    store = cache.get_cache()
+    cached = store.get_many([key for key in keys if key is not None])
+
+    parts = []
+    rendered = {}
+    for row, key in zip(rows, keys):
+        html = cached.get(key) if key is not None else None
+        if html is None:
+            html = template.render({name: row})
+            if key is not None:
+                rendered[key] = html
+        parts.append(html)
+    if rendered:
+        store.set_many(rendered, FRAGMENT_CACHE_TTL)
+    return Markup(''.join(parts))
+
+
+def init_app(app):
+    """Make render_rows() available in templates"""
+    app.jinja_env.globals['render_rows'] = render_rows
@@ -0,0 +1,40 @@
+"""
+Gunicorn settings (loaded by the Procfile: gunicorn --config gunicorn.conf.py app:app)
+
+SERVING_MODE picks how each worker handles concurrent requests:
+
+    sync    - one request at a time per worker process (default, the original setup)
+    gevent  - cooperative worker: the same Flask routes, but while a request
+              waits on MySQL (or a slow client) the worker serves others, so
+              one process keeps GEVENT_CONNECTIONS requests in flight.
+              Needs `gevent` (requirements.txt); MySQL calls go through the
+              pure-Python driver so they yield instead of blocking the worker.
+
+Run `python benchmarks/serving_modes.py` to compare the two on your hardware.
+
+WEB_CONCURRENCY defaults to one worker, as with plain `gunicorn app:app`.
+Only with a cache every worker shares (CACHE_BACKEND=redis, or none) does
+it default to 2 x CPUs + 1 (at most 4): invalidations in a local cache
+(cache.py) and memory sessions (sessions.py) stay inside one process.
+"""
+import multiprocessing
+import os
+
+serving_mode = os.getenv('SERVING_MODE', 'sync').lower()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+shared_state = (os.getenv('CACHE_BACKEND', 'local').lower() in ('redis', 'none')
+                and os.getenv('SESSION_BACKEND', 'cookie').lower() != 'memory')
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 4) if shared_state else 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+
+if serving_mode == 'gevent':
+    worker_class = 'gevent'
+    worker_connections = int(os.getenv('GEVENT_CONNECTIONS', 100))
+    # Many requests now share one worker's pool - let it grow unless configured
+    os.environ.setdefault('DB_POOL_SIZE', '20')
+    os.environ.setdefault('DB_POOL_TIMEOUT', '5')
+else:
+    worker_class = 'sync'
@@ -0,0 +1,227 @@
+"""
+HTTP caching and compression for pages, the JSON API and static files.
+
+- gzip (or brotli, if the optional `brotli` package is installed) for text
+  responses the client accepts it for. Static files are compressed once per
+  file and kept in memory; streamed responses (exports) are left alone
+- static/ is served with Cache-Control max-age STATIC_MAX_AGE (hashed files
+  from assets.py get a year + immutable instead)
+- @etag_page: conditional GET for logged-in HTML pages. The weak ETag is
+  derived from the user's data version, so a matching If-None-Match gets 304
+  without running the view. The version comes from the cache, which every
+  write invalidates, so a 304 needs no database connection at all - except
+  with a local cache in several workers (cache.is_coherent() is False): then
+  it is read from MySQL (one primary key lookup), since another worker's
+  write doesn't reach this worker's copy. Pages that show flashed messages
+  are never cached
+- cached_document(): build a constant response body (e.g. the web app
+  manifest) once per process, with an ETag
+
+Settings: COMPRESSION (default on), COMPRESS_MIN_BYTES (500),
+STATIC_MAX_AGE (seconds, default 86400).
+"""
+import gzip
+import hashlib
+import logging
+import os
+import threading
+from datetime import date
+from functools import wraps
+
+from flask import current_app, g, message_flashed, request, session
+from werkzeug.security import safe_join
+
+import db
+import stats
+
+try:
+    import brotli  # optional dependency
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION = os.getenv('COMPRESSION', '1').lower() not in ('0', 'false', 'off')
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 500))
+STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', 86400))
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/manifest+json',
+    'application/x-ndjson', 'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon',
+}
+
+# Changes with every deploy that changes templates or assets, so page ETags do too
+_page_version = ''
+
+# (path, mtime_ns, size, encoding) -> compressed bytes
+_static_compressed = {}
+_static_lock = threading.Lock()
+
+_documents = {}
+_documents_lock = threading.Lock()
+
+
+def _compute_page_version(app):
+    digest = hashlib.sha1()
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    for directory, _, files in sorted(os.walk(template_dir)):
+        for name in sorted(files):
+            with open(os.path.join(directory, name), 'rb') as f:
+                digest.update(f.read())
+    manifest = os.getenv('ASSETS_MANIFEST') or os.path.join(app.static_folder, 'dist', 'manifest.json')
+    if os.path.exists(manifest):
+        with open(manifest, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def data_version_etag(user_id):
+    """
+    Weak ETag value for the current request of a logged-in user: changes when
+    their vehicles / logs change, with the URL (query string included), with
+    the deployed templates and daily.
+    """
+    # stats.get_data_version() doesn't cache it in one of several local caches:
+    # a copy that missed another worker's write would answer 304 with the old page
+    version = stats.get_data_version(db.get_db(), user_id)
+    # The date too: some pages show date-relative data (the dashboard's last 12 months)
+    raw = f"{user_id}:{version}:{request.full_path}:{_page_version}:{date.today().isoformat()}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:24]
+
+
+def _on_flash(sender, message, category, **extra):
+    g.page_flashed = True
+
+
+def etag_page(f):
+    """
+    Conditional GET for a login_required HTML page that only shows the user's
+    own data. Put it below @login_required.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        # A pending flash would be lost in a 304 - render the page as usual
+        if '_flashes' in session:
+            return f(*args, **kwargs)
+        etag = data_version_etag(session['user_id'])
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.make_response(f(*args, **kwargs))
+            # Only cache plain successful renders (no error / "not found" flash, no redirect)
+            if response.status_code != 200 or g.get('page_flashed'):
+                return response
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
+
+
+def cached_document(name, build, mimetype, max_age=86400):
+    """
+    Response for a body that only changes on deploy. build() runs once per
+    process; the bytes and their ETag are reused and If-None-Match gets 304.
+    """
+    document = _documents.get(name)
+    if document is None:
+        with _documents_lock:
+            document = _documents.get(name)
+            if document is None:
+                body = build()
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                document = (body, hashlib.sha1(body).hexdigest()[:16])
+                _documents[name] = document
+    body, etag = document
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(data, encoding, best=False):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else 5)
+    return gzip.compress(data, compresslevel=9 if best else 6)
+
+
+def _compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+def _static_body(encoding):
+    """Compressed bytes of the static file being served, compressed once per file version"""
+    path = safe_join(current_app.static_folder, request.view_args['filename'])
+    if path is None or not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size, encoding)
+    body = _static_compressed.get(key)
+    if body is None:
+        with open(path, 'rb') as f:
+            data = f.read()
+        body = _compress(data, encoding, best=True)
+        if len(body) >= len(data):
+            body = b''  # not worth it; remembered so we don't retry
+        with _static_lock:
+            _static_compressed[key] = body
+    return body or None
+
+
+def _compress_response(response):
+    if not COMPRESSION or response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    if not _compressible(response) or 'no-transform' in response.headers.get('Cache-Control', ''):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    if request.endpoint == 'static':
+        if (response.content_length or 0) < COMPRESS_MIN_BYTES:
+            return response
+        body = _static_body(encoding)
+        if body is None:
+            return response
+        # Replaces the open file send_file handed over
+        if hasattr(response.response, 'close'):
+            response.response.close()
+        response.direct_passthrough = False
+        response.headers.pop('Accept-Ranges', None)
+    elif response.is_streamed or response.direct_passthrough:
+        return response
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        body = _compress(data, encoding)
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # Same entity, different bytes: keep ETag matching for If-None-Match, but weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    """Register compression and static caching (call before other after_request hooks)"""
+    global _page_version
+    _page_version = _compute_page_version(app)
+    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = STATIC_MAX_AGE
+    message_flashed.connect(_on_flash, app)
+    # after_request hooks run in reverse order: registered first, this runs last
+    app.after_request(_compress_response)
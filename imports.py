@@ -0,0 +1,323 @@
+"""
+Bulk CSV import for vehicles and maintenance logs.
+
+Rows are validated with the same rules as the forms, checked against the
+user's existing plates (loaded once), and inserted with executemany() in
+batches - one transaction per batch - instead of one commit per row.
+
+- Each batch runs through db.run_in_transaction() (db.run_on_connection()
+  from the command line), so deadlocks and lock wait timeouts are retried
+  like every other write
+- If a batch still fails, its rows are inserted one at a time so only the
+  offending rows are reported; the MySQL error is logged, the user gets a
+  plain message
+
+Usage (command line):
+    python imports.py vehicles fleet.csv --email owner@example.com
+    python imports.py maintenance history.csv --email owner@example.com
+
+CSV columns:
+    vehicles:     brand, model, year, plate_number (or plate)
+    maintenance:  plate_number (or vehicle_id), maintenance_type, maintenance_date,
+                  cost (optional), description (optional)
+"""
+import argparse
+import csv
+import logging
+import os
+import sys
+from decimal import Decimal
+
+import mysql.connector
+
+from validation import validate_vehicle_data, validate_maintenance_data
+import db
+import stats
+import rollups
+import cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 500))
+IMPORT_KINDS = ('vehicles', 'maintenance')
+
+
+class ImportReport:
+    """Outcome of an import: how many rows went in, and why the others didn't"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.inserted = 0
+        self.errors = []  # [(line_number, [messages])]
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    def add_error(self, line_number, messages):
+        self.errors.append((line_number, messages if isinstance(messages, list) else [messages]))
+
+    def as_dict(self):
+        return {
+            'kind': self.kind,
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'errors': [{'line': line, 'messages': messages} for line, messages in self.errors],
+        }
+
+
+def _field(row, *names):
+    """First non-empty value among the given column names, stripped"""
+    for name in names:
+        value = row.get(name)
+        if value is not None and str(value).strip():
+            return str(value).strip()
+    return ''
+
+
+def _plate_key(plate):
+    # The plate_number column uses a case-insensitive collation
+    return plate.strip().lower()
+
+
+def _row_error(error):
+    """What to tell the user about a row MySQL refused (the details go to the log)"""
+    if isinstance(error, mysql.connector.IntegrityError):
+        return "Could not be saved: it duplicates an existing record or its vehicle no longer exists."
+    if isinstance(error, mysql.connector.DataError):
+        return "Could not be saved: a value is too long or out of range."
+    return "Could not be saved because of a database error; please import this row again."
+
+
+def _save_batch(transact, insert, batch, report):
+    """
+    insert(conn, batch) in one transaction. If that fails, insert the rows one
+    at a time so a bad row only costs itself.
+
+    Returns:
+        The (line_number, values) items that were saved
+    """
+    try:
+        transact(lambda conn: insert(conn, batch))
+        report.inserted += len(batch)
+        return list(batch)
+    except mysql.connector.Error as e:
+        logger.warning(f"Import batch of {len(batch)} {report.kind} row(s) failed, retrying row by row: {e}")
+
+    saved = []
+    for item in batch:
+        try:
+            transact(lambda conn: insert(conn, [item]))
+        except mysql.connector.Error as e:
+            logger.warning(f"Import of {report.kind} line {item[0]} failed: {e}")
+            report.add_error(item[0], _row_error(e))
+            continue
+        saved.append(item)
+    report.inserted += len(saved)
+    return saved
+
+
+def _fetch(transact, query, params):
+    def read(conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+    return transact(read)
+
+
+def import_vehicles(transact, user_id, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import vehicle rows for one user.
+
+    Args:
+        transact: Runs work(conn) in a retried transaction - db.run_in_transaction
+        user_id: Owner of the new vehicles
+        rows: Iterable of dicts (e.g. csv.DictReader)
+        batch_size: Rows per INSERT batch / transaction
+
+    Returns:
+        ImportReport
+    """
+    report = ImportReport('vehicles')
+    known_plates = {_plate_key(plate) for (plate,) in
+                    _fetch(transact, "SELECT plate_number FROM vehicles WHERE user_id = %s", (user_id,))}
+
+    batch = []  # [(line_number, values)]
+
+    def insert(conn, items):
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(
+                "INSERT INTO vehicles (user_id, brand, model, year, plate_number) VALUES (%s, %s, %s, %s, %s)",
+                [values for _, values in items]
+            )
+        finally:
+            cursor.close()
+        stats.record_vehicles_added(conn, user_id, [values[3] for _, values in items])
+
+    def flush():
+        if not batch:
+            return
+        saved = _save_batch(transact, insert, batch, report)
+        if saved:
+            cache.invalidate_user(user_id)
+        saved_lines = {line_number for line_number, _ in saved}
+        for line_number, values in batch:
+            if line_number not in saved_lines:
+                known_plates.discard(_plate_key(values[4]))
+        batch.clear()
+
+    # Line 1 is the header
+    for line_number, row in enumerate(rows, start=2):
+        brand = _field(row, 'brand')
+        model = _field(row, 'model')
+        year = _field(row, 'year')
+        plate = _field(row, 'plate_number', 'plate')
+
+        errors = validate_vehicle_data(brand, model, year, plate)
+        if not errors and _plate_key(plate) in known_plates:
+            errors = ["A vehicle with this plate number already exists."]
+        if errors:
+            report.add_error(line_number, errors)
+            continue
+
+        known_plates.add(_plate_key(plate))
+        batch.append((line_number, (user_id, brand, model, int(year), plate)))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    return report
+
+
+def import_maintenance(transact, user_id, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import maintenance log rows for one user. Each row names its vehicle by
+    plate_number (or vehicle_id); the user's vehicles are loaded once up front.
+
+    Returns:
+        ImportReport
+    """
+    report = ImportReport('maintenance')
+    vehicle_by_plate = {}
+    vehicle_ids = set()
+    for vehicle_id, plate in _fetch(transact, "SELECT id, plate_number FROM vehicles WHERE user_id = %s", (user_id,)):
+        vehicle_by_plate[_plate_key(plate)] = vehicle_id
+        vehicle_ids.add(vehicle_id)
+
+    batch = []  # [(line_number, values)]
+
+    def insert(conn, items):
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(
+                """INSERT INTO maintenance_logs
+                   (vehicle_id, user_id, maintenance_type, description, cost, maintenance_date)
+                   VALUES (%s, %s, %s, %s, %s, %s)""",
+                [values for _, values in items]
+            )
+        finally:
+            cursor.close()
+        total_cost = sum((values[4] for _, values in items if values[4] is not None), Decimal('0'))
+        stats.record_logs_added(conn, user_id, len(items), total_cost)
+        rollups.record_logs_added(conn, user_id, [(values[0], values[2], values[5], values[4]) for _, values in items])
+
+    def flush():
+        if not batch:
+            return
+        for vehicle_id in {values[0] for _, values in _save_batch(transact, insert, batch, report)}:
+            cache.invalidate_maintenance(user_id, vehicle_id)
+        batch.clear()
+
+    for line_number, row in enumerate(rows, start=2):
+        maintenance_type = _field(row, 'maintenance_type', 'type')
+        maintenance_date = _field(row, 'maintenance_date', 'date')
+        cost = _field(row, 'cost')
+        description = _field(row, 'description')
+        plate = _field(row, 'plate_number', 'plate')
+        raw_vehicle_id = _field(row, 'vehicle_id')
+
+        errors = validate_maintenance_data(maintenance_type, maintenance_date, cost)
+        if len(description) > 65535:
+            errors.append("Description is too long.")
+
+        vehicle_id = None
+        if plate:
+            vehicle_id = vehicle_by_plate.get(_plate_key(plate))
+        elif raw_vehicle_id.isdigit() and int(raw_vehicle_id) in vehicle_ids:
+            vehicle_id = int(raw_vehicle_id)
+        if vehicle_id is None:
+            errors.append("Vehicle not found (give a plate_number or vehicle_id you own).")
+
+        if errors:
+            report.add_error(line_number, errors)
+            continue
+
+        cost_value = Decimal(cost) if cost else None
+        batch.append((line_number, (vehicle_id, user_id, maintenance_type, description or None, cost_value, maintenance_date)))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    return report
+
+
+def run_import(transact, user_id, kind, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Dispatch to import_vehicles / import_maintenance by kind; errors come back in line order"""
+    if kind == 'vehicles':
+        report = import_vehicles(transact, user_id, rows, batch_size)
+    elif kind == 'maintenance':
+        report = import_maintenance(transact, user_id, rows, batch_size)
+    else:
+        raise ValueError(f"Unknown import kind: {kind}")
+    report.errors.sort(key=lambda error: error[0])
+    return report
+
+
+def main():
+    import shards
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('kind', choices=IMPORT_KINDS)
+    parser.add_argument('csv_file')
+    parser.add_argument('--email', required=True, help='Email of the account to import into')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    # Accounts are on the main shard, their vehicles and logs on the user's shard
+    main_conn = shards.connection(shards.MAIN)
+    try:
+        cursor = main_conn.cursor()
+        cursor.execute("SELECT id FROM users WHERE email = %s", (args.email.strip().lower(),))
+        user = cursor.fetchone()
+        cursor.close()
+        if not user:
+            print(f"❌ No account with email {args.email}")
+            sys.exit(1)
+        placement = shards.placement(main_conn, user[0])
+    finally:
+        main_conn.close()
+    if placement.moving:
+        print("❌ The account is being moved to another shard; try again later")
+        sys.exit(1)
+
+    conn = shards.connection(placement.shard)
+    try:
+        with open(args.csv_file, newline='', encoding='utf-8-sig') as f:
+            report = run_import(lambda work: db.run_on_connection(conn, work),
+                                user[0], args.kind, csv.DictReader(f), args.batch_size)
+    finally:
+        conn.close()
+
+    print(f"[OK] Imported {report.inserted} {args.kind} row(s)")
+    for line_number, messages in report.errors:
+        print(f"  line {line_number}: {' '.join(messages)}")
+    if report.errors:
+        print(f"[WARN] {report.failed} row(s) skipped")
+
+
+if __name__ == "__main__":
+    main()
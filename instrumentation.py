@@ -0,0 +1,336 @@
+"""
+Per-request timing and SQL instrumentation.
+
+For every request we record:
+    - time spent checking out a database connection
+    - every SQL statement on the request connection (normalized text, rows, duration)
+    - template render time
+    - total time and number of queries
+
+and expose it three ways:
+    - a Server-Timing header (visible in the browser dev tools' Network tab)
+    - Prometheus text metrics at /metrics (per worker process, like /pool-stats)
+    - a slow-query log: statements slower than SLOW_QUERY_MS (default 200)
+      are logged with their normalized SQL and the endpoint that ran them
+
+Settings: INSTRUMENTATION=0 turns all of it off, SERVER_TIMING=0 drops only
+the header, SLOW_QUERY_MS=-1 disables the slow-query log, REQUEST_QUERY_WARN
+(default 25) logs requests that run more queries than that.
+"""
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('autotrack.slow_query')
+
+ENABLED = os.getenv('INSTRUMENTATION', '1') != '0'
+SERVER_TIMING = os.getenv('SERVER_TIMING', '1') != '0'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+REQUEST_QUERY_WARN = int(os.getenv('REQUEST_QUERY_WARN', 25))
+
+# Histogram buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+# SQL normalization
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+`?(\w+)`?', re.IGNORECASE)
+
+
+def normalize_sql(sql):
+    """
+    Statement shape without literals:
+    "SELECT * FROM vehicles WHERE id IN (%s, %s)" -> "SELECT * FROM vehicles WHERE id IN (...)"
+    """
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    sql = sql.replace('%s', '?')
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _PLACEHOLDER_LIST.sub('(...)', sql)
+
+
+def statement_labels(normalized):
+    """(verb, table) for metric labels - low cardinality, unlike the SQL text"""
+    verb = normalized.split(' ', 1)[0].upper() if normalized else 'UNKNOWN'
+    match = _TABLE.search(normalized)
+    return verb, match.group(1).lower() if match else ''
+
+
+# Metrics registry (tiny Prometheus text-format implementation, per process)
+class _Histogram:
+    def __init__(self, name, help_text, buckets, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self.series = {}  # labels tuple -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, labels=()):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.series.items()):
+            base = _format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                le = _format_labels(self.label_names + ('le',), labels + (str(bound),))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{base} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+class _Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.series = {}
+
+    def inc(self, labels=(), amount=1):
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+_metrics_lock = threading.Lock()
+REQUESTS = _Counter('autotrack_http_requests_total', 'HTTP requests by endpoint and status', ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = _Histogram('autotrack_http_request_duration_seconds', 'Time to produce a response', LATENCY_BUCKETS, ('endpoint',))
+CONNECT_SECONDS = _Histogram('autotrack_db_connection_acquire_seconds', 'Time to check out a database connection', LATENCY_BUCKETS, ())
+QUERY_SECONDS = _Histogram('autotrack_db_query_duration_seconds', 'SQL statement time (execute + fetch)', LATENCY_BUCKETS, ('verb', 'table'))
+QUERIES_PER_REQUEST = _Histogram('autotrack_db_queries_per_request', 'SQL statements per request', COUNT_BUCKETS, ('endpoint',))
+RENDER_SECONDS = _Histogram('autotrack_template_render_seconds', 'Jinja render time', LATENCY_BUCKETS, ('template',))
+SLOW_QUERIES = _Counter('autotrack_db_slow_queries_total', 'Statements slower than SLOW_QUERY_MS', ('verb', 'table'))
+_METRICS = (REQUESTS, REQUEST_SECONDS, CONNECT_SECONDS, QUERY_SECONDS, QUERIES_PER_REQUEST, RENDER_SECONDS, SLOW_QUERIES)
+
+
+def render_metrics(extra_gauges=None):
+    """
+    All metrics in Prometheus text format.
+
+    Args:
+        extra_gauges: Optional {name: (help, value)} added as gauges (pool / cache stats)
+    """
+    lines = []
+    with _metrics_lock:
+        for metric in _METRICS:
+            lines.extend(metric.render())
+    for name, (help_text, value) in (extra_gauges or {}).items():
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"])
+    return '\n'.join(lines) + '\n'
+
+
+# Request-level recording
+class RequestTimings:
+    """Everything measured during one request (kept on flask.g)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.connect_seconds = 0.0
+        self.render_seconds = 0.0
+        self.queries = []  # [{'sql', 'rows', 'seconds'}]
+        self._render_started = None
+
+    @property
+    def query_seconds(self):
+        return sum(query['seconds'] for query in self.queries)
+
+
+def current():
+    """This request's RequestTimings, or None outside a request / when disabled"""
+    if not ENABLED or not has_request_context():
+        return None
+    return g.get('timings')
+
+
+def record_connect(seconds):
+    timings = current()
+    if timings is not None:
+        timings.connect_seconds += seconds
+
+
+class InstrumentedCursor:
+    """
+    Cursor proxy that times execute() plus the fetches that follow it, so
+    unbuffered SELECTs are charged for reading their rows too.
+    """
+
+    def __init__(self, cursor, timings):
+        self._cursor = cursor
+        self._timings = timings
+        self._query = None
+
+    def _start(self, sql):
+        self._query = {'sql': sql, 'rows': 0, 'seconds': 0.0}
+        self._timings.queries.append(self._query)
+
+    def _timed(self, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return getattr(self._cursor, method)(*args, **kwargs)
+        finally:
+            if self._query is not None:
+                self._query['seconds'] += time.perf_counter() - started
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._start(operation)
+        result = self._timed('execute', operation, params, *args, **kwargs)
+        # Rows affected by INSERT / UPDATE / DELETE (SELECT rows are counted as they're fetched)
+        rowcount = getattr(self._cursor, 'rowcount', -1)
+        if rowcount and rowcount > 0 and not getattr(self._cursor, 'with_rows', False):
+            self._query['rows'] = rowcount
+        return result
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._start(operation)
+        result = self._timed('executemany', operation, seq_params, *args, **kwargs)
+        self._query['rows'] = max(getattr(self._cursor, 'rowcount', 0) or 0, 0)
+        return result
+
+    def fetchone(self):
+        row = self._timed('fetchone')
+        if row is not None and self._query is not None:
+            self._query['rows'] += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._timed('fetchmany', *args, **kwargs)
+        if self._query is not None:
+            self._query['rows'] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed('fetchall')
+        if self._query is not None:
+            self._query['rows'] += len(rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def wrap_cursor(cursor):
+    """Instrument a cursor of the request connection (no-op outside requests)"""
+    timings = current()
+    return InstrumentedCursor(cursor, timings) if timings is not None else cursor
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def _before_request():
+    g.timings = RequestTimings()
+
+
+def _before_render(sender, template, context, **extra):
+    timings = current()
+    if timings is not None:
+        timings._render_started = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    timings = current()
+    if timings is not None and timings._render_started is not None:
+        elapsed = time.perf_counter() - timings._render_started
+        timings.render_seconds += elapsed
+        timings._render_started = None
+        with _metrics_lock:
+            RENDER_SECONDS.observe(elapsed, (template.name or 'string',))
+
+
+def _after_request(response):
+    timings = current()
+    if timings is None or not SERVER_TIMING:
+        return response
+    total_ms = (time.perf_counter() - timings.started) * 1000
+    parts = []
+    if timings.connect_seconds:
+        parts.append(f"db-connect;dur={timings.connect_seconds * 1000:.2f}")
+    if timings.queries:
+        parts.append(f'sql;dur={timings.query_seconds * 1000:.2f};desc="{len(timings.queries)} queries"')
+    if timings.render_seconds:
+        parts.append(f"render;dur={timings.render_seconds * 1000:.2f}")
+    parts.append(f"app;dur={total_ms:.2f}")
+    # Streamed responses (exports) keep querying after this point - the
+    # metrics still see those queries, the header only what ran so far
+    response.headers['Server-Timing'] = ', '.join(parts)
+    return response
+
+
+def _teardown_request(exception=None):
+    timings = g.pop('timings', None)
+    if timings is None:
+        return
+    endpoint = _endpoint()
+    elapsed = time.perf_counter() - timings.started
+
+    slow = []
+    with _metrics_lock:
+        REQUEST_SECONDS.observe(elapsed, (endpoint,))
+        QUERIES_PER_REQUEST.observe(len(timings.queries), (endpoint,))
+        if timings.connect_seconds:
+            CONNECT_SECONDS.observe(timings.connect_seconds)
+        for query in timings.queries:
+            normalized = normalize_sql(query['sql'])
+            labels = statement_labels(normalized)
+            QUERY_SECONDS.observe(query['seconds'], labels)
+            if SLOW_QUERY_MS >= 0 and query['seconds'] * 1000 >= SLOW_QUERY_MS:
+                SLOW_QUERIES.inc(labels)
+                slow.append((query, normalized))
+
+    for query, normalized in slow:
+        slow_query_logger.warning(f"Slow query ({query['seconds'] * 1000:.1f}ms, {query['rows']} rows) "
+                                  f"in {endpoint}: {normalized}")
+    if len(timings.queries) > REQUEST_QUERY_WARN:
+        logger.warning(f"{endpoint} ran {len(timings.queries)} queries in one request")
+
+
+def record_response_status(response):
+    with _metrics_lock:
+        REQUESTS.inc((_endpoint(), request.method, str(response.status_code)))
+    return response
+
+
+def init_app(app):
+    """Register the request hooks (no-op when INSTRUMENTATION=0)"""
+    if not ENABLED:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.after_request(record_response_status)
+    app.teardown_request(_teardown_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
@@ -0,0 +1,136 @@
+"""
+Schema Migration Script
+Applies the numbered SQL files in migrations/ that haven't been applied yet.
+
+Usage:
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # list applied / pending migrations
+
+Applied versions are recorded in the schema_migrations table, so it is safe
+to run this on every deploy. With DB_SHARDS set, every shard is migrated
+(they share one schema; see shards.py).
+"""
+import os
+import re
+import sys
+import mysql.connector
+from db_config import get_db_connection
+import shards
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE_RE = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """Return [(version, name, path)] for every migration file, oldest first"""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE_RE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    return sorted(migrations)
+
+
+def split_statements(sql):
+    """Split a SQL script into statements (drops full-line `--` comments)"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def run_migrations(conn=None, verbose=True):
+    """
+    Apply pending migrations in order.
+    
+    Args:
+        conn: Optional open connection (defaults to get_db_connection())
+        verbose: Print progress
+    
+    Returns:
+        list: Versions that were applied
+    """
+    own_connection = conn is None
+    if own_connection:
+        conn = get_db_connection()
+    applied = []
+    try:
+        cursor = conn.cursor()
+        ensure_migrations_table(cursor)
+        done = applied_versions(cursor)
+        
+        for version, name, path in load_migrations():
+            if version in done:
+                continue
+            with open(path, encoding='utf-8') as f:
+                statements = split_statements(f.read())
+            # Note: MySQL commits DDL implicitly, so a failing migration may be partially applied
+            for statement in statements:
+                cursor.execute(statement)
+                if cursor.with_rows:
+                    cursor.fetchall()
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+            applied.append(version)
+            if verbose:
+                print(f"[OK] Applied migration {version:04d}_{name}")
+        
+        if verbose and not applied:
+            print("[OK] Schema is up to date")
+        cursor.close()
+        return applied
+    finally:
+        if own_connection:
+            conn.close()
+
+
+def print_status(conn=None):
+    own_connection = conn is None
+    if own_connection:
+        conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        ensure_migrations_table(cursor)
+        done = applied_versions(cursor)
+        for version, name, _ in load_migrations():
+            state = 'applied' if version in done else 'pending'
+            print(f"{version:04d}_{name}: {state}")
+    finally:
+        if own_connection:
+            conn.close()
+
+
+if __name__ == "__main__":
+    if '--status' not in sys.argv:
+        print("Running migrations...\n")
+    for shard in shards.names():
+        if shards.enabled():
+            print(f"== shard {shard}")
+        try:
+            conn = shards.connection(shard)
+        except mysql.connector.Error as e:
+            print(f"❌ Migration failed: {e}")
+            sys.exit(1)
+        try:
+            if '--status' in sys.argv:
+                print_status(conn)
+            else:
+                run_migrations(conn)
+        except mysql.connector.Error as e:
+            print(f"❌ Migration failed on shard {shard}: {e}")
+            sys.exit(1)
+        finally:
+            conn.close()
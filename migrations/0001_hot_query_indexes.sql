@@ -0,0 +1,20 @@
+-- Composite indexes for the per-user hot queries in app.py
+--
+-- vehicles:
+--   (user_id, year)          -> index() / export_csv() "WHERE user_id = ? ORDER BY year DESC" without a filesort,
+--                               plus COUNT(*) and MIN/MAX(year) straight from the index
+--   (user_id, plate_number)  -> duplicate-plate check in add_vehicle() / edit_vehicle(); UNIQUE so the
+--                               database enforces it too. If this fails, find duplicates with:
+--                               SELECT user_id, plate_number, COUNT(*) FROM vehicles
+--                               GROUP BY user_id, plate_number HAVING COUNT(*) > 1;
+-- maintenance_logs:
+--   (vehicle_id, user_id, maintenance_date) -> view_vehicle() "ORDER BY maintenance_date DESC" without a filesort
+--   (user_id, cost)                         -> dashboard() COUNT(*) / SUM(cost) answered from the index alone
+
+ALTER TABLE vehicles
+    ADD INDEX idx_vehicles_user_year (user_id, year),
+    ADD UNIQUE INDEX uq_vehicles_user_plate (user_id, plate_number);
+
+ALTER TABLE maintenance_logs
+    ADD INDEX idx_logs_vehicle_user_date (vehicle_id, user_id, maintenance_date),
+    ADD INDEX idx_logs_user_cost (user_id, cost);
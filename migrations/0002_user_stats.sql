@@ -0,0 +1,29 @@
+-- Per-user summary counters, kept up to date by the write routes in app.py
+-- (see stats.py) so dashboard() / index() read one row instead of scanning.
+
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INT PRIMARY KEY,
+    vehicle_count INT NOT NULL DEFAULT 0,
+    log_count INT NOT NULL DEFAULT 0,
+    total_cost DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    min_year INT NULL,
+    max_year INT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Backfill from existing data
+INSERT INTO user_stats (user_id, vehicle_count, log_count, total_cost, min_year, max_year)
+SELECT u.id,
+       (SELECT COUNT(*) FROM vehicles v WHERE v.user_id = u.id),
+       (SELECT COUNT(*) FROM maintenance_logs m WHERE m.user_id = u.id),
+       (SELECT COALESCE(SUM(m.cost), 0) FROM maintenance_logs m WHERE m.user_id = u.id),
+       (SELECT MIN(v.year) FROM vehicles v WHERE v.user_id = u.id),
+       (SELECT MAX(v.year) FROM vehicles v WHERE v.user_id = u.id)
+FROM users u
+ON DUPLICATE KEY UPDATE
+    vehicle_count = VALUES(vehicle_count),
+    log_count = VALUES(log_count),
+    total_cost = VALUES(total_cost),
+    min_year = VALUES(min_year),
+    max_year = VALUES(max_year);
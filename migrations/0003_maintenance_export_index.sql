@@ -0,0 +1,6 @@
+-- Keyset pagination for the maintenance history export walks a user's logs in
+-- (vehicle_id, maintenance_date, id) order; InnoDB appends the primary key (id)
+-- to secondary indexes, so this index covers the whole sort key.
+
+ALTER TABLE maintenance_logs
+    ADD INDEX idx_logs_user_vehicle_date (user_id, vehicle_id, maintenance_date);
@@ -0,0 +1,6 @@
+-- Full-text index for the garage search box (see search.py).
+-- Replaces the leading-wildcard LIKE scan over brand / model / plate_number.
+-- Plate prefix lookups use uq_vehicles_user_plate from migration 0001.
+
+ALTER TABLE vehicles
+    ADD FULLTEXT INDEX ft_vehicles_search (brand, model, plate_number);
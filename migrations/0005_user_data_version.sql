@@ -0,0 +1,5 @@
+-- Per-user data version, bumped on every vehicle / maintenance change (stats.py).
+-- The JSON API derives ETags from it so polling clients get 304 Not Modified.
+
+ALTER TABLE user_stats
+    ADD COLUMN data_version BIGINT NOT NULL DEFAULT 0;
@@ -0,0 +1,18 @@
+-- Server-side sessions (sessions.py, SESSION_BACKEND=database).
+-- The cookie only carries the opaque id; the session data lives here.
+--
+--   PRIMARY KEY (id)         -> lookup by the cookie's session id
+--   (expires_at)             -> the expiry sweeper deletes in batches without a table scan
+--   (user_id)                -> count / revoke all sessions of one user
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id CHAR(43) CHARACTER SET ascii COLLATE ascii_bin PRIMARY KEY,
+    user_id INT NULL,
+    data TEXT NOT NULL,
+    generation INT NOT NULL DEFAULT 1,
+    expires_at DATETIME NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_sessions_expires (expires_at),
+    INDEX idx_sessions_user (user_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
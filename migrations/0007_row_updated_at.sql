@@ -0,0 +1,9 @@
+-- Row versions for template fragment caching (fragments.py): a vehicle card /
+-- log row is cached under its id + updated_at, and every UPDATE bumps it.
+-- Microsecond precision so two edits within the same second still differ.
+
+ALTER TABLE vehicles
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+ALTER TABLE maintenance_logs
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
@@ -0,0 +1,29 @@
+-- Monthly maintenance cost rollup (rollups.py), one row per
+-- user / vehicle / month / maintenance type. Kept up to date in the same
+-- transaction as every maintenance log insert / delete, and read by
+-- analytics.py instead of aggregating maintenance_logs on every dashboard view.
+--
+--   PRIMARY KEY (user_id, ...) -> a user's whole history is one range scan
+--   vehicle FK ON DELETE CASCADE -> deleting a vehicle drops its rollups with its logs
+
+CREATE TABLE IF NOT EXISTS maintenance_monthly (
+    user_id INT NOT NULL,
+    vehicle_id INT NOT NULL,
+    month DATE NOT NULL,
+    maintenance_type VARCHAR(100) NOT NULL,
+    log_count INT NOT NULL DEFAULT 0,
+    total_cost DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, vehicle_id, month, maintenance_type),
+    FOREIGN KEY (vehicle_id) REFERENCES vehicles(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Backfill from existing logs
+INSERT INTO maintenance_monthly (user_id, vehicle_id, month, maintenance_type, log_count, total_cost)
+SELECT user_id, vehicle_id, DATE_FORMAT(maintenance_date, '%Y-%m-01'), maintenance_type,
+       COUNT(*), COALESCE(SUM(cost), 0)
+FROM maintenance_logs
+GROUP BY user_id, vehicle_id, DATE_FORMAT(maintenance_date, '%Y-%m-01'), maintenance_type
+ON DUPLICATE KEY UPDATE
+    log_count = VALUES(log_count),
+    total_cost = VALUES(total_cost);
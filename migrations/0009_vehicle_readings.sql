@@ -0,0 +1,29 @@
+-- Vehicle telemetry (telemetry.py): append-only odometer / GPS readings.
+--
+--   PRIMARY KEY (vehicle_id, ts) -> one vehicle's history is one range scan;
+--                                   a resent reading is a no-op, not a duplicate
+--   PARTITION BY RANGE (ts)      -> one partition per month: time-bounded reads
+--                                   skip the rest, and old months are dropped
+--                                   instantly (`python telemetry.py maintain`)
+--
+-- Partitioned tables can't have foreign keys, so ownership is checked on
+-- ingest and readings of deleted vehicles are pruned by the same command.
+-- Monthly partitions after pmax's split are added by it too; until then newer
+-- rows simply land in pmax.
+
+CREATE TABLE IF NOT EXISTS vehicle_readings (
+    vehicle_id INT NOT NULL,
+    ts DATETIME(3) NOT NULL,
+    odometer_km DECIMAL(9, 1) NULL,
+    latitude DECIMAL(8, 6) NULL,
+    longitude DECIMAL(9, 6) NULL,
+    speed_kmh DECIMAL(5, 1) NULL,
+    PRIMARY KEY (vehicle_id, ts)
+)
+PARTITION BY RANGE COLUMNS (ts) (
+    PARTITION p_history VALUES LESS THAN ('2026-10-01'),
+    PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+    PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+    PARTITION p202612 VALUES LESS THAN ('2027-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
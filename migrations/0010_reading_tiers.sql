@@ -0,0 +1,79 @@
+-- Downsampled telemetry (timeseries.py): one row per vehicle and
+-- minute / hour / day with min, max, sum + count (for the average) and the
+-- last value of each measurement, plus the last position. Kept up to date in
+-- the same transaction as every flush of vehicle_readings, so a year of
+-- history is ~365 daily rows instead of millions of readings.
+--
+--   PRIMARY KEY (vehicle_id, bucket) -> a time range of one vehicle is one range scan
+--   *_ts                             -> when the *_last value was measured, so
+--                                       late readings don't overwrite newer ones
+--
+-- No foreign keys, like vehicle_readings: rows of deleted vehicles are removed
+-- by `python telemetry.py maintain`. Readings ingested before this migration:
+-- `python timeseries.py rebuild`.
+
+CREATE TABLE IF NOT EXISTS vehicle_readings_1m (
+    vehicle_id INT NOT NULL,
+    bucket DATETIME NOT NULL,
+    samples INT NOT NULL DEFAULT 0,
+    odometer_min DECIMAL(9, 1) NULL,
+    odometer_max DECIMAL(9, 1) NULL,
+    odometer_sum DECIMAL(18, 1) NOT NULL DEFAULT 0,
+    odometer_count INT NOT NULL DEFAULT 0,
+    odometer_last DECIMAL(9, 1) NULL,
+    odometer_ts DATETIME(3) NULL,
+    speed_min DECIMAL(5, 1) NULL,
+    speed_max DECIMAL(5, 1) NULL,
+    speed_sum DECIMAL(14, 1) NOT NULL DEFAULT 0,
+    speed_count INT NOT NULL DEFAULT 0,
+    speed_last DECIMAL(5, 1) NULL,
+    speed_ts DATETIME(3) NULL,
+    latitude DECIMAL(8, 6) NULL,
+    longitude DECIMAL(9, 6) NULL,
+    position_ts DATETIME(3) NULL,
+    PRIMARY KEY (vehicle_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS vehicle_readings_1h (
+    vehicle_id INT NOT NULL,
+    bucket DATETIME NOT NULL,
+    samples INT NOT NULL DEFAULT 0,
+    odometer_min DECIMAL(9, 1) NULL,
+    odometer_max DECIMAL(9, 1) NULL,
+    odometer_sum DECIMAL(18, 1) NOT NULL DEFAULT 0,
+    odometer_count INT NOT NULL DEFAULT 0,
+    odometer_last DECIMAL(9, 1) NULL,
+    odometer_ts DATETIME(3) NULL,
+    speed_min DECIMAL(5, 1) NULL,
+    speed_max DECIMAL(5, 1) NULL,
+    speed_sum DECIMAL(14, 1) NOT NULL DEFAULT 0,
+    speed_count INT NOT NULL DEFAULT 0,
+    speed_last DECIMAL(5, 1) NULL,
+    speed_ts DATETIME(3) NULL,
+    latitude DECIMAL(8, 6) NULL,
+    longitude DECIMAL(9, 6) NULL,
+    position_ts DATETIME(3) NULL,
+    PRIMARY KEY (vehicle_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS vehicle_readings_1d (
+    vehicle_id INT NOT NULL,
+    bucket DATETIME NOT NULL,
+    samples INT NOT NULL DEFAULT 0,
+    odometer_min DECIMAL(9, 1) NULL,
+    odometer_max DECIMAL(9, 1) NULL,
+    odometer_sum DECIMAL(18, 1) NOT NULL DEFAULT 0,
+    odometer_count INT NOT NULL DEFAULT 0,
+    odometer_last DECIMAL(9, 1) NULL,
+    odometer_ts DATETIME(3) NULL,
+    speed_min DECIMAL(5, 1) NULL,
+    speed_max DECIMAL(5, 1) NULL,
+    speed_sum DECIMAL(14, 1) NOT NULL DEFAULT 0,
+    speed_count INT NOT NULL DEFAULT 0,
+    speed_last DECIMAL(5, 1) NULL,
+    speed_ts DATETIME(3) NULL,
+    latitude DECIMAL(8, 6) NULL,
+    longitude DECIMAL(9, 6) NULL,
+    position_ts DATETIME(3) NULL,
+    PRIMARY KEY (vehicle_id, bucket)
+);
@@ -0,0 +1,18 @@
+-- Shard directory (shards.py): which shard holds each user's vehicles, logs,
+-- stats and telemetry. Only read on the main shard (DB_HOST), next to users
+-- and sessions; the table exists on every shard because they share one schema.
+--
+--   PRIMARY KEY (user_id) -> one lookup per user, cached per worker
+--   state 'moving'        -> `python shards.py move|rebalance` is copying the
+--                            user's rows; their writes are refused meanwhile
+--
+-- Users without a row (everyone from before sharding) are on the main shard.
+
+CREATE TABLE IF NOT EXISTS user_shards (
+    user_id INT PRIMARY KEY,
+    shard VARCHAR(32) CHARACTER SET ascii NOT NULL,
+    state ENUM('active', 'moving') NOT NULL DEFAULT 'active',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_user_shards_shard (shard),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
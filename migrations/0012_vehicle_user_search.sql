@@ -0,0 +1,31 @@
+-- Per-user full-text search (search.py). ft_vehicles_search from 0004 held
+-- every account's words in one index: MySQL can't narrow a MATCH by user_id,
+-- so a common word ("toyota*") scored the matches of all users first.
+--
+-- search_tokens holds each brand / model / plate word prefixed with a fixed
+-- width user tag, e.g. user 42's "Toyota Vios ABC-123" becomes
+--   u0000000042xtoyota u0000000042xvios u0000000042xabc u0000000042x123
+-- and search.py asks for "+u0000000042xtoy*": the index range scan only
+-- touches that user's words. Every tagged word is longer than
+-- innodb_ft_min_token_size, so short terms are indexed too.
+--
+-- The tag is put in front of every word without regex back-references
+-- (MySQL writes them $1, MariaDB \1): separators are collapsed to single
+-- spaces, and each space becomes a space plus the tag. Separators are
+-- whitespace, punctuation and the ASCII symbols, spelled out because MySQL's
+-- [:punct:] is Unicode punctuation only and MariaDB's is ASCII only; letters
+-- outside ASCII stay part of their word on both.
+--
+-- STORED generated column: kept up to date by the server on every insert / update.
+
+ALTER TABLE vehicles
+    ADD COLUMN search_tokens TEXT GENERATED ALWAYS AS (
+        CONCAT('u', LPAD(user_id, 10, '0'), 'x',
+               REPLACE(TRIM(REGEXP_REPLACE(LOWER(CONCAT_WS(' ', brand, model, plate_number)),
+                                           '[[:space:][:punct:]$+<=>^`|~]+', ' ')),
+                       ' ', CONCAT(' u', LPAD(user_id, 10, '0'), 'x')))
+    ) STORED;
+
+ALTER TABLE vehicles ADD FULLTEXT INDEX ft_vehicles_user_search (search_tokens);
+
+ALTER TABLE vehicles DROP INDEX ft_vehicles_search;
@@ -0,0 +1,109 @@
+"""
+Keyset (cursor) pagination for the vehicle list and maintenance log pages.
+
+Instead of OFFSET, each page remembers the sort key of its last row and the
+next page starts strictly after it, so every page is a short index range scan:
+
+    vehicles:          ORDER BY year DESC, id DESC              (index user_id, year)
+    maintenance_logs:  ORDER BY maintenance_date DESC, id DESC  (index vehicle_id, user_id, maintenance_date)
+
+Cursors are opaque strings like "2019_345" (sort value, row id).
+"""
+import os
+from datetime import datetime
+
+MAX_PAGE_SIZE = 100
+VEHICLES_PAGE_SIZE = int(os.getenv('VEHICLES_PAGE_SIZE', 24))
+LOGS_PAGE_SIZE = int(os.getenv('LOGS_PAGE_SIZE', 25))
+
+
+def get_page_size(value, default):
+    """Parse a per_page argument, clamped to 1..MAX_PAGE_SIZE"""
+    try:
+        size = int(value)
+    except (ValueError, TypeError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(sort_value, row_id):
+    if hasattr(sort_value, 'isoformat'):
+        sort_value = sort_value.isoformat()
+    return f"{sort_value}_{row_id}"
+
+
+def decode_cursor(token, parse_sort_value):
+    """
+    Split a cursor back into (sort_value, row_id).
+
+    Returns None for a missing cursor; raises ValueError for a malformed one.
+    """
+    if not token:
+        return None
+    sort_value, _, row_id = token.rpartition('_')
+    if not sort_value:
+        raise ValueError(f"Invalid page cursor: {token}")
+    return parse_sort_value(sort_value), int(row_id)
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def fetch_vehicle_page(conn, user_id, cursor_token=None, per_page=VEHICLES_PAGE_SIZE):
+    """
+    One page of a user's vehicles, newest model year first.
+
+    Returns:
+        (vehicles, next_cursor) - next_cursor is None on the last page
+    """
+    after = decode_cursor(cursor_token, int)
+    conditions = ["user_id = %s"]
+    params = [user_id]
+    if after:
+        year, vehicle_id = after
+        conditions.append("(year < %s OR (year = %s AND id < %s))")
+        params.extend([year, year, vehicle_id])
+
+    cursor = conn.cursor(dictionary=True)
+    # Fetch one extra row to learn whether there is a next page
+    cursor.execute(
+        f"SELECT * FROM vehicles WHERE {' AND '.join(conditions)} ORDER BY year DESC, id DESC LIMIT %s",
+        params + [per_page + 1]
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    return _split_page(rows, per_page, 'year')
+
+
+def fetch_log_page(conn, vehicle_id, user_id, cursor_token=None, per_page=LOGS_PAGE_SIZE):
+    """
+    One page of a vehicle's maintenance logs, most recent first.
+
+    Returns:
+        (logs, next_cursor) - next_cursor is None on the last page
+    """
+    after = decode_cursor(cursor_token, _parse_date)
+    conditions = ["vehicle_id = %s", "user_id = %s"]
+    params = [vehicle_id, user_id]
+    if after:
+        maintenance_date, log_id = after
+        conditions.append("(maintenance_date < %s OR (maintenance_date = %s AND id < %s))")
+        params.extend([maintenance_date, maintenance_date, log_id])
+
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        f"SELECT * FROM maintenance_logs WHERE {' AND '.join(conditions)} ORDER BY maintenance_date DESC, id DESC LIMIT %s",
+        params + [per_page + 1]
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    return _split_page(rows, per_page, 'maintenance_date')
+
+
+def _split_page(rows, per_page, sort_column):
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    last = rows[-1]
+    return rows, encode_cursor(last[sort_column], last['id'])
@@ -0,0 +1,112 @@
+"""
+Password hashing with a configurable cost, off the request thread.
+
+- PASSWORD_HASH_METHOD picks the werkzeug method and work factor, e.g.
+  "scrypt:16384:8:1" or "pbkdf2:sha256:260000" (default: werkzeug's default)
+- Hashes made with another method/cost are upgraded on the next successful
+  login (see needs_rehash)
+- Hashing runs on a small bounded pool (PASSWORD_HASH_WORKERS, default 2),
+  so a login storm can't occupy more than that many cores per worker.
+  Under gevent it uses the hub's native threadpool, so the event loop keeps
+  serving other requests while a hash is computed. At most
+  PASSWORD_HASH_QUEUE calls may wait for the pool; beyond that
+  PasswordHashBusy is raised and the caller should ask the user to retry.
+
+Run `python benchmarks/password_benchmark.py` to pick a cost for your hardware.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+from db_config import cooperative_io
+
+logger = logging.getLogger(__name__)
+
+HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD') or None
+HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 32))
+HASH_WAIT_TIMEOUT = float(os.getenv('PASSWORD_HASH_WAIT_TIMEOUT', 10))
+
+
+class PasswordHashBusy(Exception):
+    """Too many password hashes queued in this worker"""
+
+
+def _hash(password, method=None):
+    method = method or HASH_METHOD
+    if method:
+        return generate_password_hash(password, method=method)
+    return generate_password_hash(password)
+
+
+def method_of(password_hash):
+    """'scrypt:32768:8:1' for 'scrypt:32768:8:1$salt$hash'"""
+    return password_hash.split('$', 1)[0] if password_hash else ''
+
+
+def configured_method():
+    """Full method string new hashes get, with werkzeug's defaults filled in.
+
+    Worked out from PASSWORD_HASH_METHOD rather than by hashing a sample, so it
+    costs nothing on the request thread.
+    """
+    name, *args = (HASH_METHOD or 'scrypt').split(':')
+    if name == 'scrypt':
+        n, r, p = map(int, args) if args else (2 ** 15, 8, 1)
+        return f"scrypt:{n}:{r}:{p}"
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    return HASH_METHOD
+
+
+def needs_rehash(password_hash):
+    """True if the hash was made with a different method or work factor"""
+    return method_of(password_hash) != configured_method()
+
+
+# Bounded executor
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE)
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                if cooperative_io():
+                    # gevent: native OS threads even though threading is patched,
+                    # with futures that yield to the event loop while waiting
+                    from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+                    _executor = NativeThreadPoolExecutor(max_workers=HASH_WORKERS)
+                else:
+                    _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='password-hash')
+                _executor_pid = pid
+    return _executor
+
+
+def _run(fn, *args):
+    if not _slots.acquire(timeout=HASH_WAIT_TIMEOUT):
+        raise PasswordHashBusy(f"More than {HASH_WORKERS + HASH_QUEUE} password hashes in progress")
+    try:
+        return _get_executor().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    """Hash a new password with the configured method (on the hashing pool)"""
+    return _run(_hash, password)
+
+
+def verify_password(password_hash, password):
+    """Check a password against its stored hash (on the hashing pool)"""
+    return _run(check_password_hash, password_hash, password)
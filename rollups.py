@@ -0,0 +1,107 @@
+"""
+Monthly maintenance cost rollup (maintenance_monthly, migration 0008).
+
+One row per user / vehicle / month / maintenance type with the number of
+logs and their total cost. Like the user_stats counters (stats.py), the
+record_* helpers must run on the same connection, before commit, as the
+INSERT / DELETE of the logs they describe. Deleting a vehicle needs no call:
+its rollup rows go with it (ON DELETE CASCADE).
+
+Logs are passed as (vehicle_id, maintenance_type, maintenance_date, cost)
+tuples; maintenance_date may be a date or a 'YYYY-MM-DD' string.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+
+def month_start(value):
+    """First day of the month of a date / datetime / 'YYYY-MM-DD' string"""
+    if isinstance(value, (date, datetime)):
+        return date(value.year, value.month, 1)
+    text = str(value)
+    return date(int(text[:4]), int(text[5:7]), 1)
+
+
+def _group(logs):
+    """{(vehicle_id, month, type): [count, cost]} so each rollup row is written once"""
+    groups = {}
+    for vehicle_id, maintenance_type, maintenance_date, cost in logs:
+        key = (vehicle_id, month_start(maintenance_date), maintenance_type)
+        entry = groups.setdefault(key, [0, Decimal('0')])
+        entry[0] += 1
+        entry[1] += Decimal(str(cost)) if cost is not None else Decimal('0')
+    return groups
+
+
+def record_logs_added(conn, user_id, logs):
+    """Call after inserting maintenance logs"""
+    groups = _group(logs)
+    if not groups:
+        return
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT INTO maintenance_monthly (user_id, vehicle_id, month, maintenance_type, log_count, total_cost)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            log_count = log_count + VALUES(log_count),
+            total_cost = total_cost + VALUES(total_cost)
+    """, [(user_id, vehicle_id, month, maintenance_type, count, cost)
+          for (vehicle_id, month, maintenance_type), (count, cost) in sorted(groups.items())])
+    cursor.close()
+
+
+def record_logs_removed(conn, user_id, logs):
+    """Call after deleting maintenance logs (pass the deleted rows' values)"""
+    groups = _group(logs)
+    if not groups:
+        return
+    keys = sorted(groups)
+    cursor = conn.cursor()
+    cursor.executemany("""
+        UPDATE maintenance_monthly
+        SET log_count = GREATEST(log_count - %s, 0),
+            total_cost = GREATEST(total_cost - %s, 0)
+        WHERE user_id = %s AND vehicle_id = %s AND month = %s AND maintenance_type = %s
+    """, [(groups[key][0], groups[key][1], user_id) + key for key in keys])
+    # Drop buckets that became empty
+    cursor.executemany("""
+        DELETE FROM maintenance_monthly
+        WHERE user_id = %s AND vehicle_id = %s AND month = %s AND maintenance_type = %s AND log_count = 0
+    """, [(user_id,) + key for key in keys])
+    cursor.close()
+
+
+def fetch_user_rollups(conn, user_id):
+    """
+    Every rollup row of a user with its vehicle's label (one primary key range scan).
+
+    Returns:
+        list of (vehicle_id, brand, model, plate_number, month, maintenance_type, log_count, total_cost)
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT r.vehicle_id, v.brand, v.model, v.plate_number, r.month, r.maintenance_type,
+               r.log_count, r.total_cost
+        FROM maintenance_monthly r
+        JOIN vehicles v ON v.id = r.vehicle_id
+        WHERE r.user_id = %s
+    """, (user_id,))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def rebuild_user_rollups(conn, user_id):
+    """Recompute a user's rollup rows from maintenance_logs (repair tool)"""
+    # %% - this query has parameters, so DATE_FORMAT's % must be escaped
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM maintenance_monthly WHERE user_id = %s", (user_id,))
+    cursor.execute("""
+        INSERT INTO maintenance_monthly (user_id, vehicle_id, month, maintenance_type, log_count, total_cost)
+        SELECT user_id, vehicle_id, DATE_FORMAT(maintenance_date, '%%Y-%%m-01'), maintenance_type,
+               COUNT(*), COALESCE(SUM(cost), 0)
+        FROM maintenance_logs
+        WHERE user_id = %s
+        GROUP BY user_id, vehicle_id, DATE_FORMAT(maintenance_date, '%%Y-%%m-01'), maintenance_type
+    """, (user_id,))
+    cursor.close()
@@ -0,0 +1,84 @@
+"""
+Vehicle search for the garage search box.
+
+Matches come from two index lookups instead of a LIKE '%term%' scan:
+
+1. Plate prefix matches ("ABC-12" finds "ABC-1234") via the (user_id, plate_number) index
+2. Word-prefix matches on brand / model / plate via the ft_vehicles_user_search
+   FULLTEXT index (migration 0012), ordered by relevance
+
+The full-text index holds every word tagged with its owner (user_token()), so
+a search only reads the searching user's part of the index, however many
+other accounts use the same words. Tagged words are never shorter than
+innodb_ft_min_token_size or on the stopword list, so every term is indexed.
+
+Plate prefix matches rank first, then full-text relevance, then newest year.
+
+    python benchmarks/search_benchmark.py   # latency on a 100k-vehicle account
+"""
+import os
+import re
+
+SEARCH_LIMIT = int(os.getenv('SEARCH_LIMIT', 50))
+# Words as the search_tokens column splits them: runs of letters and digits (migration 0012)
+WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def user_token(user_id):
+    """Tag in front of each of the user's words in vehicles.search_tokens (fixed width, so unambiguous)"""
+    return f"u{user_id:010d}x"
+
+
+def build_boolean_query(term, user_id):
+    """
+    Turn free text into a BOOLEAN MODE query where every word is a required
+    prefix of one of the user's words, e.g. "toyota cor" for user 42 ->
+    "+u0000000042xtoyota* +u0000000042xcor*". Returns '' if there are no words.
+    """
+    tag = user_token(user_id)
+    return ' '.join(f'+{tag}{word}*' for word in WORD_RE.findall(term.lower()))
+
+
+def escape_like(value):
+    """Escape LIKE wildcards so user input only matches literally"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_vehicles(conn, user_id, term, limit=SEARCH_LIMIT):
+    """
+    Search a user's vehicles by brand, model or plate number.
+    
+    Returns:
+        list: Up to `limit` vehicle rows, best matches first
+    """
+    term = term.strip()
+    if not term:
+        return []
+    prefix = escape_like(term) + '%'
+    cursor = conn.cursor(dictionary=True)
+    
+    # 1. Plate prefix - range scan on (user_id, plate_number)
+    cursor.execute(
+        "SELECT * FROM vehicles WHERE user_id = %s AND plate_number LIKE %s ORDER BY plate_number LIMIT %s",
+        (user_id, prefix, limit)
+    )
+    results = cursor.fetchall()
+    seen = {row['id'] for row in results}
+    
+    # 2. Full-text word prefixes within the user's tagged words, by relevance
+    boolean_query = build_boolean_query(term, user_id)
+    if boolean_query and len(results) < limit:
+        cursor.execute("""
+            SELECT *, MATCH(search_tokens) AGAINST (%s IN BOOLEAN MODE) AS relevance
+            FROM vehicles
+            WHERE MATCH(search_tokens) AGAINST (%s IN BOOLEAN MODE) AND user_id = %s
+            ORDER BY relevance DESC, year DESC, id DESC
+            LIMIT %s
+        """, (boolean_query, boolean_query, user_id, limit))
+        for row in cursor.fetchall():
+            if row['id'] not in seen and len(results) < limit:
+                row.pop('relevance', None)
+                results.append(row)
+                seen.add(row['id'])
+    cursor.close()
+    return results
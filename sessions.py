@@ -0,0 +1,494 @@
+"""
+Server-side sessions. The cookie carries only an opaque session id; the data
+(user_id, email, flashed messages) stays on the server.
+
+Backends (SESSION_BACKEND):
+    cookie   - Flask's signed cookie session (default, nothing stored server-side)
+    memory   - in-process LRU; single gunicorn worker / single node only
+    database - `sessions` table (migration 0006), shared by every worker and instance
+
+- Only signed-in sessions are stored server-side. Anonymous ones (e.g. a
+  flashed "Invalid email or password") stay in a signed cookie, like the
+  cookie backend, so crawlers can't fill the store
+- Cookie value is "<id>.<generation>": a random 256-bit id plus a counter
+  bumped on every write, so the per-worker lookup cache can tell whether its
+  copy is current without asking the database
+- Lookups for the database backend are cached per worker for
+  SESSION_CACHE_TTL seconds. Revoking a user's sessions takes effect
+  everywhere within that time (immediately on the worker that revoked them)
+- A store that can't be written is logged, not turned into a 500; the
+  browser keeps its previous cookie
+- Sessions are only written when they change, and their expiry is extended
+  at most every SESSION_TOUCH_INTERVAL seconds
+- Expired sessions are deleted in batches by a background sweep every
+  SESSION_SWEEP_INTERVAL seconds (also: `python sessions.py sweep`)
+
+Session data must be JSON-serializable.
+"""
+import json
+import logging
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import session as flask_session
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
+from itsdangerous import BadSignature
+from werkzeug.datastructures import CallbackDict
+
+import cache
+import db
+import shards
+from db_config import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'cookie').lower()
+# Server-side lifetime of sessions without "Remember me" (the cookie itself ends with the browser)
+SESSION_TTL = int(os.getenv('SESSION_TTL', 24 * 3600))
+SESSION_CACHE_TTL = float(os.getenv('SESSION_CACHE_TTL', 30))
+SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', 100000))
+SESSION_TOUCH_INTERVAL = int(os.getenv('SESSION_TOUCH_INTERVAL', 600))
+SESSION_SWEEP_INTERVAL = float(os.getenv('SESSION_SWEEP_INTERVAL', 300))
+SESSION_SWEEP_BATCH = int(os.getenv('SESSION_SWEEP_BATCH', 1000))
+
+COOKIE_RE = re.compile(r'^([A-Za-z0-9_-]{43})\.(\d{1,9})$')
+
+
+def new_session_id():
+    return secrets.token_urlsafe(32)
+
+
+def _to_datetime(timestamp):
+    """Epoch seconds -> naive UTC datetime (DATETIME column)"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+def _to_timestamp(value):
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its id, generation and expiry"""
+
+    def __init__(self, initial=None, sid=None, generation=0, expires_at=None):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.generation = generation
+        self.expires_at = expires_at
+        self.new = sid is None
+        self.modified = False
+        self.rotate = False
+
+
+class SessionRecord:
+    """What a store keeps per session"""
+
+    __slots__ = ('data', 'user_id', 'generation', 'expires_at')
+
+    def __init__(self, data, user_id, generation, expires_at):
+        self.data = data  # JSON text
+        self.user_id = user_id
+        self.generation = generation
+        self.expires_at = expires_at  # epoch seconds
+
+
+class MemorySessionStore:
+    """In-process LRU of sessions. Sessions are lost on restart and not shared between workers."""
+
+    backend = 'memory'
+
+    def __init__(self, max_entries=SESSION_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._records = OrderedDict()  # sid -> SessionRecord
+        self._lock = threading.Lock()
+
+    def load(self, sid, generation):
+        with self._lock:
+            record = self._records.get(sid)
+            if record is None:
+                return None
+            if record.expires_at <= time.time():
+                del self._records[sid]
+                return None
+            self._records.move_to_end(sid)
+            return record
+
+    def save(self, sid, record):
+        with self._lock:
+            self._records[sid] = record
+            self._records.move_to_end(sid)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+
+    def touch(self, sid, expires_at):
+        with self._lock:
+            record = self._records.get(sid)
+            if record is not None:
+                record.expires_at = expires_at
+
+    def delete(self, sid):
+        with self._lock:
+            self._records.pop(sid, None)
+
+    def count_user(self, user_id):
+        now = time.time()
+        with self._lock:
+            return sum(1 for record in self._records.values() if record.user_id == user_id and record.expires_at > now)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            sids = [sid for sid, record in self._records.items() if record.user_id == user_id]
+            for sid in sids:
+                del self._records[sid]
+        return len(sids)
+
+    def sweep(self, batch_size=SESSION_SWEEP_BATCH):
+        """Drop expired sessions, holding the lock for one batch at a time"""
+        with self._lock:
+            sids = list(self._records)
+        removed = 0
+        for start in range(0, len(sids), batch_size):
+            now = time.time()
+            with self._lock:
+                for sid in sids[start:start + batch_size]:
+                    record = self._records.get(sid)
+                    if record is not None and record.expires_at <= now:
+                        del self._records[sid]
+                        removed += 1
+        return removed
+
+    def stats(self):
+        with self._lock:
+            size = len(self._records)
+        return {'backend': self.backend, 'entries': size}
+
+
+class DatabaseSessionStore:
+    """
+    Sessions in the `sessions` table, with a per-worker lookup cache in front.
+    Request-path queries use the request's main shard connection (db.get_db(shards.MAIN)).
+    """
+
+    backend = 'database'
+
+    def __init__(self, cache_ttl=SESSION_CACHE_TTL, max_entries=SESSION_MAX_ENTRIES):
+        self._cache = cache.LocalCache(max_entries=max_entries, default_ttl=cache_ttl)
+
+    def load(self, sid, generation):
+        record = self._cache.get(sid)
+        if record is not None and record.generation == generation and record.expires_at > time.time():
+            return record
+        cursor = db.get_db(shards.MAIN).cursor()
+        cursor.execute(
+            "SELECT data, user_id, generation, expires_at FROM sessions WHERE id = %s AND expires_at > %s",
+            (sid, _to_datetime(time.time()))
+        )
+        row = cursor.fetchone()
+        cursor.close()
+        if row is None:
+            self._cache.delete(sid)
+            return None
+        record = SessionRecord(row[0], row[1], row[2], _to_timestamp(row[3]))
+        self._cache.set(sid, record)
+        return record
+
+    def save(self, sid, record):
+        def write(conn):
+            cursor = conn.cursor()
+            cursor.execute(
+                """INSERT INTO sessions (id, user_id, data, generation, expires_at)
+                   VALUES (%s, %s, %s, %s, %s)
+                   ON DUPLICATE KEY UPDATE user_id = VALUES(user_id), data = VALUES(data),
+                       generation = VALUES(generation), expires_at = VALUES(expires_at)""",
+                (sid, record.user_id, record.data, record.generation, _to_datetime(record.expires_at))
+            )
+        db.run_in_transaction(write, shard=shards.MAIN)
+        self._cache.set(sid, record)
+
+    def touch(self, sid, expires_at):
+        def write(conn):
+            cursor = conn.cursor()
+            cursor.execute("UPDATE sessions SET expires_at = %s WHERE id = %s", (_to_datetime(expires_at), sid))
+        db.run_in_transaction(write, shard=shards.MAIN)
+        record = self._cache.get(sid)
+        if record is not None:
+            self._cache.set(sid, SessionRecord(record.data, record.user_id, record.generation, expires_at))
+
+    def delete(self, sid):
+        def write(conn):
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM sessions WHERE id = %s", (sid,))
+        db.run_in_transaction(write, shard=shards.MAIN)
+        self._cache.delete(sid)
+
+    def count_user(self, user_id, conn=None):
+        own_connection = conn is None
+        conn = conn or get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM sessions WHERE user_id = %s AND expires_at > %s",
+                           (user_id, _to_datetime(time.time())))
+            count = cursor.fetchone()[0]
+            cursor.close()
+            return count
+        finally:
+            if own_connection:
+                conn.close()
+
+    def delete_user(self, user_id, conn=None):
+        own_connection = conn is None
+        conn = conn or get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM sessions WHERE user_id = %s", (user_id,))
+            sids = [row[0] for row in cursor.fetchall()]
+            cursor.execute("DELETE FROM sessions WHERE user_id = %s", (user_id,))
+            conn.commit()
+            cursor.close()
+        finally:
+            if own_connection:
+                conn.close()
+        if sids:
+            self._cache.delete(*sids)
+        return len(sids)
+
+    def sweep(self, batch_size=SESSION_SWEEP_BATCH):
+        """
+        Delete expired sessions in batches (short transactions, walks the
+        expires_at index). Runs on its own connection; one worker at a time
+        thanks to a named lock.
+        """
+        conn = get_db_connection()
+        removed = 0
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT GET_LOCK('autotrack_session_sweep', 0)")
+            if cursor.fetchone()[0] != 1:
+                return 0
+            try:
+                while True:
+                    cursor.execute("DELETE FROM sessions WHERE expires_at <= %s LIMIT %s",
+                                   (_to_datetime(time.time()), batch_size))
+                    deleted = cursor.rowcount
+                    conn.commit()
+                    removed += deleted
+                    if deleted < batch_size:
+                        break
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK('autotrack_session_sweep')")
+                cursor.fetchall()
+            cursor.close()
+            return removed
+        finally:
+            conn.close()
+
+    def stats(self):
+        lookups = self._cache.stats()
+        return {'backend': self.backend, 'cached': lookups['entries'],
+                'cache_hits': lookups['hits'], 'cache_misses': lookups['misses']}
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface on top of a session store"""
+
+    # Signs anonymous sessions into the cookie, exactly as SESSION_BACKEND=cookie does
+    cookie_sessions = SecureCookieSessionInterface()
+
+    def __init__(self, store):
+        self.store = store
+        self._last_sweep = time.monotonic()
+        self._sweeping = False
+        self._sweep_lock = threading.Lock()
+
+    def open_session(self, app, request):
+        value = request.cookies.get(self.get_cookie_name(app))
+        match = COOKIE_RE.match(value) if value else None
+        if match:
+            sid, generation = match.group(1), int(match.group(2))
+            try:
+                record = self.store.load(sid, generation)
+            except Exception as e:
+                # Serve the request logged out rather than failing it
+                logger.error(f"Session lookup failed: {str(e)}")
+                record = None
+            if record is not None:
+                return ServerSession(json.loads(record.data), sid, record.generation, record.expires_at)
+        elif value:
+            serializer = self.cookie_sessions.get_signing_serializer(app)
+            try:
+                return ServerSession(serializer.loads(value, max_age=SESSION_TTL))
+            except BadSignature:
+                pass
+        return ServerSession()
+
+    def _write(self, action, *args):
+        """Call a store method; False (logged) if it failed"""
+        try:
+            getattr(self.store, action)(*args)
+            return True
+        except Exception as e:
+            logger.error(f"Session {action} failed: {str(e)}")
+            return False
+
+    def _lifetime(self, app, session):
+        if session.permanent:
+            return app.permanent_session_lifetime.total_seconds()
+        return SESSION_TTL
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            # Logged out / nothing left: forget it server-side and drop the cookie
+            if session.sid is not None:
+                self._write('delete', session.sid)
+            if session.sid is not None or session.modified:
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        if session.get('user_id') is None:
+            # Anonymous: kept in the signed cookie, never in the store
+            if session.sid is not None:
+                self._write('delete', session.sid)
+                session.sid = None
+            elif not session.modified:
+                return
+            value = self.cookie_sessions.get_signing_serializer(app).dumps(dict(session))
+        else:
+            value = self._save_server_side(app, session)
+            if value is None:
+                self._maybe_sweep()
+                return
+
+        response.set_cookie(
+            name, value,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        self._maybe_sweep()
+
+    def _save_server_side(self, app, session):
+        """Write or touch a signed-in session; the new cookie value, or None to leave the cookie alone"""
+        now = time.time()
+        lifetime = self._lifetime(app, session)
+        if session.rotate and session.sid is not None:
+            # New id after login (session fixation)
+            self._write('delete', session.sid)
+            session.sid = None
+
+        if session.sid is None or session.modified:
+            sid = session.sid or new_session_id()
+            generation = session.generation + 1
+            expires_at = now + lifetime
+            if not self._write('save', sid, SessionRecord(
+                json.dumps(dict(session), separators=(',', ':')), session.get('user_id'), generation, expires_at
+            )):
+                return None
+            session.sid, session.generation, session.expires_at = sid, generation, expires_at
+        elif session.expires_at - now < lifetime - SESSION_TOUCH_INTERVAL:
+            # Sliding expiry, written at most every SESSION_TOUCH_INTERVAL
+            if not self._write('touch', session.sid, now + lifetime):
+                return None
+            session.expires_at = now + lifetime
+        else:
+            return None
+        return f"{session.sid}.{session.generation}"
+
+    def _maybe_sweep(self):
+        """Start a background sweep if this worker hasn't run one for SESSION_SWEEP_INTERVAL"""
+        if SESSION_SWEEP_INTERVAL <= 0 or time.monotonic() - self._last_sweep < SESSION_SWEEP_INTERVAL:
+            return
+        with self._sweep_lock:
+            if self._sweeping or time.monotonic() - self._last_sweep < SESSION_SWEEP_INTERVAL:
+                return
+            self._sweeping = True
+            self._last_sweep = time.monotonic()
+        threading.Thread(target=self._sweep, daemon=True).start()
+
+    def _sweep(self):
+        try:
+            removed = self.store.sweep()
+            if removed:
+                logger.info(f"Session sweep removed {removed} expired sessions")
+        except Exception as e:
+            logger.warning(f"Session sweep failed: {str(e)}")
+        finally:
+            self._sweeping = False
+
+
+_store = None
+
+
+def get_store():
+    """The session store for this process, or None for cookie sessions"""
+    return _store
+
+
+def init_app(app):
+    """Install the server-side session interface (no-op for SESSION_BACKEND=cookie)"""
+    global _store
+    if SESSION_BACKEND == 'memory':
+        _store = MemorySessionStore()
+    elif SESSION_BACKEND == 'database':
+        _store = DatabaseSessionStore()
+    else:
+        return
+    app.session_interface = ServerSessionInterface(_store)
+    logger.info(f"Server-side sessions enabled ({SESSION_BACKEND})")
+
+
+def regenerate():
+    """Give the current session a new id when it is saved (call on login)"""
+    if isinstance(flask_session._get_current_object(), ServerSession):
+        flask_session.rotate = True
+
+
+def count_user_sessions(user_id):
+    """Active sessions of a user, or None for cookie sessions"""
+    return _store.count_user(user_id) if _store is not None else None
+
+
+def revoke_user_sessions(user_id):
+    """Log a user out everywhere; returns the number of sessions removed (None for cookie sessions)"""
+    return _store.delete_user(user_id) if _store is not None else None
+
+
+def get_session_stats():
+    if _store is None:
+        return {'backend': 'cookie'}
+    return _store.stats()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    store = DatabaseSessionStore()
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command == 'sweep':
+        print(f"[OK] Removed {store.sweep()} expired sessions")
+    elif command == 'count' and len(sys.argv) == 3:
+        print(f"{store.count_user(int(sys.argv[2]))} active sessions")
+    elif command == 'revoke' and len(sys.argv) == 3:
+        print(f"[OK] Revoked {store.delete_user(int(sys.argv[2]))} sessions")
+    else:
+        print("Usage: python sessions.py sweep | count <user_id> | revoke <user_id>")
+        sys.exit(1)
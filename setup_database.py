@@ -4,6 +4,7 @@ Run this to create the database and vehicles table automatically
 """
 import mysql.connector
 from db_config import get_db_connection
+from migrate import run_migrations
 
 def setup_database():
     """Create the database and vehicles table if they don't exist"""
@@ -113,6 +114,9 @@ def setup_database():
             conn.commit()
             print("[OK] Migration: Added user_id to maintenance_logs table")
         
+        # Apply schema migrations (indexes, etc.)
+        run_migrations(conn)
+        
         # Check if table has any data
         cursor.execute("SELECT COUNT(*) FROM vehicles")
         count = cursor.fetchone()[0]
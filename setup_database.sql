@@ -51,3 +51,4 @@ DESCRIBE maintenance_logs;
 -- Show message
 SELECT 'Database and tables created successfully!' AS message;
 
+-- Next step: run `python migrate.py` to add the indexes and tables from migrations/
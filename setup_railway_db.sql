@@ -39,3 +39,4 @@ CREATE TABLE IF NOT EXISTS maintenance_logs (
 -- Verify tables were created
 SELECT 'Database setup complete! Tables created: users, vehicles, maintenance_logs' AS message;
 
+-- Next step: run `python migrate.py` to add the indexes and tables from migrations/
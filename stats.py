@@ -0,0 +1,306 @@
+"""
+Aggregate statistics for the dashboard, landing page and vehicle list.
+
+Per-user totals live in the user_stats summary table (migration 0002). The
+record_* helpers must be called on the same connection, before commit, as
+the INSERT/UPDATE/DELETE they describe so the counters stay transactional.
+
+The landing page totals are additionally cached per worker process (see
+get_cached_global_stats) because home() is hit by every anonymous visitor.
+"""
+import logging
+import os
+import threading
+import time
+
+import cache
+
+logger = logging.getLogger(__name__)
+
+EMPTY_USER_STATS = {
+    'vehicle_count': 0,
+    'log_count': 0,
+    'total_cost': 0,
+    'min_year': None,
+    'max_year': None,
+    'data_version': 0,
+}
+
+
+def get_global_stats(conn):
+    """Totals across all users for the public landing page (one query)"""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT COALESCE(SUM(vehicle_count), 0) AS total_vehicles,
+               COALESCE(SUM(log_count), 0) AS total_maintenance,
+               COALESCE(SUM(total_cost), 0) AS total_cost
+        FROM user_stats
+    """)
+    result = cursor.fetchone()
+    cursor.close()
+    return result
+
+
+def merge_global_stats(results):
+    """Add up get_global_stats() results of several shards"""
+    totals = {'total_vehicles': 0, 'total_maintenance': 0, 'total_cost': 0}
+    for result in results:
+        for key in totals:
+            totals[key] += result[key] or 0
+    return totals
+
+
+# Process-level cache for get_global_stats()
+_global_cache = {'value': None, 'computed_at': 0.0, 'refreshing': False}
+# Held only to read or swap _global_cache, never during a query
+_global_cache_lock = threading.Lock()
+# Serializes synchronous (cold) loads, so waiting for one doesn't block cache hits
+_global_load_lock = threading.Lock()
+
+
+def get_cached_global_stats(load, ttl=None, max_stale=None):
+    """
+    Landing page totals with a TTL and stale-while-revalidate.
+    
+    Args:
+        load: Callable returning fresh totals (opens its own connection)
+        ttl: Seconds a value is served without refreshing (HOME_STATS_TTL, default 60)
+        max_stale: Seconds past the TTL a stale value may still be served while
+            one background thread refreshes it (HOME_STATS_MAX_STALE, default 600)
+    
+    Only one thread per process recomputes at a time; everyone else gets the
+    cached value. A cold or too-stale cache is filled synchronously.
+    """
+    if ttl is None:
+        ttl = float(os.getenv('HOME_STATS_TTL', 60))
+    if max_stale is None:
+        max_stale = float(os.getenv('HOME_STATS_MAX_STALE', 600))
+    
+    now = time.monotonic()
+    with _global_cache_lock:
+        value = _global_cache['value']
+        age = now - _global_cache['computed_at']
+        if value is not None and age < ttl:
+            return value
+        if value is not None and age < ttl + max_stale:
+            if not _global_cache['refreshing']:
+                _global_cache['refreshing'] = True
+                threading.Thread(target=_refresh_global_stats, args=(load,), daemon=True).start()
+            return value
+    
+    # Cold (or far too stale): compute in the request, one thread at a time
+    with _global_load_lock:
+        with _global_cache_lock:
+            if _global_cache['value'] is not None and time.monotonic() - _global_cache['computed_at'] < ttl:
+                return _global_cache['value']
+        value = load()
+        with _global_cache_lock:
+            _global_cache['value'] = value
+            _global_cache['computed_at'] = time.monotonic()
+        return value
+
+
+def _refresh_global_stats(load):
+    try:
+        value = load()
+        with _global_cache_lock:
+            _global_cache['value'] = value
+            _global_cache['computed_at'] = time.monotonic()
+    except Exception as e:
+        logger.warning(f"Background refresh of landing page stats failed: {str(e)}")
+    finally:
+        with _global_cache_lock:
+            _global_cache['refreshing'] = False
+
+
+def get_user_stats(conn, user_id):
+    """
+    Summary row for one user (primary key lookup, cached unless several
+    workers keep their own local caches - see cache.py).
+    
+    Returns a dict with vehicle_count, log_count, total_cost, min_year, max_year, data_version.
+    Users without a row yet simply have no data.
+    """
+    def load():
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT vehicle_count, log_count, total_cost, min_year, max_year, data_version FROM user_stats WHERE user_id = %s",
+            (user_id,)
+        )
+        result = cursor.fetchone()
+        cursor.close()
+        return result or dict(EMPTY_USER_STATS)
+    if not cache.is_coherent():
+        return load()
+    return cache.get_or_load(cache.stats_key(user_id), load)
+
+
+def read_data_version(conn, user_id):
+    """The user's data version straight from conn (never cached)"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT data_version FROM user_stats WHERE user_id = %s", (user_id,))
+    result = cursor.fetchone()
+    cursor.close()
+    return result[0] if result else 0
+
+
+def get_data_version(conn, user_id):
+    """
+    Counter bumped by every record_* call, i.e. every change to the user's
+    vehicles or maintenance logs. Used to key cached data (cached itself
+    unless several workers keep their own local caches - see cache.py).
+    """
+    if not cache.is_coherent():
+        return read_data_version(conn, user_id)
+    return cache.get_or_load(cache.version_key(user_id), lambda: read_data_version(conn, user_id))
+
+
+def rebuild_user_stats(conn, user_id):
+    """Recompute a user's summary row from the base tables (repair tool)"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO user_stats (user_id, vehicle_count, log_count, total_cost, min_year, max_year, data_version)
+        SELECT %s,
+               (SELECT COUNT(*) FROM vehicles WHERE user_id = %s),
+               (SELECT COUNT(*) FROM maintenance_logs WHERE user_id = %s),
+               (SELECT COALESCE(SUM(cost), 0) FROM maintenance_logs WHERE user_id = %s),
+               (SELECT MIN(year) FROM vehicles WHERE user_id = %s),
+               (SELECT MAX(year) FROM vehicles WHERE user_id = %s),
+               1
+        ON DUPLICATE KEY UPDATE
+            vehicle_count = VALUES(vehicle_count),
+            log_count = VALUES(log_count),
+            total_cost = VALUES(total_cost),
+            min_year = VALUES(min_year),
+            max_year = VALUES(max_year),
+            data_version = data_version + 1
+    """, (user_id,) * 6)
+    cursor.close()
+
+
+def record_vehicle_added(conn, user_id, year):
+    """Call after inserting a vehicle"""
+    record_vehicles_added(conn, user_id, [year])
+
+
+def record_vehicles_added(conn, user_id, years):
+    """Call after inserting several vehicles at once (pass their years)"""
+    if not years:
+        return
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO user_stats (user_id, vehicle_count, min_year, max_year, data_version)
+        VALUES (%s, %s, %s, %s, 1)
+        ON DUPLICATE KEY UPDATE
+            vehicle_count = vehicle_count + VALUES(vehicle_count),
+            min_year = LEAST(COALESCE(min_year, VALUES(min_year)), VALUES(min_year)),
+            max_year = GREATEST(COALESCE(max_year, VALUES(max_year)), VALUES(max_year)),
+            data_version = data_version + 1
+    """, (user_id, len(years), min(years), max(years)))
+    cursor.close()
+
+
+def record_vehicle_updated(conn, user_id, year_changed=True):
+    """Call after editing a vehicle"""
+    _touch(conn, user_id)
+    if year_changed:
+        _refresh_year_range(conn, user_id)
+
+
+def record_vehicle_removed(conn, user_id, log_count=0, log_cost=0):
+    """
+    Call after deleting a vehicle. Its maintenance logs are removed by the
+    ON DELETE CASCADE, so pass their count and total cost (read before the delete).
+    """
+    record_vehicles_removed(conn, user_id, 1, log_count, log_cost)
+
+
+def record_vehicles_removed(conn, user_id, count, log_count=0, log_cost=0):
+    """Call after deleting several vehicles at once (totals for all of them)"""
+    if not count:
+        return
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE user_stats
+        SET vehicle_count = GREATEST(vehicle_count - %s, 0),
+            log_count = GREATEST(log_count - %s, 0),
+            total_cost = GREATEST(total_cost - %s, 0),
+            data_version = data_version + 1
+        WHERE user_id = %s
+    """, (count, log_count, log_cost or 0, user_id))
+    cursor.close()
+    _refresh_year_range(conn, user_id)
+
+
+def record_log_added(conn, user_id, cost=None):
+    """Call after inserting a maintenance log"""
+    record_logs_added(conn, user_id, 1, cost or 0)
+
+
+def record_logs_added(conn, user_id, count, total_cost=0):
+    """Call after inserting several maintenance logs at once"""
+    if not count:
+        return
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO user_stats (user_id, log_count, total_cost, data_version)
+        VALUES (%s, %s, %s, 1)
+        ON DUPLICATE KEY UPDATE
+            log_count = log_count + VALUES(log_count),
+            total_cost = total_cost + VALUES(total_cost),
+            data_version = data_version + 1
+    """, (user_id, count, total_cost or 0))
+    cursor.close()
+
+
+def record_log_removed(conn, user_id, cost=None):
+    """Call after deleting a maintenance log (pass its cost)"""
+    record_logs_removed(conn, user_id, 1, cost or 0)
+
+
+def record_logs_removed(conn, user_id, count, total_cost=0):
+    """Call after deleting several maintenance logs at once"""
+    if not count:
+        return
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE user_stats
+        SET log_count = GREATEST(log_count - %s, 0),
+            total_cost = GREATEST(total_cost - %s, 0),
+            data_version = data_version + 1
+        WHERE user_id = %s
+    """, (count, total_cost or 0, user_id))
+    cursor.close()
+
+
+def record_logs_updated(conn, user_id, cost_change=0):
+    """Call after editing maintenance logs (pass new minus old total cost)"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO user_stats (user_id, data_version) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE
+            total_cost = GREATEST(total_cost + %s, 0),
+            data_version = data_version + 1
+    """, (user_id, cost_change or 0))
+    cursor.close()
+
+
+def _touch(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO user_stats (user_id, data_version) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE data_version = data_version + 1
+    """, (user_id,))
+    cursor.close()
+
+
+def _refresh_year_range(conn, user_id):
+    # MIN/MAX are resolved from the (user_id, year) index, so this is two index dives
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE user_stats
+        SET min_year = (SELECT MIN(year) FROM vehicles WHERE user_id = %s),
+            max_year = (SELECT MAX(year) FROM vehicles WHERE user_id = %s)
+        WHERE user_id = %s
+    """, (user_id, user_id, user_id))
+    cursor.close()
@@ -0,0 +1,20 @@
+// Tailwind build config for python assets.py build (same settings the pages used to
+// pass to the CDN runtime). Classes are collected from templates/ - keep class
+// names literal there so the build can find them.
+module.exports = {
+    content: ['./templates/**/*.html'],
+    darkMode: 'class',
+    theme: {
+        extend: {
+            colors: {
+                dark: {
+                    bg: '#0d1117',
+                    border: '#30363d',
+                    text: '#c9d1d9',
+                    muted: '#8b949e',
+                }
+            }
+        }
+    },
+    plugins: [],
+}
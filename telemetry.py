@@ -0,0 +1,503 @@
+"""
+Vehicle telemetry: odometer / GPS readings (vehicle_readings, migration 0009).
+
+    POST /api/v1/telemetry
+    {"readings": [{"vehicle_id": 7, "ts": "2026-10-18T09:30:00Z", "odometer_km": 48211.4,
+                   "lat": 14.5995, "lon": 120.9842, "speed_kmh": 42}, ...]}
+
+- parse_readings() validates a batch (all or nothing, like the other batch
+  endpoints). `ts` is ISO 8601 or Unix seconds, stored as UTC with
+  millisecond precision; every measurement is optional, but not all of them
+- Accepted readings go into this worker's write-behind buffer and the
+  request answers 202 right away. A background thread flushes the buffer
+  every TELEMETRY_FLUSH_INTERVAL seconds, or as soon as TELEMETRY_FLUSH_ROWS
+  are waiting: sorted by primary key, as multi-row INSERTs of
+  TELEMETRY_INSERT_ROWS rows, one commit per INSERT
+- When TELEMETRY_BUFFER_MAX readings are waiting (database down or too
+  slow) new batches get 503 + Retry-After instead of growing memory
+- Readings still buffered when a worker is killed are lost; a graceful
+  shutdown flushes them. TELEMETRY_WRITE_BEHIND=0 writes each batch inside
+  the request instead (201)
+- Readings are append-only: resending one is harmless, the stored
+  (vehicle_id, ts) row is kept as it is
+- Every INSERT also updates the downsampled tiers (timeseries.py) in the
+  same transaction
+
+Maintenance, e.g. as a daily cron job:
+    python telemetry.py maintain   # add monthly partitions, apply retention, prune deleted vehicles
+    python telemetry.py status     # partitions and approximate row counts
+"""
+import atexit
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+from db_config import get_db_connection
+import cache
+import shards
+import stats
+import timeseries
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_WRITE_BEHIND = os.getenv('TELEMETRY_WRITE_BEHIND', '1').lower() not in ('0', 'false', 'off')
+TELEMETRY_BATCH_LIMIT = int(os.getenv('TELEMETRY_BATCH_LIMIT', 10000))
+TELEMETRY_FLUSH_INTERVAL = float(os.getenv('TELEMETRY_FLUSH_INTERVAL', 0.5))
+TELEMETRY_FLUSH_ROWS = int(os.getenv('TELEMETRY_FLUSH_ROWS', 5000))
+TELEMETRY_INSERT_ROWS = int(os.getenv('TELEMETRY_INSERT_ROWS', 1000))
+TELEMETRY_BUFFER_MAX = int(os.getenv('TELEMETRY_BUFFER_MAX', 200000))
+TELEMETRY_MAX_FUTURE = float(os.getenv('TELEMETRY_MAX_FUTURE', 300))
+TELEMETRY_PARTITIONS_AHEAD = int(os.getenv('TELEMETRY_PARTITIONS_AHEAD', 3))
+TELEMETRY_RETENTION_DAYS = int(os.getenv('TELEMETRY_RETENTION_DAYS', 0))
+TELEMETRY_PRUNE_BATCH = int(os.getenv('TELEMETRY_PRUNE_BATCH', 10000))
+
+# (payload key, lowest, highest) - ranges match the DECIMAL columns
+MEASUREMENTS = (
+    ('odometer_km', 0, 99999999.9),
+    ('lat', -90, 90),
+    ('lon', -180, 180),
+    ('speed_kmh', 0, 9999.9),
+)
+
+PARTITION_RE = re.compile(r'^p(\d{4})(\d{2})$')
+
+
+class TelemetryBusy(Exception):
+    """The write-behind buffer is full; the client should retry later"""
+
+
+# Parsing
+def parse_timestamp(value):
+    """ISO 8601 string (UTC unless it has an offset) or Unix seconds -> naive UTC datetime, or None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        try:
+            parsed = datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+        except (OverflowError, OSError, ValueError):
+            return None
+    elif isinstance(value, str):
+        text = value.strip()
+        if text.endswith(('Z', 'z')):
+            text = text[:-1] + '+00:00'
+        try:
+            parsed = datetime.fromisoformat(text)
+        except ValueError:
+            return None
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    else:
+        return None
+    # The column keeps milliseconds; truncate here so the key is exactly what gets stored
+    return parsed.replace(microsecond=parsed.microsecond // 1000 * 1000)
+
+
+def parse_readings(items, vehicle_ids, now=None):
+    """
+    Validate a batch of reading objects.
+
+    Args:
+        items: list of dicts from the request body
+        vehicle_ids: set of the user's vehicle ids
+        now: naive UTC "now" (readings may be at most TELEMETRY_MAX_FUTURE seconds ahead)
+
+    Returns:
+        (rows, errors): rows are (vehicle_id, ts, odometer_km, latitude, longitude, speed_kmh)
+        tuples; errors are {'index': i, 'errors': [...]} for every invalid item
+    """
+    latest = (now or datetime.now(timezone.utc).replace(tzinfo=None)) + timedelta(seconds=TELEMETRY_MAX_FUTURE)
+    rows = []
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'errors': ['Reading must be an object.']})
+            continue
+        item_errors = []
+        vehicle_id = item.get('vehicle_id')
+        if isinstance(vehicle_id, bool) or vehicle_id not in vehicle_ids:
+            item_errors.append('Vehicle not found.')
+        ts = parse_timestamp(item.get('ts'))
+        if ts is None:
+            item_errors.append('"ts" must be an ISO 8601 timestamp or Unix seconds.')
+        elif ts > latest:
+            item_errors.append('"ts" is in the future.')
+
+        values = []
+        for name, lowest, highest in MEASUREMENTS:
+            value = item.get(name)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))
+                                      or not lowest <= value <= highest):
+                item_errors.append(f'"{name}" must be a number from {lowest} to {highest}.')
+                value = None
+            values.append(value)
+        odometer_km, lat, lon, speed_kmh = values
+        if (lat is None) != (lon is None) and not item_errors:
+            item_errors.append('"lat" and "lon" must be sent together.')
+        elif all(value is None for value in values) and not item_errors:
+            item_errors.append('Reading has no measurements.')
+
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+            continue
+        rows.append((vehicle_id, ts, odometer_km, lat, lon, speed_kmh))
+    return rows, errors
+
+
+def owned_vehicle_ids(conn, user_id):
+    """The user's vehicle ids, cached until their data version changes"""
+    version = stats.get_data_version(conn, user_id)
+
+    def load():
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM vehicles WHERE user_id = %s", (user_id,))
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        return ids
+    return set(cache.get_or_load(f"telemetry:vehicles:{user_id}:{version}", load))
+
+
+# Writing
+@lru_cache(maxsize=8)
+def _insert_statement(count):
+    # IGNORE: an existing (vehicle_id, ts) is left alone (readings are append-only),
+    # and the affected row count tells whether any were skipped. Values are
+    # range-checked by parse_readings, so IGNORE has nothing else to hide
+    values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * count)
+    return ("INSERT IGNORE INTO vehicle_readings (vehicle_id, ts, odometer_km, latitude, longitude, speed_kmh) "
+            f"VALUES {values}")
+
+
+def write_readings(conn, rows, chunk_size=None, commit_each=False):
+    """
+    Insert reading tuples with multi-row INSERTs of chunk_size rows, and fold
+    each chunk into the downsampled tiers. Rows are sorted by primary key
+    first, so InnoDB appends to each vehicle's range.
+
+    Returns:
+        Number of rows sent
+    """
+    chunk_size = chunk_size or TELEMETRY_INSERT_ROWS
+    rows = sorted(rows, key=lambda row: (row[0], row[1]))
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            cursor.execute(_insert_statement(len(chunk)), [value for row in chunk for value in row])
+            timeseries.record_readings(conn, chunk, exact=cursor.rowcount == len(chunk))
+            if commit_each:
+                conn.commit()
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+class ReadingBuffer:
+    """
+    Per-process write-behind buffer. add() only appends under a lock; a
+    daemon thread (started on first use, after fork) does the INSERTs on its
+    own pooled connection.
+    """
+
+    def __init__(self, max_rows=TELEMETRY_BUFFER_MAX, flush_rows=TELEMETRY_FLUSH_ROWS,
+                 interval=TELEMETRY_FLUSH_INTERVAL, insert_rows=TELEMETRY_INSERT_ROWS,
+                 connect=get_db_connection):
+        self.max_rows = max_rows
+        self.flush_rows = flush_rows
+        self.interval = interval
+        self.insert_rows = insert_rows
+        self._connect = connect
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.accepted = 0
+        self.written = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+        self._failures = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, rows):
+        """Queue reading tuples; raises TelemetryBusy when the buffer is full"""
+        with self._lock:
+            if len(self._rows) + len(rows) > self.max_rows:
+                self.rejected += len(rows)
+                raise TelemetryBusy(f"{len(self._rows)} readings waiting to be written")
+            self._rows.extend(rows)
+            self.accepted += len(rows)
+            pending = len(self._rows)
+        self._ensure_thread()
+        if pending >= self.flush_rows:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='telemetry-flush', daemon=True)
+            self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            # Back off while the database is failing (up to 30s)
+            self._wakeup.wait(min(self.interval * 2 ** self._failures, 30) if self._failures else self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Telemetry flush loop error: {str(e)}")
+
+    def flush(self):
+        """Write everything buffered so far; on failure the unwritten rows are kept for the next try"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            started = time.perf_counter()
+            rows.sort(key=lambda row: (row[0], row[1]))
+            done = 0
+            conn = None
+            try:
+                conn = self._connect()
+                for start in range(0, len(rows), self.insert_rows):
+                    done += write_readings(conn, rows[start:start + self.insert_rows],
+                                           self.insert_rows, commit_each=True)
+            except Exception as e:
+                self.flush_errors += 1
+                self._failures = min(self._failures + 1, 10)
+                logger.warning(f"Telemetry flush failed after {done} of {len(rows)} readings: {str(e)}")
+                with self._lock:
+                    # Back to the front, so they go out first next time
+                    self._rows[:0] = rows[done:]
+            else:
+                self._failures = 0
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self.written += done
+            self.flushes += 1
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            return done
+
+    def stats(self):
+        return {'pending': len(self._rows), 'accepted': self.accepted, 'written': self.written,
+                'rejected': self.rejected, 'flushes': self.flushes, 'flush_errors': self.flush_errors,
+                'last_flush_ms': round(self.last_flush_ms, 2)}
+
+
+_buffers = {}
+_buffer_lock = threading.Lock()
+
+
+def get_buffer(shard=shards.MAIN):
+    """This process's write-behind buffer for one shard (readings go where their vehicle is)"""
+    buffer = _buffers.get(shard)
+    if buffer is None:
+        with _buffer_lock:
+            buffer = _buffers.get(shard)
+            if buffer is None:
+                if shard == shards.MAIN:
+                    buffer = ReadingBuffer()
+                else:
+                    buffer = ReadingBuffer(connect=lambda: shards.connection(shard))
+                _buffers[shard] = buffer
+    return buffer
+
+
+def get_telemetry_stats():
+    """Buffer counters for /metrics, summed over the shards' buffers ({} until the first reading arrives)"""
+    totals = {}
+    for buffer in list(_buffers.values()):
+        for name, value in buffer.stats().items():
+            totals[name] = max(totals.get(name, 0), value) if name == 'last_flush_ms' else totals.get(name, 0) + value
+    return totals
+
+
+# Partitions and retention
+def _next_month(year, month):
+    return (year + month // 12, month % 12 + 1)
+
+
+def _month_number(year, month):
+    return year * 12 + month - 1
+
+
+def list_partitions(conn):
+    """[(name, approximate rows)] of vehicle_readings in range order"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT PARTITION_NAME, TABLE_ROWS
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'vehicle_readings'
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """)
+    partitions = [(row[0], row[1]) for row in cursor.fetchall()]
+    cursor.close()
+    return partitions
+
+
+def _monthly(names):
+    months = []
+    for name in names:
+        match = PARTITION_RE.match(name or '')
+        if match:
+            months.append((int(match.group(1)), int(match.group(2))))
+    return months
+
+
+def ensure_partitions(conn, months_ahead=TELEMETRY_PARTITIONS_AHEAD, today=None):
+    """
+    Split monthly partitions off pmax up to months_ahead months from now.
+
+    Returns:
+        Names of the partitions added
+    """
+    names = [name for name, _ in list_partitions(conn)]
+    months = _monthly(names)
+    if 'pmax' not in names or not months:
+        raise RuntimeError("vehicle_readings is not partitioned as expected (run `python migrate.py`)")
+    today = today or date.today()
+    target = _month_number(today.year, today.month) + months_ahead
+    definitions = []
+    added = []
+    year, month = _next_month(*max(months))
+    while _month_number(year, month) <= target:
+        end_year, end_month = _next_month(year, month)
+        name = f"p{year:04d}{month:02d}"
+        definitions.append(f"PARTITION {name} VALUES LESS THAN ('{end_year:04d}-{end_month:02d}-01')")
+        added.append(name)
+        year, month = end_year, end_month
+    if definitions:
+        cursor = conn.cursor()
+        cursor.execute(
+            "ALTER TABLE vehicle_readings REORGANIZE PARTITION pmax INTO ("
+            + ', '.join(definitions) + ", PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+        )
+        cursor.close()
+    return added
+
+
+def drop_expired_partitions(conn, retention_days=TELEMETRY_RETENTION_DAYS, today=None):
+    """
+    Drop partitions that only hold readings older than retention_days
+    (0 keeps everything). Dropping a partition is instant, unlike DELETE.
+
+    Returns:
+        Names of the partitions dropped
+    """
+    if retention_days <= 0:
+        return []
+    cutoff = (today or date.today()) - timedelta(days=retention_days)
+    names = [name for name, _ in list_partitions(conn)]
+    months = sorted(_monthly(names))
+    if not months:
+        return []
+    expired = []
+    for name in names:
+        match = PARTITION_RE.match(name or '')
+        if match:
+            end = date(*_next_month(int(match.group(1)), int(match.group(2))), 1)
+        elif name == 'pmax':
+            continue
+        else:
+            # Catch-all partition below the first month (p_history)
+            end = date(months[0][0], months[0][1], 1)
+        if end <= cutoff:
+            expired.append(name)
+    # Keep at least one partition below pmax
+    expired = expired[:len(names) - 2]
+    if expired:
+        cursor = conn.cursor()
+        cursor.execute(f"ALTER TABLE vehicle_readings DROP PARTITION {', '.join(expired)}")
+        cursor.close()
+    return expired
+
+
+def prune_deleted_vehicles(conn, batch_size=TELEMETRY_PRUNE_BATCH):
+    """
+    Delete readings and tier rows of vehicles that no longer exist (there is
+    no foreign key to cascade), in small committed batches.
+
+    Returns:
+        Number of readings deleted
+    """
+    cursor = conn.cursor()
+    # Loose index scans over the primary keys, not table scans (the daily tier
+    # also covers vehicles whose readings already expired)
+    cursor.execute("SELECT DISTINCT vehicle_id FROM vehicle_readings "
+                   "UNION SELECT DISTINCT vehicle_id FROM vehicle_readings_1d")
+    vehicle_ids = [row[0] for row in cursor.fetchall()]
+    existing = set()
+    for start in range(0, len(vehicle_ids), 1000):
+        chunk = vehicle_ids[start:start + 1000]
+        cursor.execute(f"SELECT id FROM vehicles WHERE id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+        existing.update(row[0] for row in cursor.fetchall())
+    removed = 0
+    for vehicle_id in vehicle_ids:
+        if vehicle_id in existing:
+            continue
+        for table in ['vehicle_readings'] + [tier[2] for tier in timeseries.TIERS]:
+            while True:
+                cursor.execute(f"DELETE FROM {table} WHERE vehicle_id = %s LIMIT %s", (vehicle_id, batch_size))
+                deleted = cursor.rowcount
+                conn.commit()
+                if table == 'vehicle_readings':
+                    removed += deleted
+                if deleted < batch_size:
+                    break
+    cursor.close()
+    return removed
+
+
+def maintain(conn):
+    """Partitions ahead, retention and orphan cleanup in one go"""
+    return {
+        'added': ensure_partitions(conn),
+        'dropped': drop_expired_partitions(conn),
+        'pruned': prune_deleted_vehicles(conn),
+    }
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in ('maintain', 'status'):
+        print("Usage: python telemetry.py maintain|status")
+        sys.exit(1)
+    # Every shard has its own vehicle_readings
+    for shard in shards.names():
+        if shards.enabled():
+            print(f"== shard {shard}")
+        conn = shards.connection(shard)
+        try:
+            if sys.argv[1] == 'maintain':
+                result = maintain(conn)
+                print(f"[OK] Added partitions: {', '.join(result['added']) or 'none'}")
+                print(f"[OK] Dropped partitions: {', '.join(result['dropped']) or 'none'}")
+                print(f"[OK] Removed {result['pruned']} readings of deleted vehicles")
+            else:
+                for name, rows in list_partitions(conn):
+                    print(f"{name:12} ~{rows or 0} rows")
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Shared fixtures: a scripted stand-in for a MySQL connection, so routes and
+helpers can be tested without a database server.
+
+    fake_db.on(r"SELECT id FROM vehicles", columns=('id',), rows=[(1,)])
+    fake_db.on(r"FROM user_stats", lambda sql, params: (('data_version',), [(7,)]))
+
+Statements without a matching rule return no rows; every statement is
+recorded in fake_db.executed as (normalized sql, params).
+"""
+import os
+import re
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('SECRET_KEY', 'test-secret')
+os.environ['SESSION_BACKEND'] = 'cookie'
+os.environ['CACHE_BACKEND'] = 'local'
+os.environ.pop('DB_REPLICAS', None)
+os.environ.pop('DB_SHARDS', None)
+
+
+class FakeCursor:
+    def __init__(self, connection, dictionary=False):
+        self.connection = connection
+        self.dictionary = dictionary
+        self.column_names = ()
+        self.rowcount = -1
+        self.lastrowid = None
+        self._rows = []
+
+    @property
+    def with_rows(self):
+        return bool(self.column_names)
+
+    def execute(self, sql, params=()):
+        sql = ' '.join(sql.split())
+        params = tuple(params or ())
+        self.connection.executed.append((sql, params))
+        columns, rows = self.connection.respond(sql, params)
+        self.column_names = tuple(columns)
+        self._rows = [dict(zip(columns, row)) if self.dictionary else tuple(row) for row in rows]
+        self.rowcount = len(rows) if columns else 1
+        if sql.upper().startswith('INSERT'):
+            self.connection.last_id += 1
+            self.lastrowid = self.connection.last_id
+
+    def executemany(self, sql, rows):
+        for row in rows:
+            self.execute(sql, row)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.rules = []
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.last_id = 1000
+
+    def on(self, pattern, respond=None, columns=(), rows=()):
+        """Answer statements matching pattern with respond(sql, params) -> (columns, rows), or fixed rows"""
+        if respond is None:
+            respond = lambda sql, params: (columns, list(rows))
+        self.rules.insert(0, (re.compile(pattern, re.IGNORECASE), respond))
+
+    def respond(self, sql, params):
+        for pattern, respond in self.rules:
+            if pattern.search(sql):
+                return respond(sql, params)
+        return (), []
+
+    def statements(self, pattern):
+        return [(sql, params) for sql, params in self.executed if re.search(pattern, sql, re.IGNORECASE)]
+
+    def cursor(self, dictionary=False, **kwargs):
+        return FakeCursor(self, dictionary=dictionary)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def ping(self, reconnect=False):
+        pass
+
+    def open(self):
+        return self
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Every get_db() / get_read_db() of the app returns one FakeConnection"""
+    import cache
+    import db
+    connection = FakeConnection()
+    monkeypatch.setattr(db, 'get_db', lambda shard=None: connection)
+    monkeypatch.setattr(db, 'get_read_db', lambda user_id=None: connection)
+    monkeypatch.setattr(cache, '_cache', None)
+    return connection
+
+
+@pytest.fixture
+def app(monkeypatch):
+    import app as app_module
+    import cache
+    monkeypatch.setattr(cache, '_cache', None)
+    app_module.app.config.update(TESTING=True)
+    return app_module.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """Log the test client in as the given user id"""
+    def login_as(user_id=1):
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+    return login_as
@@ -0,0 +1,77 @@
+"""Monthly cost rollups (rollups.py) and the dashboard analytics built on them (analytics.py)"""
+import tracemalloc
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+import analytics
+import rollups
+
+
+def test_group_merges_logs_of_the_same_vehicle_month_and_type():
+    groups = rollups._group([
+        (1, 'Oil Change', '2024-03-02', Decimal('40.00')),
+        (1, 'Oil Change', date(2024, 3, 28), 35.5),
+        (1, 'Oil Change', '2024-04-01', None),
+        (2, 'Tires', '2024-03-15', '300'),
+    ])
+    assert groups == {
+        (1, date(2024, 3, 1), 'Oil Change'): [2, Decimal('75.50')],
+        (1, date(2024, 4, 1), 'Oil Change'): [1, Decimal('0')],
+        (2, date(2024, 3, 1), 'Tires'): [1, Decimal('300')],
+    }
+
+
+def rollup_rows():
+    # vehicle_id, brand, model, year, month, maintenance_type, log_count, total_cost
+    rows = [(1, 'Toyota', 'Vios', 2019, date(2024, month, 1), 'Oil Change', 1, Decimal('50'))
+            for month in range(1, 13)]
+    rows += [(2, 'Honda', 'City', 2020, date(2024, month, 1), 'Oil Change', 1, Decimal('50'))
+             for month in range(7, 13)]
+    rows.append((2, 'Honda', 'City', 2020, date(2024, 10, 1), 'Engine', 1, Decimal('2000')))
+    return rows
+
+
+def test_compute_totals_types_and_vehicles():
+    result = analytics.compute(analytics.FleetRollups(rollup_rows()), today=date(2024, 12, 15), months=12)
+
+    assert result['total'] == 12 * 50 + 6 * 50 + 2000
+    assert result['log_count'] == 19
+    assert [month['month'] for month in result['monthly']][:2] == ['2024-01', '2024-02']
+    assert result['monthly'][0]['cost'] == 50.0
+    assert result['monthly'][9] == {'month': '2024-10', 'cost': 2100.0, 'pct': 100}
+    assert [entry['type'] for entry in result['by_type']] == ['Engine', 'Oil Change']
+    assert result['vehicles'][0] == {'id': 2, 'label': 'Honda City (2020)', 'total': 2300.0,
+                                     'per_year': pytest.approx(2300.0 / 0.5)}
+    # Tracked for half a year, so per year is twice its total
+    assert result['vehicles'][1]['per_year'] == pytest.approx(600.0)
+
+
+def test_compute_flags_the_expensive_month():
+    result = analytics.compute(analytics.FleetRollups(rollup_rows()), today=date(2024, 12, 15), months=12)
+    assert [(outlier['vehicle_id'], outlier['month']) for outlier in result['outliers']] == [(2, '2024-10')]
+
+
+def test_compute_without_data_has_an_empty_window():
+    result = analytics.compute(analytics.FleetRollups([]), today=date(2024, 3, 1), months=3)
+    assert result['total'] == 0.0
+    assert [month['month'] for month in result['monthly']] == ['2024-01', '2024-02', '2024-03']
+
+
+def test_ancient_log_does_not_blow_up_memory():
+    rows = [(vehicle_id, 'Toyota', 'Vios', 2019, date(2024, month, 1), 'Oil Change', 1, Decimal('50'))
+            for vehicle_id in range(2000) for month in range(1, 13)]
+    rows.append((7, 'Toyota', 'Vios', 2019, date(1, 1, 1), 'Oil Change', 1, Decimal('80')))
+    data = analytics.FleetRollups(rows)
+
+    tracemalloc.start()
+    try:
+        result = analytics.compute(data, today=date(2024, 12, 15), months=12)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert peak < 20 * 1024 * 1024
+    assert result['total'] == 2000 * 12 * 50 + 80
+    assert result['monthly'][0]['cost'] == 2000 * 50
@@ -0,0 +1,141 @@
+"""Batch writes of the JSON API (api.py)"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+VEHICLE_COLUMNS = ('id', 'brand', 'model', 'year', 'plate_number')
+
+
+@pytest.fixture
+def garage(fake_db):
+    vehicles = {
+        5: (5, 'Toyota', 'Vios', 2019, 'ABC 123'),
+        6: (6, 'Honda', 'City', 2020, 'XYZ 789'),
+    }
+
+    def select_vehicles(sql, params):
+        return VEHICLE_COLUMNS, [vehicles[i] for i in params[1:] if i in vehicles]
+    fake_db.on(r"SELECT id, brand, model, year, plate_number FROM vehicles", select_vehicles)
+    return vehicles
+
+
+def updates(fake_db):
+    return [params for _, params in fake_db.statements(r"^UPDATE vehicles SET")]
+
+
+def test_update_items_keep_their_own_ids(client, login, fake_db, garage):
+    login(1)
+    response = client.post('/api/v1/vehicles/batch', json={'update': [
+        {'id': 5, 'model': 'Vios GR'},
+        {'id': 6, 'model': 'City RS'},
+    ]})
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == [5, 6]
+    assert updates(fake_db) == [
+        ('Toyota', 'Vios GR', 2019, 'ABC 123', 5, 1),
+        ('Honda', 'City RS', 2020, 'XYZ 789', 6, 1),
+    ]
+    assert fake_db.commits == 1
+
+
+def test_duplicate_update_ids_are_rejected(client, login, fake_db, garage):
+    login(1)
+    response = client.post('/api/v1/vehicles/batch', json={'update': [
+        {'id': 5, 'model': 'Vios GR'},
+        {'id': 5, 'model': 'Vios XLE'},
+        {'id': 6, 'model': 'City RS'},
+    ]})
+    assert response.status_code == 422
+    assert response.get_json()['details'] == [
+        {'op': 'update', 'index': 1, 'errors': ['Vehicle is updated more than once in this batch.']}
+    ]
+    assert updates(fake_db) == []
+    assert fake_db.commits == 0
+
+
+def test_null_field_keeps_the_current_value(client, login, fake_db, garage):
+    login(1)
+    response = client.post('/api/v1/vehicles/batch', json={'update': [{'id': 5, 'brand': None, 'year': 2021}]})
+    assert response.status_code == 200
+    assert updates(fake_db) == [('Toyota', 'Vios', 2021, 'ABC 123', 5, 1)]
+
+
+def test_null_field_on_create_is_missing(client, login, fake_db, garage):
+    login(1)
+    response = client.post('/api/v1/vehicles/batch', json={'create': [
+        {'brand': None, 'model': 'Vios', 'year': 2020, 'plate_number': 'NEW 001'},
+    ]})
+    assert response.status_code == 422
+    assert fake_db.statements(r"^INSERT INTO vehicles") == []
+
+
+def test_unknown_vehicle_is_not_found(client, login, fake_db, garage):
+    login(1)
+    response = client.post('/api/v1/vehicles/batch', json={'update': [{'id': 99, 'model': 'X'}]})
+    assert response.status_code == 422
+    assert response.get_json()['details'][0]['errors'] == ['Vehicle not found.']
+
+
+LOG_COLUMNS = ('id', 'vehicle_id', 'maintenance_type', 'description', 'cost', 'maintenance_date')
+
+
+@pytest.fixture
+def logs(fake_db, garage):
+    rows = {
+        40: (40, 5, 'Oil Change', None, Decimal('40.00'), date(2024, 3, 2)),
+        41: (41, 5, 'Tires', 'Front pair', Decimal('300.00'), date(2024, 4, 9)),
+    }
+
+    def select_logs(sql, params):
+        return LOG_COLUMNS, [rows[i] for i in params[1:] if i in rows]
+    fake_db.on(r"SELECT id, vehicle_id, maintenance_type, description, cost, maintenance_date FROM maintenance_logs",
+               select_logs)
+    fake_db.on(r"SELECT id FROM vehicles WHERE user_id", lambda sql, params: (
+        ('id',), [(i,) for i in params[1:] if i in garage]))
+    return rows
+
+
+def log_updates(fake_db):
+    return [params for _, params in fake_db.statements(r"^UPDATE maintenance_logs SET")]
+
+
+def test_log_update_changes_only_the_given_fields(client, login, fake_db, logs):
+    login(1)
+    response = client.post('/api/v1/maintenance/batch', json={'update': [
+        {'id': 41, 'cost': 350, 'description': None},
+        {'id': 40, 'maintenance_date': '2024-05-01', 'vehicle_id': 6},
+    ]})
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == [41, 40]
+    assert log_updates(fake_db) == [
+        (5, 'Tires', 'Front pair', Decimal('350'), '2024-04-09', 41, 1),
+        (6, 'Oil Change', None, Decimal('40.00'), '2024-05-01', 40, 1),
+    ]
+    assert fake_db.commits == 1
+
+
+def test_log_update_moves_cost_between_stats_and_rollups(client, login, fake_db, logs):
+    login(1)
+    client.post('/api/v1/maintenance/batch', json={'update': [
+        {'id': 40, 'cost': 55, 'maintenance_type': 'Inspection', 'maintenance_date': '2024-05-01'},
+    ]})
+    [(_, params)] = fake_db.statements(r"total_cost = GREATEST\(total_cost \+")
+    assert params == (1, Decimal('15.00'))
+    [(_, removed)] = fake_db.statements(r"^UPDATE maintenance_monthly")
+    assert removed == (1, Decimal('40.00'), 1, 5, date(2024, 3, 1), 'Oil Change')
+    [(_, added)] = fake_db.statements(r"^INSERT INTO maintenance_monthly")
+    assert added == (1, 5, date(2024, 5, 1), 'Inspection', 1, Decimal('55'))
+
+
+def test_invalid_log_updates_change_nothing(client, login, fake_db, logs):
+    login(1)
+    response = client.post('/api/v1/maintenance/batch', json={
+        'update': [{'id': 40, 'cost': -1}, {'id': 41, 'vehicle_id': 99}, {'id': 40}, {'id': 77}],
+        'delete': [41],
+    })
+    assert response.status_code == 422
+    assert [(detail['op'], detail['index']) for detail in response.get_json()['details']] == [
+        ('update', 0), ('update', 1), ('update', 2), ('update', 3)]
+    assert log_updates(fake_db) == []
+    assert fake_db.commits == 0
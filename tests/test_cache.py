@@ -0,0 +1,83 @@
+"""Per-user caching across gunicorn workers (cache.py, stats.py)"""
+import pytest
+
+import cache
+import stats
+
+
+@pytest.fixture
+def user_stats_row(fake_db):
+    row = {'data_version': 3}
+    fake_db.on(r"SELECT data_version FROM user_stats", lambda sql, params: (('data_version',), [(row['data_version'],)]))
+    fake_db.on(r"SELECT vehicle_count, log_count", lambda sql, params: (
+        ('vehicle_count', 'log_count', 'total_cost', 'min_year', 'max_year', 'data_version'),
+        [(2, 5, 100, 2019, 2020, row['data_version'])]))
+    return row
+
+
+@pytest.fixture
+def several_workers(monkeypatch):
+    monkeypatch.setattr(cache, 'WEB_CONCURRENCY', 4)
+
+
+def test_local_cache_is_coherent_in_a_single_worker(fake_db):
+    assert cache.get_cache().backend == 'local'
+    assert cache.is_coherent()
+
+
+def test_local_cache_is_not_coherent_across_workers(fake_db, several_workers):
+    assert not cache.is_coherent()
+
+
+def test_single_worker_caches_stats_until_invalidated(fake_db, user_stats_row):
+    assert stats.get_user_stats(fake_db, 1)['data_version'] == 3
+    assert stats.get_data_version(fake_db, 1) == 3
+    user_stats_row['data_version'] = 4
+    assert stats.get_user_stats(fake_db, 1)['data_version'] == 3
+    assert len(fake_db.statements(r"FROM user_stats")) == 2
+    cache.invalidate_user(1)
+    assert stats.get_user_stats(fake_db, 1)['data_version'] == 4
+    assert stats.get_data_version(fake_db, 1) == 4
+
+
+def test_single_worker_caches_vehicle_rows(app, fake_db):
+    import app as app_module
+    fake_db.on(r"SELECT \* FROM vehicles WHERE id", columns=('id', 'user_id', 'brand'), rows=[(5, 1, 'Toyota')])
+    with app.app_context():
+        assert app_module.get_user_vehicle(5, 1)['brand'] == 'Toyota'
+        assert app_module.get_user_vehicle(5, 1)['brand'] == 'Toyota'
+        assert len(fake_db.statements(r"FROM vehicles")) == 1
+        cache.invalidate_vehicle(1, 5)
+        app_module.get_user_vehicle(5, 1)
+        assert len(fake_db.statements(r"FROM vehicles")) == 2
+
+
+def test_several_workers_read_versions_and_stats_from_mysql(fake_db, user_stats_row, several_workers):
+    assert stats.get_data_version(fake_db, 1) == 3
+    assert stats.get_user_stats(fake_db, 1)['data_version'] == 3
+    # Another worker commits a change: this worker's invalidate_* never ran
+    user_stats_row['data_version'] = 4
+    assert stats.get_data_version(fake_db, 1) == 4
+    assert stats.get_user_stats(fake_db, 1)['data_version'] == 4
+
+
+def test_shared_backend_caches_until_invalidated(fake_db, user_stats_row, monkeypatch):
+    monkeypatch.setattr(cache, 'is_coherent', lambda: True)
+    assert stats.get_data_version(fake_db, 1) == 3
+    user_stats_row['data_version'] = 4
+    assert stats.get_data_version(fake_db, 1) == 3
+    cache.invalidate_user(1)
+    assert stats.get_data_version(fake_db, 1) == 4
+
+
+def test_log_page_key_follows_the_data_version(fake_db):
+    first = cache.maintenance_page_key(1, 5, None, 25, version=3)
+    assert cache.maintenance_page_key(1, 5, None, 25, version=3) == first
+    assert cache.maintenance_page_key(1, 5, None, 25, version=4) != first
+
+
+def test_log_page_generation_changes_on_invalidation(fake_db):
+    first = cache.maintenance_page_key(1, 5, None, 25)
+    assert cache.maintenance_page_key(1, 5, None, 25) == first
+    cache.invalidate_maintenance(1, 5)
+    assert cache.maintenance_page_key(1, 5, None, 25) != first
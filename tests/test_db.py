@@ -0,0 +1,109 @@
+"""Lazy request connections and the retrying transaction helper (db.py)"""
+import mysql.connector
+import pytest
+
+import db
+from conftest import FakeConnection
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(db, 'TX_RETRY_DELAY', 0)
+
+
+class ClosableConnection(FakeConnection):
+    def __init__(self):
+        super().__init__()
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_request_connection_connects_on_first_cursor():
+    opened = []
+
+    def connect():
+        opened.append(ClosableConnection())
+        return opened[-1]
+    conn = db.RequestConnection(connect=connect)
+    conn.commit()
+    conn.rollback()
+    assert opened == [] and not conn.opened
+
+    conn.cursor().execute("SELECT 1")
+    conn.cursor().execute("SELECT 2")
+    assert len(opened) == 1 and conn.opened
+
+    conn.release()
+    assert opened[0].closed and not conn.opened
+    conn.cursor()
+    assert len(opened) == 2
+
+
+def deadlock():
+    return mysql.connector.Error(msg='Deadlock found', errno=1213)
+
+
+def test_deadlocked_work_is_retried_and_committed_once():
+    conn = FakeConnection()
+    attempts = []
+
+    def work(conn):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise deadlock()
+        return 'done'
+
+    assert db.run_on_connection(conn, work, retries=3) == 'done'
+    assert len(attempts) == 3
+    assert conn.rollbacks == 2
+    assert conn.commits == 1
+
+
+def test_retries_give_up_after_the_limit():
+    conn = FakeConnection()
+    attempts = []
+
+    def work(conn):
+        attempts.append(1)
+        raise deadlock()
+
+    with pytest.raises(mysql.connector.Error):
+        db.run_on_connection(conn, work, retries=2)
+    assert len(attempts) == 3
+    assert conn.commits == 0
+
+
+def test_other_errors_are_not_retried():
+    conn = FakeConnection()
+    attempts = []
+
+    def work(conn):
+        attempts.append(1)
+        raise mysql.connector.Error(msg='Duplicate entry', errno=1062)
+
+    with pytest.raises(mysql.connector.Error):
+        db.run_on_connection(conn, work, retries=3)
+    assert len(attempts) == 1
+    assert conn.rollbacks == 1
+
+
+def test_failed_rollback_releases_the_request_connection():
+    class BrokenConnection(ClosableConnection):
+        def rollback(self):
+            raise mysql.connector.Error(msg='Lost connection', errno=2013)
+    broken = BrokenConnection()
+    conn = db.RequestConnection(connect=lambda: broken)
+    conn.open()
+
+    db._rollback(conn)
+
+    assert broken.closed and not conn.opened
+
+
+def test_run_in_transaction_uses_the_request_connection(app, fake_db):
+    with app.test_request_context():
+        db.run_in_transaction(lambda conn: conn.cursor().execute("UPDATE vehicles SET model = %s", ('Vios',)))
+    assert fake_db.statements(r"UPDATE vehicles") == [("UPDATE vehicles SET model = %s", ('Vios',))]
+    assert fake_db.commits == 1
@@ -0,0 +1,77 @@
+"""Streaming exports (exports.py, /export/csv)"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import exports
+from conftest import FakeConnection
+
+VEHICLE_COLUMNS = ('id', 'brand', 'model', 'year', 'plate_number', 'created_at')
+
+
+def test_vehicle_export_queries_after_the_session_is_saved(app, client, login, fake_db, monkeypatch):
+    # Without replicas the session store writes on the export's connection,
+    # which can't run anything while the export's result set is unread
+    interface = app.session_interface
+    save_session = interface.save_session
+
+    def recording_save(*args):
+        fake_db.executed.append(('SAVE SESSION', ()))
+        return save_session(*args)
+    monkeypatch.setattr(interface, 'save_session', recording_save)
+
+    login(1)
+    fake_db.on(r"FROM vehicles WHERE user_id", columns=VEHICLE_COLUMNS,
+               rows=[(5, 'Toyota', 'Vios', 2019, 'ABC 123', datetime(2024, 1, 2, 3, 4, 5))])
+    fake_db.executed.clear()
+
+    lines = client.get('/export/csv').get_data(as_text=True).splitlines()
+
+    assert [sql.split()[0] for sql, _ in fake_db.executed] == ['SAVE', 'SELECT']
+    assert lines[0] == 'ID,Brand,Model,Year,Plate Number,Created At'
+    assert lines[1].startswith('5,Toyota,Vios,2019,ABC 123,2024-01-02')
+
+
+def test_iter_chunks_reads_in_chunks():
+    conn = FakeConnection()
+    conn.on(r"SELECT", columns=('n',), rows=[(n,) for n in range(5)])
+    cursor = conn.cursor()
+    cursor.execute("SELECT n")
+    assert [len(chunk) for chunk in exports.iter_chunks(cursor, chunk_size=2)] == [2, 2, 1]
+
+
+def maintenance_row(log_id, vehicle_id, day):
+    return {'log_id': log_id, 'vehicle_id': vehicle_id, 'brand': 'Toyota', 'model': 'Vios', 'year': 2019,
+            'plate_number': 'ABC 123', 'maintenance_type': 'Oil Change', 'description': None,
+            'cost': Decimal('45.50'), 'maintenance_date': date(2024, 1, day),
+            'created_at': datetime(2024, 1, day, 8, 0)}
+
+
+def test_maintenance_pages_continue_after_the_last_key():
+    rows = [maintenance_row(n, 1 + n // 3, n + 1) for n in range(5)]
+    pages = iter(rows[i:i + 2] for i in range(0, 5, 2))
+    conn = FakeConnection()
+    columns = exports.MAINTENANCE_EXPORT_COLUMNS
+    conn.on(r"FROM maintenance_logs",
+            lambda sql, params: (columns, [[row[column] for column in columns] for row in next(pages)]))
+
+    result = list(exports.iter_maintenance_pages(conn, 7, vehicle_ids=[1, 2], page_size=2))
+
+    assert [[row['log_id'] for row in page] for page in result] == [[0, 1], [2, 3], [4]]
+    queries = conn.statements(r"FROM maintenance_logs")
+    assert len(queries) == 3
+    assert 'OFFSET' not in queries[-1][0]
+    assert queries[0][1] == (7, 1, 2, 2)
+    # (vehicle_id, maintenance_date, id) of log 3
+    assert queries[2][1] == (7, 1, 2, 2, 2, date(2024, 1, 4), date(2024, 1, 4), 3, 2)
+
+
+def test_ndjson_encodes_dates_and_decimals():
+    lines = ''.join(exports.stream_ndjson([[maintenance_row(1, 2, 3)]])).splitlines()
+    assert len(lines) == 1
+    record = json.loads(lines[0])
+    assert list(record) == exports.MAINTENANCE_EXPORT_COLUMNS
+    assert record['cost'] == 45.5
+    assert record['maintenance_date'] == '2024-01-03'
+    assert record['created_at'] == '2024-01-03T08:00:00'
+    assert record['description'] is None
@@ -0,0 +1,70 @@
+"""Per-row fragment caching (fragments.render_rows)"""
+from datetime import datetime
+
+import pytest
+from flask import Flask
+from jinja2 import DictLoader
+
+import cache
+import fragments
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    monkeypatch.setattr(cache, '_cache', None)
+    monkeypatch.setattr(fragments, '_template_hashes', {})
+    monkeypatch.setattr(fragments, 'FRAGMENT_CACHE', True)
+    calls = []
+    app = Flask(__name__)
+    app.jinja_loader = DictLoader({'_row.html': '<li>{{ r.name|counted }}</li>'})
+
+    def counted(value):
+        calls.append(value)
+        return value
+    app.jinja_env.filters['counted'] = counted
+    fragments.init_app(app)
+
+    def render(rows):
+        with app.app_context():
+            return str(fragments.render_rows('_row.html', rows, 'r'))
+    render.calls = calls
+    render.app = app
+    return render
+
+
+def row(row_id, name, minute=0):
+    return {'id': row_id, 'name': name, 'updated_at': datetime(2024, 1, 1, 12, minute)}
+
+
+def test_unchanged_rows_are_served_from_the_cache(renders):
+    rows = [row(1, 'a'), row(2, 'b')]
+    assert renders(rows) == '<li>a</li><li>b</li>'
+    assert renders(rows) == '<li>a</li><li>b</li>'
+    assert renders.calls == ['a', 'b']
+
+
+def test_a_new_updated_at_re_renders_only_that_row(renders):
+    renders([row(1, 'a'), row(2, 'b')])
+    assert renders([row(1, 'a'), row(2, 'B', minute=1)]) == '<li>a</li><li>B</li>'
+    assert renders.calls == ['a', 'b', 'B']
+
+
+def test_rows_without_updated_at_are_never_cached(renders):
+    rows = [{'id': 1, 'name': 'a'}]
+    renders(rows)
+    renders(rows)
+    assert renders.calls == ['a', 'a']
+
+
+def test_editing_the_partial_changes_the_key(renders):
+    renders([row(1, 'a')])
+    renders.app.jinja_loader.mapping['_row.html'] = '<p>{{ r.name|counted }}</p>'
+    renders.app.jinja_env.auto_reload = True
+    assert renders([row(1, 'a')]) == '<p>a</p>'
+    assert renders.calls == ['a', 'a']
+
+
+def test_fragment_key_includes_id_and_version():
+    key = fragments.fragment_key('_row.html', 'abc', row(7, 'a'))
+    assert key == 'fragment:_row.html:abc:7:2024-01-01T12:00:00'
+    assert fragments.fragment_key('_row.html', 'abc', {'id': None, 'updated_at': datetime(2024, 1, 1)}) is None
@@ -0,0 +1,81 @@
+"""Conditional GET for pages and the API (http_cache.py)"""
+import pytest
+
+import cache
+
+STATS_COLUMNS = ('vehicle_count', 'log_count', 'total_cost', 'min_year', 'max_year', 'data_version')
+
+
+@pytest.fixture
+def user_stats_row(fake_db):
+    row = {'data_version': 3}
+    fake_db.on(r"SELECT data_version FROM user_stats", lambda sql, params: (('data_version',), [(row['data_version'],)]))
+    fake_db.on(r"SELECT vehicle_count, log_count", lambda sql, params: (
+        STATS_COLUMNS, [(2, 0, 0, 2019, 2020, row['data_version'])]))
+    return row
+
+
+def stats_queries(fake_db):
+    return len(fake_db.statements(r"SELECT vehicle_count, log_count"))
+
+
+def test_unchanged_page_answers_304_without_running_the_view(client, login, fake_db, user_stats_row):
+    login(1)
+    first = client.get('/dashboard')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    queries = stats_queries(fake_db)
+    again = client.get('/dashboard', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+    assert stats_queries(fake_db) == queries
+
+
+def test_write_through_another_worker_changes_the_etag(client, login, fake_db, user_stats_row, monkeypatch):
+    monkeypatch.setattr(cache, 'WEB_CONCURRENCY', 4)
+    login(1)
+    etag = client.get('/dashboard').headers['ETag']
+    # Committed elsewhere: no invalidate_* ran in this process
+    user_stats_row['data_version'] = 4
+    response = client.get('/dashboard', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_shared_cache_answers_304_without_a_query(client, login, fake_db, user_stats_row, monkeypatch):
+    monkeypatch.setattr(cache, 'is_coherent', lambda: True)
+    login(1)
+    etag = client.get('/api/v1/stats').headers['ETag']
+    fake_db.executed.clear()
+    response = client.get('/api/v1/stats', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert fake_db.executed == []
+
+
+def test_shared_cache_etag_changes_after_a_write(client, login, fake_db, user_stats_row, monkeypatch):
+    monkeypatch.setattr(cache, 'is_coherent', lambda: True)
+    login(1)
+    etag = client.get('/api/v1/stats').headers['ETag']
+    user_stats_row['data_version'] = 4
+    cache.invalidate_user(1)
+    response = client.get('/api/v1/stats', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_pending_flash_is_never_answered_with_304(client, login, fake_db, user_stats_row):
+    login(1)
+    etag = client.get('/dashboard').headers['ETag']
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', 'Vehicle added.')]
+    response = client.get('/dashboard', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Vehicle added.' in response.data
+
+
+def test_etag_depends_on_the_url(client, login, fake_db, user_stats_row):
+    login(1)
+    assert client.get('/api/v1/stats').headers['ETag'] != client.get('/api/v1/stats?fields=log_count').headers['ETag']
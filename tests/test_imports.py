@@ -0,0 +1,71 @@
+"""Batched CSV imports (imports.py)"""
+import mysql.connector
+import pytest
+
+import db
+import imports
+
+
+@pytest.fixture
+def transact(fake_db, monkeypatch):
+    monkeypatch.setattr(db, 'TX_RETRY_DELAY', 0)
+    return lambda work: db.run_on_connection(fake_db, work)
+
+
+def vehicle_rows(*plates):
+    return [{'brand': 'Toyota', 'model': 'Vios', 'year': '2019', 'plate_number': plate} for plate in plates]
+
+
+def inserted_plates(fake_db):
+    return [params[4] for _, params in fake_db.statements(r"^INSERT INTO vehicles")]
+
+
+def test_a_bad_row_only_fails_itself(fake_db, transact, caplog):
+    def insert(sql, params):
+        if params[4] == 'BAD 2':
+            raise mysql.connector.IntegrityError(msg="Duplicate entry 'BAD 2' for key 'uq_plate'", errno=1062)
+        return (), []
+    fake_db.on(r"^INSERT INTO vehicles", insert)
+
+    report = imports.run_import(transact, 1, 'vehicles', vehicle_rows('AAA 1', 'BAD 2', 'CCC 3'), batch_size=10)
+
+    assert report.inserted == 2
+    assert [line for line, _ in report.errors] == [3]
+    message = report.errors[0][1][0]
+    assert message.startswith('Could not be saved')
+    assert 'Duplicate entry' not in message
+    assert 'Duplicate entry' in caplog.text
+    # The batch, then each row on its own
+    assert inserted_plates(fake_db) == ['AAA 1', 'BAD 2', 'AAA 1', 'BAD 2', 'CCC 3']
+
+
+def test_deadlocked_batch_is_retried(fake_db, transact):
+    attempts = []
+
+    def insert(sql, params):
+        attempts.append(params[4])
+        if len(attempts) == 1:
+            raise mysql.connector.DatabaseError(msg='Deadlock found when trying to get lock', errno=1213)
+        return (), []
+    fake_db.on(r"^INSERT INTO vehicles", insert)
+
+    report = imports.run_import(transact, 1, 'vehicles', vehicle_rows('AAA 1', 'BBB 2'), batch_size=10)
+
+    assert report.inserted == 2
+    assert report.errors == []
+    assert attempts == ['AAA 1', 'AAA 1', 'BBB 2']
+    assert fake_db.rollbacks == 1
+
+
+def test_errors_are_reported_in_line_order(fake_db, transact):
+    def insert(sql, params):
+        if params[4] == 'BAD 1':
+            raise mysql.connector.DataError(msg='Data too long', errno=1406)
+        return (), []
+    fake_db.on(r"^INSERT INTO vehicles", insert)
+
+    rows = vehicle_rows('BAD 1', '', 'CCC 3')
+    report = imports.run_import(transact, 1, 'vehicles', rows, batch_size=10)
+
+    assert [line for line, _ in report.errors] == [2, 3]
+    assert report.inserted == 1
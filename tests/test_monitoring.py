@@ -0,0 +1,30 @@
+"""Access to the monitoring endpoints"""
+import pytest
+
+import app as app_module
+
+REMOTE = {'REMOTE_ADDR': '203.0.113.9'}
+ENDPOINTS = ['/metrics', '/cache-stats', '/pool-stats']
+
+
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_remote_requests_are_refused_without_token(client, path):
+    assert client.get(path, environ_base=REMOTE).status_code == 403
+
+
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_local_requests_are_allowed_without_token(client, path):
+    assert client.get(path).status_code == 200
+
+
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_proxied_requests_are_not_local(client, path):
+    assert client.get(path, headers={'X-Forwarded-For': '203.0.113.9'}).status_code == 403
+
+
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_token_is_required_once_set(client, monkeypatch, path):
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', 's3cret')
+    assert client.get(path).status_code == 403
+    assert client.get(path, environ_base=REMOTE, headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    assert client.get(path, environ_base=REMOTE, headers={'Authorization': 'Bearer s3cret'}).status_code == 200
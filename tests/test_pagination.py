@@ -0,0 +1,63 @@
+"""Keyset pagination cursors (pagination.py)"""
+from datetime import date
+
+import pytest
+
+import pagination
+from conftest import FakeConnection
+
+
+def test_cursor_round_trip():
+    assert pagination.encode_cursor(2019, 345) == '2019_345'
+    assert pagination.decode_cursor('2019_345', int) == (2019, 345)
+    token = pagination.encode_cursor(date(2024, 3, 1), 7)
+    assert token == '2024-03-01_7'
+    assert pagination.decode_cursor(token, pagination._parse_date) == (date(2024, 3, 1), 7)
+    assert pagination.decode_cursor(None, int) is None
+
+
+@pytest.mark.parametrize('token', ['345', '_345', '2019_x', 'abc_1'])
+def test_malformed_cursor_raises_value_error(token):
+    with pytest.raises(ValueError):
+        pagination.decode_cursor(token, int)
+
+
+@pytest.mark.parametrize('value, expected', [(None, 24), ('x', 24), ('0', 1), ('10', 10), ('1000', 100)])
+def test_page_size_is_clamped(value, expected):
+    assert pagination.get_page_size(value, 24) == expected
+
+
+def test_vehicle_page_fetches_one_extra_row_for_the_next_cursor():
+    conn = FakeConnection()
+    conn.on(r"FROM vehicles", columns=('id', 'year'), rows=[(9, 2021), (8, 2020), (5, 2020)])
+
+    vehicles, next_cursor = pagination.fetch_vehicle_page(conn, 1, per_page=2)
+
+    assert [vehicle['id'] for vehicle in vehicles] == [9, 8]
+    assert next_cursor == '2020_8'
+    sql, params = conn.statements(r"FROM vehicles")[0]
+    assert 'OFFSET' not in sql
+    assert params == (1, 3)
+
+
+def test_vehicle_page_starts_after_the_cursor():
+    conn = FakeConnection()
+    conn.on(r"FROM vehicles", columns=('id', 'year'), rows=[(5, 2020)])
+
+    vehicles, next_cursor = pagination.fetch_vehicle_page(conn, 1, '2020_8', per_page=2)
+
+    assert next_cursor is None
+    sql, params = conn.statements(r"FROM vehicles")[0]
+    assert '(year < %s OR (year = %s AND id < %s))' in sql
+    assert params == (1, 2020, 2020, 8, 3)
+
+
+def test_log_page_cursor_uses_the_maintenance_date():
+    conn = FakeConnection()
+    conn.on(r"FROM maintenance_logs", columns=('id', 'maintenance_date'),
+            rows=[(30, date(2024, 5, 2)), (29, date(2024, 5, 1)), (12, date(2024, 5, 1))])
+
+    logs, next_cursor = pagination.fetch_log_page(conn, 4, 1, '2024-05-03_31', per_page=2)
+
+    assert next_cursor == '2024-05-01_29'
+    assert conn.statements(r"FROM maintenance_logs")[0][1] == (4, 1, date(2024, 5, 3), date(2024, 5, 3), 31, 3)
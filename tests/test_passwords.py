@@ -0,0 +1,30 @@
+"""Password hash method bookkeeping (passwords.configured_method / needs_rehash)"""
+import pytest
+from werkzeug.security import generate_password_hash
+
+import passwords
+
+
+@pytest.mark.parametrize('method', [
+    None, 'scrypt', 'scrypt:1024:8:1', 'pbkdf2', 'pbkdf2:sha512', 'pbkdf2:sha256:1000',
+])
+def test_configured_method_matches_what_werkzeug_writes(monkeypatch, method):
+    monkeypatch.setattr(passwords, 'HASH_METHOD', method)
+    expected = passwords.method_of(generate_password_hash('x', method=method or 'scrypt'))
+    assert passwords.configured_method() == expected
+
+
+def test_configured_method_does_not_hash(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('hashed on the request thread')
+    monkeypatch.setattr(passwords, 'generate_password_hash', fail)
+    monkeypatch.setattr(passwords, 'HASH_METHOD', 'scrypt:16384:8:1')
+    assert passwords.configured_method() == 'scrypt:16384:8:1'
+
+
+def test_needs_rehash_after_cost_change(monkeypatch):
+    monkeypatch.setattr(passwords, 'HASH_METHOD', 'pbkdf2:sha256:1000')
+    stored = generate_password_hash('x', method='pbkdf2:sha256:1000')
+    assert not passwords.needs_rehash(stored)
+    monkeypatch.setattr(passwords, 'HASH_METHOD', 'pbkdf2:sha256:2000')
+    assert passwords.needs_rehash(stored)
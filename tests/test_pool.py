@@ -0,0 +1,84 @@
+"""Per-worker connection pool (db_config.ConnectionPool)"""
+import threading
+import time
+
+import pytest
+
+from db_config import ConnectionPool, PoolTimeoutError
+
+
+class Connection:
+    def __init__(self):
+        self.alive = True
+        self.unread_result = False
+        self.rollbacks = 0
+        self.closed = False
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise OSError('MySQL server has gone away')
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def opened():
+    return []
+
+
+@pytest.fixture
+def pool(opened):
+    def connect():
+        opened.append(Connection())
+        return opened[-1]
+    return ConnectionPool(size=2, timeout=0.2, connect=connect)
+
+
+def test_released_connections_are_reused_and_rolled_back(pool, opened):
+    conn = pool.acquire()
+    conn.close()
+    conn.close()
+    assert pool.acquire()._connection is opened[0]
+    assert opened[0].rollbacks == 1
+    assert pool.stats()['connections_opened'] == 1
+
+
+def test_exhausted_pool_times_out(pool):
+    pool.acquire()
+    pool.acquire()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert time.monotonic() - started >= 0.2
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_waiter_gets_the_next_released_connection(pool):
+    first = pool.acquire()
+    pool.acquire()
+    threading.Timer(0.05, first.close).start()
+    assert pool.acquire() is not None
+    assert pool.stats()['waits'] == 1
+
+
+def test_dead_idle_connection_is_replaced_on_checkout(pool, opened):
+    pool.acquire().close()
+    opened[0].alive = False
+    conn = pool.acquire()
+    assert conn._connection is opened[1]
+    assert opened[0].closed
+    assert pool.stats()['connections_discarded'] == 1
+
+
+def test_failed_connect_frees_its_slot(opened):
+    def connect():
+        raise OSError('connection refused')
+    pool = ConnectionPool(size=1, timeout=0.1, connect=connect)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            pool.acquire()
+    assert pool.stats()['in_use'] == 0
@@ -0,0 +1,53 @@
+"""Read-replica routing with read-your-writes (db.get_read_db)"""
+import pytest
+
+import cache
+import db
+import replicas
+from conftest import FakeConnection
+
+
+def with_version(version):
+    connection = FakeConnection()
+    connection.on(r"SELECT data_version FROM user_stats", columns=('data_version',), rows=[(version,)])
+    return connection
+
+
+@pytest.fixture
+def route(app, monkeypatch):
+    """route(primary version, replica version) -> which connection get_read_db(1) picked"""
+    monkeypatch.setattr(replicas, 'enabled', lambda: True)
+
+    def pick(primary_version, replica_version, session=None):
+        primary, replica = with_version(primary_version), with_version(replica_version)
+        monkeypatch.setattr(db, 'get_db', lambda shard=None: primary)
+        monkeypatch.setattr(replicas, 'get_read_connection', lambda: replica)
+        with app.test_request_context():
+            from flask import session as flask_session
+            flask_session.update(session or {})
+            conn = db.get_read_db(1)
+            conn.cursor().execute("SELECT 1")
+        if replica.executed and replica.executed[-1][0] == "SELECT 1":
+            return 'replica'
+        return 'primary'
+    return pick
+
+
+def test_caught_up_replica_serves_the_read(route):
+    assert route(5, 5) == 'replica'
+
+
+def test_replica_behind_the_primary_is_skipped(route):
+    assert route(5, 4) == 'primary'
+
+
+def test_stale_cached_version_does_not_send_reads_to_a_lagging_replica(route, monkeypatch):
+    # A shared cache still holding the version from before the latest write
+    monkeypatch.setattr(cache, 'is_coherent', lambda: True)
+    cache.get_cache().set(cache.version_key(1), 4)
+    assert route(5, 4) == 'primary'
+
+
+def test_recent_writer_is_pinned_to_the_primary(route):
+    import time
+    assert route(5, 5, session={db.WRITE_MARKER: time.time()}) == 'primary'
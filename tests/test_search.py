@@ -0,0 +1,45 @@
+"""Per-user vehicle search (search.py)"""
+import search
+
+VEHICLE_COLUMNS = ('id', 'user_id', 'brand', 'model', 'year', 'plate_number')
+
+
+def test_words_are_tagged_with_the_user():
+    assert search.build_boolean_query('Toyota cor', 42) == '+u0000000042xtoyota* +u0000000042xcor*'
+
+
+def test_tags_are_fixed_width():
+    # User 4 searching "2toyota" must not reach user 42's "toyota"
+    assert search.build_boolean_query('2toyota', 4) != search.build_boolean_query('toyota', 42)
+    assert search.user_token(4) == 'u0000000004x'
+
+
+def test_short_words_and_separators():
+    assert search.build_boolean_query('GR', 7) == '+u0000000007xgr*'
+    assert search.build_boolean_query('ABC-123 my_car', 7) == \
+        '+u0000000007xabc* +u0000000007x123* +u0000000007xmy* +u0000000007xcar*'
+    assert search.build_boolean_query(' - ', 7) == ''
+
+
+def test_escape_like():
+    assert search.escape_like('50%_off\\') == '50\\%\\_off\\\\'
+
+
+def test_search_uses_the_user_scoped_index(fake_db):
+    fake_db.on(r"plate_number LIKE", columns=VEHICLE_COLUMNS, rows=[(3, 42, 'Toyota', 'Vios', 2020, 'TOY 1')])
+    fake_db.on(r"MATCH\(search_tokens\)", columns=VEHICLE_COLUMNS + ('relevance',), rows=[
+        (3, 42, 'Toyota', 'Vios', 2020, 'TOY 1', 2.0),
+        (4, 42, 'Toyota', 'Corolla', 2018, 'ABC 1', 1.0),
+    ])
+    results = search.search_vehicles(fake_db, 42, 'toy')
+    assert [row['id'] for row in results] == [3, 4]
+    assert 'relevance' not in results[1]
+    sql, params = fake_db.statements(r"MATCH\(search_tokens\)")[0]
+    assert params == ('+u0000000042xtoy*', '+u0000000042xtoy*', 42, search.SEARCH_LIMIT)
+
+
+def test_full_page_of_plate_matches_skips_the_full_text_query(fake_db):
+    fake_db.on(r"plate_number LIKE", columns=VEHICLE_COLUMNS,
+               rows=[(i, 42, 'Toyota', 'Vios', 2020, f'TOY {i}') for i in range(2)])
+    assert len(search.search_vehicles(fake_db, 42, 'toy', limit=2)) == 2
+    assert fake_db.statements(r"MATCH") == []
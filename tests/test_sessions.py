@@ -0,0 +1,119 @@
+"""Server-side sessions: cookie generation and the per-worker lookup cache (sessions.py)"""
+import time
+
+import pytest
+from flask import Flask, session
+
+import sessions
+
+
+@pytest.fixture
+def session_client():
+    app = Flask(__name__)
+    app.secret_key = 'test-secret'
+    app.session_interface = sessions.ServerSessionInterface(sessions.MemorySessionStore())
+    app.store = app.session_interface.store
+
+    @app.route('/set/<value>')
+    def set_value(value):
+        session['user_id'] = 1
+        session['value'] = value
+        return 'ok'
+
+    @app.route('/flash/<value>')
+    def flash_value(value):
+        session['value'] = value
+        return 'ok'
+
+    @app.route('/logout')
+    def logout():
+        session.pop('user_id', None)
+        return 'ok'
+
+    @app.route('/get')
+    def get_value():
+        return session.get('value', '')
+
+    client = app.test_client()
+    client.store = app.store
+    return client
+
+
+def cookie(client):
+    return client.get_cookie('session').value
+
+
+def test_generation_is_bumped_on_every_write(session_client):
+    session_client.get('/set/a')
+    sid, generation = cookie(session_client).split('.')
+    assert generation == '1'
+
+    session_client.get('/set/b')
+    assert cookie(session_client) == f'{sid}.2'
+    assert session_client.get('/get').get_data(as_text=True) == 'b'
+
+
+def test_reads_do_not_rewrite_the_cookie(session_client):
+    session_client.get('/set/a')
+    response = session_client.get('/get')
+    assert response.get_data(as_text=True) == 'a'
+    assert 'Set-Cookie' not in response.headers
+
+
+def test_unknown_cookie_starts_a_new_session(session_client):
+    session_client.set_cookie('session', 'A' * 43 + '.1')
+    assert session_client.get('/get').get_data(as_text=True) == ''
+
+
+def test_anonymous_sessions_stay_in_the_signed_cookie(session_client):
+    session_client.get('/flash/hello')
+    assert session_client.store.stats()['entries'] == 0
+    assert not sessions.COOKIE_RE.match(cookie(session_client))
+    assert session_client.get('/get').get_data(as_text=True) == 'hello'
+
+
+def test_tampered_anonymous_cookie_is_ignored(session_client):
+    session_client.get('/flash/hello')
+    session_client.set_cookie('session', cookie(session_client) + 'x')
+    assert session_client.get('/get').get_data(as_text=True) == ''
+
+
+def test_login_moves_an_anonymous_session_server_side(session_client):
+    session_client.get('/flash/hello')
+    session_client.get('/set/a')
+    assert sessions.COOKIE_RE.match(cookie(session_client))
+    assert session_client.store.stats()['entries'] == 1
+
+
+def test_logging_out_drops_the_server_side_copy(session_client):
+    session_client.get('/set/a')
+    session_client.get('/logout')
+    assert session_client.store.stats()['entries'] == 0
+    assert session_client.get('/get').get_data(as_text=True) == 'a'
+
+
+def test_store_failures_are_logged_not_raised(session_client, monkeypatch, caplog):
+    def fail(*args):
+        raise RuntimeError('database is down')
+    monkeypatch.setattr(session_client.store, 'save', fail)
+    response = session_client.get('/set/a')
+    assert response.status_code == 200
+    assert 'Set-Cookie' not in response.headers
+    assert 'Session save failed: database is down' in caplog.text
+
+
+def test_cached_lookup_is_used_only_for_the_current_generation(fake_db):
+    store = sessions.DatabaseSessionStore()
+    expires = time.time() + 3600
+    store._cache.set('sid', sessions.SessionRecord('{"value": "cached"}', 1, 2, expires))
+    fake_db.on(r"FROM sessions WHERE id", columns=('data', 'user_id', 'generation', 'expires_at'),
+               rows=[('{"value": "fresh"}', 1, 3, sessions._to_datetime(expires))])
+
+    assert store.load('sid', 2).data == '{"value": "cached"}'
+    assert fake_db.statements(r"FROM sessions") == []
+
+    # Another worker wrote generation 3: the cached copy is stale
+    assert store.load('sid', 3).data == '{"value": "fresh"}'
+    assert len(fake_db.statements(r"FROM sessions")) == 1
+    assert store.load('sid', 3).generation == 3
+    assert len(fake_db.statements(r"FROM sessions")) == 1
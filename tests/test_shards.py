@@ -0,0 +1,269 @@
+"""User sharding: ring placement, the directory and online moves (shards.py)"""
+import re
+from collections import Counter
+
+import pytest
+
+import cache
+import shards
+
+TABLES = ('users', 'user_shards', 'vehicles', 'maintenance_logs', 'maintenance_monthly', 'user_stats',
+          'vehicle_readings', 'vehicle_readings_1m', 'vehicle_readings_1h', 'vehicle_readings_1d')
+
+
+class MemoryShard:
+    """Just enough of one shard's tables for the statements shards.py runs"""
+
+    def __init__(self, name):
+        self.name = name
+        self.tables = {table: [] for table in TABLES}
+        self.executed = []
+
+    def rows(self, table, **match):
+        return [row for row in self.tables[table] if all(row.get(k) == v for k, v in match.items())]
+
+    def user_rows(self, user_id):
+        vehicle_ids = {row['id'] for row in self.rows('vehicles', user_id=user_id)}
+        return {table: len([row for row in rows if row.get('user_id') == user_id or row.get('vehicle_id') in vehicle_ids])
+                for table, rows in self.tables.items() if table not in ('users', 'user_shards')}
+
+    def run(self, sql, params):
+        sql = ' '.join(sql.split())
+        self.executed.append(sql)
+        t = self.tables
+        if 'GET_LOCK' in sql or 'RELEASE_LOCK' in sql:
+            return ('lock',), [(1,)]
+        if sql.startswith('SELECT shard, state FROM user_shards'):
+            return ('shard', 'state'), [(r['shard'], r['state']) for r in self.rows('user_shards', user_id=params[0])]
+        if sql.startswith('INSERT INTO user_shards'):
+            state = params[2] if len(params) > 2 else 'active'
+            existing = self.rows('user_shards', user_id=params[0])
+            if existing:
+                existing[0].update(shard=params[1], state=state)
+            else:
+                t['user_shards'].append({'user_id': params[0], 'shard': params[1], 'state': state})
+            return (), []
+        if sql.startswith('INSERT INTO user_stats'):  # stats.rebuild_user_stats
+            if not self.rows('user_stats', user_id=params[0]):
+                t['user_stats'].append({'user_id': params[0], 'data_version': 1})
+            return (), []
+        if sql.startswith('SELECT data_version FROM user_stats'):
+            return ('data_version',), [(r['data_version'],) for r in self.rows('user_stats', user_id=params[0])]
+        if sql.startswith('SELECT id FROM vehicles'):
+            return ('id',), [(r['id'],) for r in self.rows('vehicles', user_id=params[0])]
+        if sql.startswith('SELECT COUNT(*), MAX(ts) FROM vehicle_readings'):
+            readings = [r for r in t['vehicle_readings'] if r['vehicle_id'] in params]
+            return ('count', 'max'), [(len(readings), max((r['ts'] for r in readings), default=None))]
+        if sql.startswith('INSERT IGNORE INTO users'):
+            if not self.rows('users', id=params[0]):
+                t['users'].append({'id': params[0], 'email': params[1]})
+            return (), []
+        match = re.match(r'(SELECT \*|DELETE) FROM (\w+) WHERE (\w+) (=|IN)', sql)
+        if match:
+            table, key = match.group(2), match.group(3)
+            selected = [row for row in t[table] if row.get(key) in params]
+            if match.group(1) == 'DELETE':
+                t[table][:] = [row for row in t[table] if row not in selected]
+                return (), []
+            columns = tuple(selected[0]) if selected else ('id',)
+            return columns, [tuple(row[c] for c in columns) for row in selected]
+        match = re.match(r'INSERT INTO (\w+) \(([^)]*)\)', sql)
+        if match:
+            table, columns = match.group(1), [c.strip() for c in match.group(2).split(',')]
+            row = dict(zip(columns, params))
+            if 'search_tokens' in row:
+                raise RuntimeError("The value specified for generated column 'search_tokens' is not allowed")
+            if table == 'vehicles' and self.rows('vehicles', id=row['id']):
+                raise RuntimeError(f"Duplicate entry '{row['id']}' for key 'PRIMARY'")
+            t[table].append(row)
+            return (), []
+        raise AssertionError(f"Unexpected statement on {self.name}: {sql}")
+
+
+class MemoryCursor:
+    def __init__(self, shard):
+        self.shard = shard
+        self.column_names = ()
+        self._rows = []
+
+    def execute(self, sql, params=()):
+        self.column_names, self._rows = self.shard.run(sql, tuple(params or ()))
+
+    def executemany(self, sql, rows):
+        for row in rows:
+            self.execute(sql, row)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class MemoryConnection:
+    def __init__(self, shard):
+        self.shard = shard
+
+    def cursor(self, **kwargs):
+        return MemoryCursor(self.shard)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def cluster(monkeypatch):
+    """Three in-memory shards: main, s1 and s2"""
+    nodes = {name: MemoryShard(name) for name in ('main', 's1', 's2')}
+    monkeypatch.setattr(shards, 'DB_SHARDS', 's1=10.0.0.21,s2=10.0.0.22')
+    monkeypatch.setattr(shards, '_shards', None)
+    monkeypatch.setattr(shards, '_directory', cache.LocalCache(default_ttl=60))
+    monkeypatch.setattr(cache, '_cache', None)
+    monkeypatch.setattr(shards.Shard, 'connection', lambda self: MemoryConnection(nodes[self.name]))
+    monkeypatch.setattr(shards.time, 'sleep', lambda seconds: None)
+    return nodes
+
+
+def main_connection(cluster):
+    return MemoryConnection(cluster['main'])
+
+
+def seed_user(node, user_id, vehicle_ids, readings=3):
+    node.tables['user_stats'].append({'user_id': user_id, 'data_version': 7})
+    for vehicle_id in vehicle_ids:
+        node.tables['vehicles'].append({'id': vehicle_id, 'user_id': user_id, 'plate_number': f'P{vehicle_id}',
+                                        'search_tokens': f'u{user_id:010d}xp{vehicle_id}'})
+        node.tables['maintenance_logs'].append({'id': vehicle_id * 10, 'vehicle_id': vehicle_id, 'user_id': user_id})
+        for i in range(readings):
+            node.tables['vehicle_readings'].append({'vehicle_id': vehicle_id, 'ts': f'2026-10-01 00:00:0{i}'})
+
+
+# Ring
+def test_parse_shards_rejects_bad_entries():
+    assert shards.parse_shards('s1=10.0.0.21, s2=mysql://app:x@10.0.0.22:3310/vt') == [
+        ('s1', {'host': '10.0.0.21', 'port': 3306}),
+        ('s2', {'host': '10.0.0.22', 'port': 3310, 'user': 'app', 'password': 'x', 'database': 'vt'}),
+    ]
+    for value in ('main=10.0.0.21', 's1=a,s1=b', '10.0.0.21', 'S1=10.0.0.21'):
+        with pytest.raises(ValueError):
+            shards.parse_shards(value)
+
+
+def test_ring_placement_is_stable_and_balanced():
+    ring = shards.HashRing(['main', 's1', 's2'], vnodes=128)
+    placements = [ring.shard_for(user_id) for user_id in range(1, 30001)]
+    again = shards.HashRing(['s2', 'main', 's1'], vnodes=128)
+    assert placements == [again.shard_for(user_id) for user_id in range(1, 30001)]
+    for name, count in Counter(placements).items():
+        assert 0.25 < count / len(placements) < 0.42, name
+
+
+def test_adding_a_shard_only_moves_users_onto_it():
+    before = shards.HashRing(['main', 's1', 's2'], vnodes=128)
+    after = shards.HashRing(['main', 's1', 's2', 's3'], vnodes=128)
+    moved = [user_id for user_id in range(1, 30001) if before.shard_for(user_id) != after.shard_for(user_id)]
+    assert all(after.shard_for(user_id) == 's3' for user_id in moved)
+    assert 0.15 < len(moved) / 30000 < 0.35
+
+
+# Directory
+def test_users_without_a_directory_row_are_on_main(cluster):
+    assert shards.placement(main_connection(cluster), 42) == shards.MAIN_PLACEMENT
+
+
+def test_new_user_is_placed_on_the_ring_shard(cluster):
+    placed = {}
+    for user_id in range(1, 20):
+        placed[user_id] = shards.place_new_user(main_connection(cluster), user_id)
+        assert placed[user_id] == shards.get_ring().shard_for(user_id)
+        assert shards.placement(main_connection(cluster), user_id) == shards.Placement(placed[user_id], False)
+    remote = [user_id for user_id, shard in placed.items() if shard != 'main']
+    assert remote
+    for user_id in remote:
+        # Placeholder account row for the foreign keys on the user's shard
+        assert cluster[placed[user_id]].rows('users', id=user_id)
+
+
+# Moves
+def test_move_copies_switches_and_cleans_up(cluster):
+    seed_user(cluster['main'], 1, [10, 11])
+    logged = []
+    assert shards.move_users([(1, 's1')], grace=0, log=logged.append) == [1]
+    assert cluster['s1'].user_rows(1) == {'vehicles': 2, 'maintenance_logs': 2, 'maintenance_monthly': 0,
+                                          'user_stats': 1, 'vehicle_readings': 6, 'vehicle_readings_1m': 0,
+                                          'vehicle_readings_1h': 0, 'vehicle_readings_1d': 0}
+    assert sum(cluster['main'].user_rows(1).values()) == 0
+    # Generated columns are left to the target
+    assert 'search_tokens' not in cluster['s1'].rows('vehicles', id=10)[0]
+    assert cluster['s1'].rows('users', id=1)
+    assert cluster['main'].rows('user_shards', user_id=1) == [{'user_id': 1, 'shard': 's1', 'state': 'active'}]
+    assert shards.placement(main_connection(cluster), 1) == shards.Placement('s1', False)
+
+
+def test_duplicate_ids_on_the_target_roll_the_move_back(cluster):
+    seed_user(cluster['main'], 1, [10])
+    seed_user(cluster['s1'], 2, [10])
+    logged = []
+    assert shards.move_users([(1, 's1')], grace=0, log=logged.append) == []
+    assert 'Duplicate entry' in logged[-1]
+    assert cluster['main'].user_rows(1)['vehicles'] == 1
+    assert cluster['s1'].rows('vehicles', user_id=1) == []
+    assert cluster['main'].rows('user_shards', user_id=1)[0]['state'] == 'active'
+    assert cluster['main'].rows('user_shards', user_id=1)[0]['shard'] == 'main'
+
+
+def test_late_telemetry_on_the_source_is_not_deleted(cluster, monkeypatch):
+    seed_user(cluster['main'], 1, [10])
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            # A worker's buffer flushes a kept batch to the old shard after the copy
+            cluster['main'].tables['vehicle_readings'].append({'vehicle_id': 10, 'ts': '2026-10-02 00:00:00'})
+    monkeypatch.setattr(shards.time, 'sleep', sleep)
+    logged = []
+    assert shards.move_users([(1, 's1')], grace=0, log=logged.append) == [1]
+    assert 'telemetry' in logged[-1]
+    assert cluster['main'].user_rows(1)['vehicle_readings'] == 4
+    assert cluster['s1'].user_rows(1)['vehicle_readings'] == 3
+
+
+def test_edits_on_the_source_during_the_move_are_kept(cluster, monkeypatch):
+    seed_user(cluster['main'], 1, [10])
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            cluster['main'].rows('user_stats', user_id=1)[0]['data_version'] += 1
+    monkeypatch.setattr(shards.time, 'sleep', sleep)
+    logged = []
+    shards.move_users([(1, 's1')], grace=0, log=logged.append)
+    assert 'changed' in logged[-1]
+    assert cluster['main'].user_rows(1)['vehicles'] == 1
+
+
+def test_user_without_stats_row_is_locked_before_the_copy(cluster):
+    cluster['main'].tables['vehicles'].append({'id': 10, 'user_id': 1, 'plate_number': 'P10'})
+    assert shards.move_users([(1, 's2')], grace=0, log=lambda message: None) == [1]
+    executed = cluster['main'].executed
+    created = next(i for i, sql in enumerate(executed) if sql.startswith('INSERT INTO user_stats'))
+    assert any(sql.endswith('FOR UPDATE') for sql in executed[created:])
+    first_copy = next(i for i, sql in enumerate(executed) if sql.startswith('SELECT * FROM'))
+    assert created < first_copy
+    assert cluster['s2'].rows('vehicles', user_id=1)
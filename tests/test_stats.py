@@ -0,0 +1,85 @@
+"""Landing page totals cache (stats.get_cached_global_stats)"""
+import threading
+import time
+
+import pytest
+
+import stats
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(stats, '_global_cache', {'value': None, 'computed_at': 0.0, 'refreshing': False})
+
+
+def totals(n):
+    return {'total_vehicles': n, 'total_maintenance': 0, 'total_cost': 0}
+
+
+def test_cold_cache_loads_once_for_concurrent_requests():
+    calls = []
+    release = threading.Event()
+
+    def load():
+        calls.append(1)
+        release.wait(2)
+        return totals(1)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(stats.get_cached_global_stats(load, ttl=60, max_stale=0)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert len(calls) == 1
+    assert results == [totals(1)] * 4
+
+
+def test_fresh_hits_do_not_wait_for_a_running_load():
+    stats.get_cached_global_stats(lambda: totals(1), ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_load():
+        started.set()
+        release.wait(2)
+        return totals(2)
+    # ttl=0, max_stale=0: this caller finds the value too stale and loads synchronously
+    loader = threading.Thread(target=stats.get_cached_global_stats, args=(slow_load, 0, 0))
+    loader.start()
+    assert started.wait(2)
+    try:
+        began = time.monotonic()
+        assert stats.get_cached_global_stats(lambda: totals(3), ttl=60) == totals(1)
+        assert time.monotonic() - began < 0.5
+    finally:
+        release.set()
+        loader.join(2)
+    assert stats.get_cached_global_stats(lambda: totals(4), ttl=60) == totals(2)
+
+
+def test_stale_value_is_served_while_one_thread_refreshes():
+    stats.get_cached_global_stats(lambda: totals(1), ttl=60)
+    stats._global_cache['computed_at'] -= 120
+    refreshed = threading.Event()
+
+    def load():
+        refreshed.set()
+        return totals(2)
+    assert stats.get_cached_global_stats(load, ttl=60, max_stale=600) == totals(1)
+    assert refreshed.wait(2)
+    for _ in range(100):
+        if not stats._global_cache['refreshing']:
+            break
+        time.sleep(0.01)
+    assert stats.get_cached_global_stats(load, ttl=60, max_stale=600) == totals(2)
+
+
+def test_merge_global_stats_adds_up_shards():
+    merged = stats.merge_global_stats([
+        {'total_vehicles': 2, 'total_maintenance': 5, 'total_cost': 100},
+        {'total_vehicles': 1, 'total_maintenance': None, 'total_cost': 50},
+    ])
+    assert merged == {'total_vehicles': 3, 'total_maintenance': 5, 'total_cost': 150}
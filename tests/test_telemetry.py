@@ -0,0 +1,97 @@
+"""Telemetry write-behind buffer (telemetry.ReadingBuffer, POST /api/v1/telemetry)"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import telemetry
+from conftest import FakeConnection
+
+START = datetime(2026, 1, 1)
+
+
+def readings(vehicle_id, count, first=0):
+    return [(vehicle_id, START + timedelta(seconds=n), 1000 + n, None, None, None)
+            for n in range(first, first + count)]
+
+
+@pytest.fixture
+def make_buffer(monkeypatch):
+    """A ReadingBuffer without its flush thread, writing to one FakeConnection"""
+    conn = FakeConnection()
+
+    def make(**kwargs):
+        buffer = telemetry.ReadingBuffer(connect=lambda: conn, **kwargs)
+        monkeypatch.setattr(buffer, '_ensure_thread', lambda: None)
+        buffer.conn = conn
+        return buffer
+    return make
+
+
+def test_full_buffer_rejects_the_whole_batch(make_buffer):
+    buffer = make_buffer(max_rows=5)
+    buffer.add(readings(1, 4))
+    with pytest.raises(telemetry.TelemetryBusy):
+        buffer.add(readings(1, 2, first=4))
+    assert len(buffer) == 4
+    assert buffer.stats()['rejected'] == 2
+
+
+def test_flush_thread_is_woken_once_flush_rows_are_waiting(make_buffer):
+    buffer = make_buffer(flush_rows=3)
+    buffer.add(readings(1, 2))
+    assert not buffer._wakeup.is_set()
+    buffer.add(readings(1, 1, first=2))
+    assert buffer._wakeup.is_set()
+
+
+def test_flush_writes_sorted_chunks_with_one_commit_each(make_buffer):
+    buffer = make_buffer(insert_rows=2)
+    buffer.add(readings(2, 2) + readings(1, 3))
+
+    assert buffer.flush() == 5
+
+    inserts = buffer.conn.statements(r"INSERT IGNORE INTO vehicle_readings")
+    assert [len(params) // 6 for _, params in inserts] == [2, 2, 1]
+    assert [params[0] for _, params in inserts] == [1, 1, 2]
+    assert buffer.conn.commits == 3
+    assert len(buffer) == 0
+    assert buffer.stats()['written'] == 5
+
+
+def test_failed_flush_keeps_the_unwritten_readings(make_buffer):
+    buffer = make_buffer(insert_rows=2)
+    inserts = []
+
+    def fail_second(sql, params):
+        inserts.append(params)
+        if len(inserts) == 2:
+            raise RuntimeError('server has gone away')
+        return (), []
+    buffer.conn.on(r"INSERT IGNORE INTO vehicle_readings", fail_second)
+    buffer.add(readings(1, 5))
+
+    assert buffer.flush() == 2
+    assert len(buffer) == 3
+    assert buffer.stats()['flush_errors'] == 1
+    # The rest goes out first on the next flush
+    assert buffer.flush() == 3
+    assert inserts[2][1] == START + timedelta(seconds=2)
+    assert buffer.stats()['written'] == 5
+
+
+def test_endpoint_answers_503_when_the_buffer_is_full(client, login, fake_db, make_buffer, monkeypatch):
+    monkeypatch.setattr(telemetry, 'TELEMETRY_WRITE_BEHIND', True)
+    monkeypatch.setattr(telemetry, '_buffers', {telemetry.shards.MAIN: make_buffer(max_rows=1)})
+    fake_db.on(r"SELECT id FROM vehicles", columns=('id',), rows=[(7,)])
+    login(1)
+    batch = {'readings': [{'vehicle_id': 7, 'ts': '2026-01-01T00:00:00Z', 'odometer_km': 10},
+                          {'vehicle_id': 7, 'ts': '2026-01-01T00:00:01Z', 'odometer_km': 11}]}
+
+    response = client.post('/api/v1/telemetry', json=batch)
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+    response = client.post('/api/v1/telemetry', json={'readings': batch['readings'][:1]})
+    assert response.status_code == 202
+    assert response.get_json() == {'accepted': 1}
@@ -0,0 +1,34 @@
+"""Tier selection for telemetry range queries (timeseries.plan)"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import timeseries
+
+START = datetime(2024, 5, 17, 13, 27, 41)
+
+
+@pytest.mark.parametrize('span, tier', [
+    (timedelta(hours=1), None),
+    (timedelta(days=1), '1m'),
+    (timedelta(days=30), '1h'),
+    (timedelta(days=730), '1d'),
+])
+def test_coarsest_tier_finer_than_a_point(span, tier):
+    chosen, _, _, _ = timeseries.plan(START, START + span, 500)
+    assert (chosen[0] if chosen else None) == tier
+
+
+@pytest.mark.parametrize('span', [timedelta(minutes=5), timedelta(hours=7), timedelta(days=3),
+                                  timedelta(days=45), timedelta(days=3000)])
+@pytest.mark.parametrize('max_points', [1, 7, 500, 2000])
+def test_buckets_cover_the_range_within_the_budget(span, max_points):
+    end = START + span
+    tier, start, stop, step = timeseries.plan(START, end, max_points)
+    assert start <= START and stop >= end
+    assert (stop - start) / step <= max_points
+    assert start == timeseries.floor_time(START, step)
+    if tier is not None:
+        assert step.total_seconds() % tier[1] == 0
+        # Every output bucket is made of whole tier buckets
+        assert start == timeseries.floor_time(start, timedelta(seconds=tier[1]))
@@ -0,0 +1,402 @@
+"""
+Downsampled telemetry (migration 0010) and time-range queries over it.
+
+Tiers vehicle_readings_1m / _1h / _1d hold one row per vehicle and bucket
+with min, max, sum + count (for the average) and the last value of
+odometer_km and speed_kmh, plus the last position.
+
+- record_readings() updates all three tiers from a chunk of readings that
+  was just inserted into vehicle_readings, in the same transaction
+  (telemetry.write_readings calls it). Normally the chunk's partial
+  aggregates are merged in with one multi-row upsert per tier; if the INSERT
+  skipped duplicates, the touched buckets are recomputed from the readings
+  instead, so a resent reading is never counted twice
+- query() answers a time range with at most `points` evenly spaced points.
+  It reads the coarsest tier whose buckets are no wider than range / points
+  (raw readings for short ranges) and merges those rows into the output
+  buckets: a year at 52 points reads ~365 daily rows, not millions of readings
+- Results are cached (cache.py) for TIMESERIES_CACHE_TTL seconds; the range
+  is aligned to the step so "the last 30 days" stays the same key
+
+    python timeseries.py rebuild [vehicle_id]   # recompute the tiers from vehicle_readings
+"""
+import logging
+import math
+import os
+import sys
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import shards
+import cache
+
+logger = logging.getLogger(__name__)
+
+TIMESERIES_DEFAULT_POINTS = int(os.getenv('TIMESERIES_DEFAULT_POINTS', 500))
+TIMESERIES_MAX_POINTS = int(os.getenv('TIMESERIES_MAX_POINTS', 2000))
+TIMESERIES_CACHE_TTL = float(os.getenv('TIMESERIES_CACHE_TTL', 30))
+UPSERT_ROWS = 1000
+
+# (name, bucket width in seconds, table), finest first
+TIERS = (
+    ('1m', 60, 'vehicle_readings_1m'),
+    ('1h', 3600, 'vehicle_readings_1h'),
+    ('1d', 86400, 'vehicle_readings_1d'),
+)
+
+# A "partial" is a list in this column order; each measurement is a block of
+# min, max, sum, count, last, ts starting at its offset
+COLUMNS = ('bucket', 'samples',
+           'odometer_min', 'odometer_max', 'odometer_sum', 'odometer_count', 'odometer_last', 'odometer_ts',
+           'speed_min', 'speed_max', 'speed_sum', 'speed_count', 'speed_last', 'speed_ts',
+           'latitude', 'longitude', 'position_ts')
+MEASURES = (('odometer', 2), ('speed', 8))
+POSITION = 14
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def floor_time(ts, step):
+    """Start of the step-wide bucket (aligned to the Unix epoch, UTC) that contains ts"""
+    return EPOCH + (ts - EPOCH) // step * step
+
+
+# Partial aggregates
+def _reading_partial(bucket, ts, odometer_km, latitude, longitude, speed_kmh):
+    partial = [bucket, 1, None, None, 0, 0, None, None, None, None, 0, 0, None, None, None, None, None]
+    if odometer_km is not None:
+        partial[2:8] = [odometer_km, odometer_km, odometer_km, 1, odometer_km, ts]
+    if speed_kmh is not None:
+        partial[8:14] = [speed_kmh, speed_kmh, speed_kmh, 1, speed_kmh, ts]
+    if latitude is not None:
+        partial[14:17] = [latitude, longitude, ts]
+    return partial
+
+
+def _merge(target, partial):
+    """Fold partial into target (same bucket or a wider one)"""
+    target[1] += partial[1]
+    for _, offset in MEASURES:
+        lowest, highest, total, count, last, ts = partial[offset:offset + 6]
+        if ts is None:
+            continue
+        if target[offset + 5] is None:
+            target[offset:offset + 6] = [lowest, highest, total, count, last, ts]
+            continue
+        target[offset] = min(target[offset], lowest)
+        target[offset + 1] = max(target[offset + 1], highest)
+        target[offset + 2] += total
+        target[offset + 3] += count
+        if ts >= target[offset + 5]:
+            target[offset + 4] = last
+            target[offset + 5] = ts
+    if partial[16] is not None and (target[16] is None or partial[16] >= target[16]):
+        target[14:17] = partial[14:17]
+
+
+def _group_readings(rows, step):
+    """{(vehicle_id, bucket): partial} for reading tuples"""
+    groups = {}
+    for vehicle_id, ts, odometer_km, latitude, longitude, speed_kmh in rows:
+        bucket = floor_time(ts, step)
+        partial = _reading_partial(bucket, ts, odometer_km, latitude, longitude, speed_kmh)
+        target = groups.get((vehicle_id, bucket))
+        if target is None:
+            groups[(vehicle_id, bucket)] = partial
+        else:
+            _merge(target, partial)
+    return groups
+
+
+def _group_partials(groups, step):
+    """Roll {(vehicle_id, bucket): partial} up into wider buckets"""
+    wider = {}
+    for (vehicle_id, _), partial in groups.items():
+        bucket = floor_time(partial[0], step)
+        target = wider.get((vehicle_id, bucket))
+        if target is None:
+            wider[(vehicle_id, bucket)] = [bucket] + partial[1:]
+        else:
+            _merge(target, partial)
+    return wider
+
+
+# Maintaining the tiers
+def _merge_assignments():
+    assignments = ['samples = samples + VALUES(samples)']
+    for name, _ in MEASURES:
+        assignments.extend([
+            f"{name}_min = LEAST(COALESCE({name}_min, VALUES({name}_min)), COALESCE(VALUES({name}_min), {name}_min))",
+            f"{name}_max = GREATEST(COALESCE({name}_max, VALUES({name}_max)), COALESCE(VALUES({name}_max), {name}_max))",
+            f"{name}_sum = {name}_sum + VALUES({name}_sum)",
+            f"{name}_count = {name}_count + VALUES({name}_count)",
+            # Assignments run left to right: decide _last before _ts moves on
+            f"{name}_last = IF({name}_ts IS NULL OR VALUES({name}_ts) >= {name}_ts, "
+            f"COALESCE(VALUES({name}_last), {name}_last), {name}_last)",
+            f"{name}_ts = GREATEST(COALESCE({name}_ts, VALUES({name}_ts)), COALESCE(VALUES({name}_ts), {name}_ts))",
+        ])
+    newer = "position_ts IS NULL OR VALUES(position_ts) >= position_ts"
+    assignments.extend([
+        f"latitude = IF({newer}, COALESCE(VALUES(latitude), latitude), latitude)",
+        f"longitude = IF({newer}, COALESCE(VALUES(longitude), longitude), longitude)",
+        "position_ts = GREATEST(COALESCE(position_ts, VALUES(position_ts)), COALESCE(VALUES(position_ts), position_ts))",
+    ])
+    return ', '.join(assignments)
+
+
+_MERGE_ASSIGNMENTS = _merge_assignments()
+
+
+@lru_cache(maxsize=16)
+def _upsert_statement(table, count):
+    placeholders = '(' + ', '.join(['%s'] * (len(COLUMNS) + 1)) + ')'
+    return (f"INSERT INTO {table} (vehicle_id, {', '.join(COLUMNS)}) VALUES "
+            + ', '.join([placeholders] * count)
+            + f" ON DUPLICATE KEY UPDATE {_MERGE_ASSIGNMENTS}")
+
+
+def record_readings(conn, rows, exact=True):
+    """
+    Fold reading tuples that were just inserted into vehicle_readings into
+    every tier (same connection, before commit).
+
+    Args:
+        exact: False if the INSERT skipped some rows as duplicates; the touched
+            buckets are then recomputed from vehicle_readings instead
+    """
+    if not rows:
+        return
+    if not exact:
+        spans = {}
+        for row in rows:
+            first, last = spans.get(row[0], (row[1], row[1]))
+            spans[row[0]] = (min(first, row[1]), max(last, row[1]))
+        for vehicle_id, (first, last) in sorted(spans.items()):
+            rebuild(conn, vehicle_id, first, last)
+        return
+
+    cursor = conn.cursor()
+    try:
+        groups = None
+        for _, seconds, table in TIERS:
+            step = timedelta(seconds=seconds)
+            groups = _group_readings(rows, step) if groups is None else _group_partials(groups, step)
+            items = sorted(groups.items(), key=lambda item: item[0])
+            for start in range(0, len(items), UPSERT_ROWS):
+                chunk = items[start:start + UPSERT_ROWS]
+                params = []
+                for (vehicle_id, _), partial in chunk:
+                    params.append(vehicle_id)
+                    params.extend(partial)
+                cursor.execute(_upsert_statement(table, len(chunk)), params)
+    finally:
+        cursor.close()
+
+
+def _last(column, order):
+    # No LAST() in MySQL: first of the values sorted newest first (GROUP_CONCAT skips NULLs)
+    return f"SUBSTRING_INDEX(GROUP_CONCAT({column} ORDER BY {order} DESC SEPARATOR ','), ',', 1)"
+
+
+def _aggregate_from_readings(bucket_format):
+    measures = []
+    for name, column in (('odometer', 'odometer_km'), ('speed', 'speed_kmh')):
+        measures.append(f"MIN({column}), MAX({column}), COALESCE(SUM({column}), 0), COUNT({column}), "
+                        f"{_last(column, 'ts')}, MAX(IF({column} IS NULL, NULL, ts))")
+    return (f"DATE_FORMAT(ts, '{bucket_format}') AS bucket_start, COUNT(*), " + ', '.join(measures)
+            + f", {_last('latitude', 'ts')}, {_last('longitude', 'ts')}, MAX(IF(latitude IS NULL, NULL, ts))")
+
+
+def _aggregate_from_tier(bucket_format):
+    measures = []
+    for name, _ in MEASURES:
+        measures.append(f"MIN({name}_min), MAX({name}_max), SUM({name}_sum), SUM({name}_count), "
+                        f"{_last(f'{name}_last', f'{name}_ts')}, MAX({name}_ts)")
+    return (f"DATE_FORMAT(bucket, '{bucket_format}') AS bucket_start, SUM(samples), " + ', '.join(measures)
+            + f", {_last('latitude', 'position_ts')}, {_last('longitude', 'position_ts')}, MAX(position_ts)")
+
+
+# %% because these run with parameters
+_REBUILD_SOURCES = {
+    '1m': ('vehicle_readings', 'ts', _aggregate_from_readings('%%Y-%%m-%%d %%H:%%i:00')),
+    '1h': ('vehicle_readings_1m', 'bucket', _aggregate_from_tier('%%Y-%%m-%%d %%H:00:00')),
+    '1d': ('vehicle_readings_1h', 'bucket', _aggregate_from_tier('%%Y-%%m-%%d 00:00:00')),
+}
+
+
+def rebuild(conn, vehicle_id, first, last):
+    """
+    Recompute one vehicle's tier rows for the buckets between the readings
+    at first and last (inclusive): minutes from the readings, hours from the
+    minutes, days from the hours. Runs on conn; the caller commits.
+    """
+    cursor = conn.cursor()
+    try:
+        for name, seconds, table in TIERS:
+            step = timedelta(seconds=seconds)
+            start, end = floor_time(first, step), floor_time(last, step) + step
+            source, time_column, select = _REBUILD_SOURCES[name]
+            cursor.execute(f"DELETE FROM {table} WHERE vehicle_id = %s AND bucket >= %s AND bucket < %s",
+                           (vehicle_id, start, end))
+            cursor.execute(
+                f"INSERT INTO {table} (vehicle_id, {', '.join(COLUMNS)}) "
+                f"SELECT vehicle_id, {select} FROM {source} "
+                f"WHERE vehicle_id = %s AND {time_column} >= %s AND {time_column} < %s "
+                f"GROUP BY vehicle_id, bucket_start",
+                (vehicle_id, start, end)
+            )
+    finally:
+        cursor.close()
+
+
+def rebuild_all(conn, vehicle_id=None):
+    """Recompute the tiers of one or every vehicle from vehicle_readings, a month per transaction"""
+    cursor = conn.cursor()
+    if vehicle_id is None:
+        cursor.execute("SELECT vehicle_id, MIN(ts), MAX(ts) FROM vehicle_readings GROUP BY vehicle_id")
+    else:
+        cursor.execute("SELECT vehicle_id, MIN(ts), MAX(ts) FROM vehicle_readings WHERE vehicle_id = %s "
+                       "GROUP BY vehicle_id", (vehicle_id,))
+    spans = cursor.fetchall()
+    cursor.close()
+    months = 0
+    for vehicle_id, first, last in spans:
+        start = datetime(first.year, first.month, 1)
+        while start <= last:
+            end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+            rebuild(conn, vehicle_id, start, min(end - timedelta(milliseconds=1), last))
+            conn.commit()
+            months += 1
+            start = end
+    return len(spans), months
+
+
+# Queries
+def plan(start, end, max_points):
+    """
+    Tier to read and the aligned (start, end, step) of the output buckets,
+    with (end - start) / step <= max_points.
+
+    Returns:
+        (tier or None for raw readings, start, end, step)
+    """
+    span = (end - start).total_seconds()
+    tier = None
+    for candidate in TIERS:
+        if candidate[1] <= span / max_points:
+            tier = candidate
+    unit = tier[1] if tier else 1
+    units = max(1, math.ceil(span / max_points / unit))
+    while True:
+        step = timedelta(seconds=units * unit)
+        aligned_start = floor_time(start, step)
+        buckets = math.ceil((end - aligned_start) / step)
+        if buckets <= max_points:
+            return tier, aligned_start, aligned_start + buckets * step, step
+        units += 1
+
+
+def _fetch_partials(conn, vehicle_id, tier, start, end):
+    cursor = conn.cursor()
+    if tier is None:
+        cursor.execute("""
+            SELECT ts, odometer_km, latitude, longitude, speed_kmh
+            FROM vehicle_readings
+            WHERE vehicle_id = %s AND ts >= %s AND ts < %s
+            ORDER BY ts
+        """, (vehicle_id, start, end))
+        partials = [_reading_partial(ts, ts, odometer_km, latitude, longitude, speed_kmh)
+                    for ts, odometer_km, latitude, longitude, speed_kmh in cursor.fetchall()]
+    else:
+        cursor.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM {tier[2]} "
+            f"WHERE vehicle_id = %s AND bucket >= %s AND bucket < %s ORDER BY bucket",
+            (vehicle_id, start, end)
+        )
+        partials = [list(row) for row in cursor.fetchall()]
+    cursor.close()
+    return partials
+
+
+def _number(value):
+    return float(value) if value is not None else None
+
+
+def _point(partial, previous_odometer):
+    point = {'t': partial[0].isoformat(), 'samples': int(partial[1])}
+    for name, offset in MEASURES:
+        lowest, highest, total, count, last, ts = partial[offset:offset + 6]
+        point[f'{name}_min'] = _number(lowest)
+        point[f'{name}_max'] = _number(highest)
+        point[f'{name}_avg'] = round(float(total) / count, 1) if count else None
+        point[f'{name}_last'] = _number(last)
+    point['lat'] = _number(partial[14])
+    point['lon'] = _number(partial[15])
+    # Distance since the previous point (an odometer that went back counts as 0)
+    if point['odometer_max'] is None:
+        point['distance_km'] = None
+    else:
+        base = previous_odometer if previous_odometer is not None else point['odometer_min']
+        point['distance_km'] = round(max(0.0, point['odometer_max'] - base), 1)
+    return point
+
+
+def _load_series(conn, vehicle_id, tier, start, end, step):
+    buckets = []
+    for partial in _fetch_partials(conn, vehicle_id, tier, start, end):
+        bucket = floor_time(partial[0], step)
+        if buckets and buckets[-1][0] == bucket:
+            _merge(buckets[-1], partial)
+        else:
+            buckets.append([bucket] + partial[1:])
+
+    points = []
+    previous_odometer = None
+    position = None
+    for partial in buckets:
+        point = _point(partial, previous_odometer)
+        if point['odometer_last'] is not None:
+            previous_odometer = point['odometer_last']
+        if partial[16] is not None:
+            position = {'lat': point['lat'], 'lon': point['lon'], 'ts': partial[16].isoformat()}
+        points.append(point)
+    return {
+        'tier': tier[0] if tier else 'raw',
+        'step': int(step.total_seconds()),
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'distance_km': round(sum(point['distance_km'] or 0 for point in points), 1),
+        'odometer_km': previous_odometer,
+        'position': position,
+        'points': points,
+    }
+
+
+def query(conn, vehicle_id, start, end, max_points=TIMESERIES_DEFAULT_POINTS):
+    """
+    One vehicle's telemetry between start and end (naive UTC datetimes) as at
+    most max_points points, each with min / max / avg / last odometer and
+    speed, the last position and the distance driven since the previous point.
+    """
+    tier, start, end, step = plan(start, end, max(1, min(max_points, TIMESERIES_MAX_POINTS)))
+    key = f"timeseries:{vehicle_id}:{start.isoformat()}:{end.isoformat()}:{int(step.total_seconds())}"
+    return cache.get_or_load(key, lambda: _load_series(conn, vehicle_id, tier, start, end, step),
+                             ttl=TIMESERIES_CACHE_TTL)
+
+
+def main():
+    if len(sys.argv) not in (2, 3) or sys.argv[1] != 'rebuild':
+        print("Usage: python timeseries.py rebuild [vehicle_id]")
+        sys.exit(1)
+    # Every shard has its own readings and tiers
+    for shard in shards.names():
+        conn = shards.connection(shard)
+        try:
+            vehicles, months = rebuild_all(conn, int(sys.argv[2]) if len(sys.argv) == 3 else None)
+            print(f"[OK] {shard}: rebuilt {months} vehicle-months for {vehicles} vehicles")
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
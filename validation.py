@@ -0,0 +1,71 @@
+"""
+Form and import validation shared by app.py and imports.py
+"""
+from datetime import datetime
+
+def validate_vehicle_data(brand, model, year, plate):
+    """Validate vehicle form data"""
+    errors = []
+    
+    # Brand validation
+    if not brand or not brand.strip():
+        errors.append("Brand is required.")
+    elif len(brand.strip()) > 100:
+        errors.append("Brand must be 100 characters or less.")
+    
+    # Model validation
+    if not model or not model.strip():
+        errors.append("Model is required.")
+    elif len(model.strip()) > 100:
+        errors.append("Model must be 100 characters or less.")
+    
+    # Year validation
+    try:
+        year_int = int(year)
+        current_year = datetime.now().year
+        if year_int < 1900 or year_int > current_year + 1:
+            errors.append(f"Year must be between 1900 and {current_year + 1}.")
+    except (ValueError, TypeError):
+        errors.append("Year must be a valid number.")
+    
+    # Plate validation
+    if not plate or not plate.strip():
+        errors.append("Plate number is required.")
+    elif len(plate.strip()) > 50:
+        errors.append("Plate number must be 50 characters or less.")
+    
+    return errors
+
+def validate_maintenance_data(maintenance_type, maintenance_date, cost=None):
+    """Validate maintenance form data"""
+    errors = []
+    
+    # Maintenance type validation
+    if not maintenance_type or not maintenance_type.strip():
+        errors.append("Maintenance type is required.")
+    elif len(maintenance_type.strip()) > 100:
+        errors.append("Maintenance type must be 100 characters or less.")
+    
+    # Date validation
+    if not maintenance_date:
+        errors.append("Maintenance date is required.")
+    else:
+        try:
+            date_obj = datetime.strptime(maintenance_date, '%Y-%m-%d')
+            if date_obj.date() > datetime.now().date():
+                errors.append("Maintenance date cannot be in the future.")
+        except ValueError:
+            errors.append("Invalid date format.")
+    
+    # Cost validation
+    if cost and cost.strip():
+        try:
+            cost_float = float(cost)
+            if cost_float < 0:
+                errors.append("Cost cannot be negative.")
+            elif cost_float > 999999.99:
+                errors.append("Cost is too large.")
+        except ValueError:
+            errors.append("Cost must be a valid number.")
+    
+    return errors